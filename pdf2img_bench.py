@@ -0,0 +1,435 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PDF 转图片工具 - 性能基准测试
+生成确定性的合成 PDF 语料，在 DPI × 格式 × 编码预设 × 质量 × 进程数 的组合上运行转换，
+记录每秒页数、写入字节数、峰值内存和各阶段耗时
+
+用法示例:
+    python pdf2img_bench.py generate --corpus bench_corpus --pages 20
+    python pdf2img_bench.py run --corpus bench_corpus --dpi 72,150,300 --workers 1,4 -o results.json
+    python pdf2img_bench.py run --formats png --presets fast,balanced,smallest -o presets.json
+    python pdf2img_bench.py compare baseline.json results.json
+    python pdf2img_bench.py startup --repeat 5
+
+作者: zhifouli
+GitHub: https://github.com/zhifouli?tab=repositories
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+import multiprocessing
+from multiprocessing import Process, Queue, Event
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import fitz  # PyMuPDF
+
+from pdf2img_converter import __version__
+from pdf2img_engine import conversion_process_main
+from pdf2img_encoders import DEFAULT_PRESET
+
+# 语料中的文档类型
+CORPUS_KINDS = ("text", "vector", "scanned", "hugepage")
+
+WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod "
+    "tempor incididunt ut labore et dolore magna aliqua enim ad minim veniam "
+    "quis nostrud exercitation ullamco laboris nisi aliquip ex ea commodo"
+).split()
+
+
+def _random_text(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def _make_text_page(doc, rng):
+    """正文密集的页面"""
+    page = doc.new_page(width=595, height=842)
+    page.insert_textbox(fitz.Rect(40, 40, 555, 802), _random_text(rng, 900),
+                        fontsize=9, fontname="helv")
+
+
+def _make_vector_page(doc, rng):
+    """大量矢量图形的页面"""
+    page = doc.new_page(width=595, height=842)
+    shape = page.new_shape()
+    for _ in range(300):
+        p1 = fitz.Point(rng.uniform(0, 595), rng.uniform(0, 842))
+        p2 = fitz.Point(rng.uniform(0, 595), rng.uniform(0, 842))
+        if rng.random() < 0.5:
+            shape.draw_line(p1, p2)
+        else:
+            shape.draw_bezier(p1, fitz.Point(rng.uniform(0, 595), rng.uniform(0, 842)),
+                              fitz.Point(rng.uniform(0, 595), rng.uniform(0, 842)), p2)
+        shape.finish(color=(rng.random(), rng.random(), rng.random()),
+                     width=rng.uniform(0.2, 2))
+    shape.commit()
+
+
+def _make_scanned_page(doc, rng):
+    """整页嵌入一张 JPEG 图片（模拟扫描件）"""
+    source = fitz.open()
+    _make_text_page(source, rng)
+    pix = source[0].get_pixmap(dpi=200, colorspace=fitz.csGRAY)
+    source.close()
+    page = doc.new_page(width=595, height=842)
+    page.insert_image(page.rect, stream=pix.tobytes("jpeg", jpg_quality=85))
+
+
+def _make_hugepage_page(doc, rng):
+    """A0 尺寸的工程图纸页面"""
+    page = doc.new_page(width=2384, height=3370)
+    shape = page.new_shape()
+    for _ in range(150):
+        p1 = fitz.Point(rng.uniform(0, 2384), rng.uniform(0, 3370))
+        p2 = fitz.Point(rng.uniform(0, 2384), rng.uniform(0, 3370))
+        shape.draw_line(p1, p2)
+        shape.finish(color=(0, 0, rng.random()), width=0.5)
+    shape.commit()
+    page.insert_textbox(fitz.Rect(60, 60, 2324, 400), _random_text(rng, 200),
+                        fontsize=24, fontname="helv")
+
+
+PAGE_MAKERS = {
+    "text": _make_text_page,
+    "vector": _make_vector_page,
+    "scanned": _make_scanned_page,
+    "hugepage": _make_hugepage_page,
+}
+
+
+def generate_corpus(corpus_dir, pages=10, seed=1, kinds=CORPUS_KINDS):
+    """
+    生成合成 PDF 语料（相同参数生成的内容完全一致）
+
+    Returns:
+        {类型: PDF 路径}
+    """
+    os.makedirs(corpus_dir, exist_ok=True)
+    corpus = {}
+    for kind in kinds:
+        path = os.path.join(corpus_dir, f"{kind}_{pages}p_s{seed}.pdf")
+        if not os.path.exists(path):
+            rng = random.Random(f"{kind}-{seed}")
+            doc = fitz.open()
+            # 超大页面渲染很慢，页数减少
+            page_count = max(1, pages // 5) if kind == "hugepage" else pages
+            for _ in range(page_count):
+                PAGE_MAKERS[kind](doc, rng)
+            doc.save(path, garbage=3, deflate=True, no_new_id=True)
+            doc.close()
+        corpus[kind] = path
+    return corpus
+
+
+class _CollectingQueue:
+    """只保留 conversion_complete 消息的进度队列"""
+
+    def __init__(self):
+        self.complete_message = None
+
+    def put(self, message):
+        if message.get("type") == "conversion_complete":
+            self.complete_message = message
+
+
+def _peak_rss_mb(who):
+    if resource is None:
+        return None
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    if sys.platform == "darwin":
+        peak /= 1024
+    return round(peak / 1024, 1)
+
+
+def _run_cell(pdf_path, output_dir, output_format, quality, dpi, worker_count,
+              options, result_queue):
+    """在独立进程中运行一次转换，保证峰值内存互不影响"""
+    reporter = _CollectingQueue()
+    start = time.perf_counter()
+    conversion_process_main(
+        [pdf_path], output_dir, output_format, quality, dpi,
+        reporter, Event(), Event(), worker_count, options
+    )
+    wall_time = time.perf_counter() - start
+    result_queue.put({
+        "wall_time": wall_time,
+        "complete": reporter.complete_message,
+        "peak_rss_mb": _peak_rss_mb(resource.RUSAGE_SELF) if resource else None,
+        "peak_worker_rss_mb": _peak_rss_mb(resource.RUSAGE_CHILDREN) if resource else None
+    })
+
+
+def run_cell(pdf_path, output_format, quality, dpi, worker_count, options=None):
+    """运行一个基准组合并返回指标"""
+    options = dict(options or {})
+    # 基准测试每次都完整渲染
+    options["resume"] = False
+    output_dir = tempfile.mkdtemp(prefix="pdf2img_bench_")
+    result_queue = Queue()
+    try:
+        process = Process(
+            target=_run_cell,
+            args=(pdf_path, output_dir, output_format, quality, dpi,
+                  worker_count, options, result_queue)
+        )
+        process.start()
+        raw = result_queue.get()
+        process.join()
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    complete = raw["complete"] or {}
+    pages = complete.get("total_pages", 0)
+    wall_time = raw["wall_time"]
+    return {
+        "pages": pages,
+        "errors": complete.get("error_count", 0),
+        "wall_time": round(wall_time, 3),
+        "pages_per_sec": round(pages / wall_time, 2) if wall_time > 0 else 0.0,
+        "bytes_written": complete.get("bytes_written", 0),
+        "peak_rss_mb": raw["peak_rss_mb"],
+        "peak_worker_rss_mb": raw["peak_worker_rss_mb"],
+        "stage_times": {
+            stage: round(seconds, 4)
+            for stage, seconds in complete.get("stage_times", {}).items()
+        }
+    }
+
+
+def _int_list(value):
+    return [int(v) for v in value.split(",") if v]
+
+
+def _str_list(value):
+    return [v for v in value.split(",") if v]
+
+
+def run_benchmark(args):
+    """执行 run 子命令"""
+    kinds = _str_list(args.kinds)
+    corpus = generate_corpus(args.corpus, args.pages, args.seed, kinds)
+
+    results = []
+    for kind in kinds:
+        for dpi in _int_list(args.dpi):
+            for output_format in _str_list(args.formats):
+                # 质量只对有损格式有效
+                qualities = _int_list(args.quality) if output_format in ("jpg", "webp") else [95]
+                for preset in _str_list(args.presets):
+                    for quality in qualities:
+                        for worker_count in _int_list(args.workers):
+                            cell = {
+                                "doc": kind,
+                                "dpi": dpi,
+                                "format": output_format,
+                                "preset": preset,
+                                "quality": quality,
+                                "workers": worker_count
+                            }
+                            cell.update(run_cell(corpus[kind], output_format, quality,
+                                                 dpi, worker_count, {"encoder_preset": preset}))
+                            results.append(cell)
+                            print(json.dumps(cell, ensure_ascii=False), flush=True)
+
+    report = {
+        "meta": {
+            "tool_version": __version__,
+            "pymupdf": getattr(fitz, "VersionBind", None),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "pages": args.pages,
+            "seed": args.seed
+        },
+        "results": results
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"✓ 结果已保存: {args.output}", file=sys.stderr)
+    return 0
+
+
+# 测量图形界面模块导入耗时的子进程脚本
+GUI_IMPORT_PROBE = (
+    "import sys, time, json\n"
+    "start = time.perf_counter()\n"
+    "import pdf2img_gui\n"
+    "print(json.dumps({'gui_import_time': time.perf_counter() - start,\n"
+    "                  'gui_loaded_fitz': 'fitz' in sys.modules}))\n"
+)
+
+
+def _median(values):
+    values = sorted(values)
+    return values[len(values) // 2] if values else None
+
+
+def _run_json(command):
+    """运行子进程并解析最后一行 JSON 输出，同时返回进程总耗时"""
+    start = time.perf_counter()
+    completed = subprocess.run(command, capture_output=True, text=True,
+                               cwd=os.path.dirname(os.path.abspath(__file__)))
+    wall_time = time.perf_counter() - start
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not lines:
+        return None, wall_time
+    return json.loads(lines[-1]), wall_time
+
+
+def measure_startup(args):
+    """
+    执行 startup 子命令：测量图形界面启动耗时
+
+    每轮分别在新进程中测量 pdf2img_gui 的导入耗时（无需显示器），
+    以及 pdf2img_converter.py --startup-time 的窗口显示和预启动转换进程就绪耗时，
+    结果取中位数。
+    """
+    converter = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pdf2img_converter.py")
+    runs = []
+    window_available = True
+    for _ in range(max(1, args.repeat)):
+        run = {}
+        probe, wall_time = _run_json([sys.executable, "-c", GUI_IMPORT_PROBE])
+        if probe:
+            run.update(probe)
+            run["import_process_time"] = wall_time
+        if window_available:
+            startup, wall_time = _run_json([sys.executable, converter, "--startup-time"])
+            if startup is None:
+                # 没有显示器等原因无法创建窗口，只统计导入耗时
+                window_available = False
+                print("⚠ 无法打开窗口，只测量模块导入耗时", file=sys.stderr)
+            else:
+                run.update(startup)
+                run["process_time"] = wall_time
+        runs.append(run)
+
+    summary = {}
+    for key in sorted({key for run in runs for key in run}):
+        values = [run[key] for run in runs if key in run]
+        if all(isinstance(v, bool) for v in values):
+            summary[key] = any(values)
+        else:
+            summary[key] = round(_median(values), 3)
+    report = {
+        "meta": {
+            "tool_version": __version__,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "repeat": len(runs)
+        },
+        "startup": summary,
+        "runs": runs
+    }
+    print(json.dumps(summary, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"✓ 结果已保存: {args.output}", file=sys.stderr)
+    return 0
+
+
+def _cell_key(cell):
+    return (cell["doc"], cell["dpi"], cell["format"], cell.get("preset", DEFAULT_PRESET),
+            cell["quality"], cell["workers"])
+
+
+def compare_results(args):
+    """执行 compare 子命令：对比两次结果的每秒页数和输出大小"""
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = {_cell_key(c): c for c in json.load(f)["results"]}
+    with open(args.current, "r", encoding="utf-8") as f:
+        current = json.load(f)["results"]
+
+    regressions = 0
+    for cell in current:
+        old = baseline.get(_cell_key(cell))
+        if old is None or not old["pages_per_sec"]:
+            continue
+        change = (cell["pages_per_sec"] - old["pages_per_sec"]) / old["pages_per_sec"] * 100
+        flag = ""
+        if change < -args.threshold:
+            flag = "  ⚠ 变慢"
+            regressions += 1
+        size = ""
+        if old.get("bytes_written"):
+            size_change = (cell["bytes_written"] - old["bytes_written"]) / old["bytes_written"] * 100
+            size = f"  大小 {size_change:+.1f}%"
+        print(f"{cell['doc']:>8} {cell['dpi']:>4}dpi {cell['format']:>4} "
+              f"{cell.get('preset', DEFAULT_PRESET):>8} q{cell['quality']:<3} "
+              f"x{cell['workers']:<3} {old['pages_per_sec']:>8.2f} → {cell['pages_per_sec']:>8.2f} "
+              f"页/秒 ({change:+.1f}%){size}{flag}")
+    return 1 if regressions else 0
+
+
+def build_parser():
+    """构建命令行参数解析器"""
+    parser = argparse.ArgumentParser(description="PDF 转图片工具性能基准测试")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    gen = sub.add_parser("generate", help="生成合成 PDF 语料")
+    gen.add_argument("--corpus", default="bench_corpus", help="语料目录")
+    gen.add_argument("--pages", type=int, default=10, help="每个文档的页数")
+    gen.add_argument("--seed", type=int, default=1, help="随机种子")
+    gen.add_argument("--kinds", default=",".join(CORPUS_KINDS), help="文档类型，逗号分隔")
+
+    run = sub.add_parser("run", help="运行基准测试")
+    run.add_argument("--corpus", default="bench_corpus", help="语料目录（不存在时自动生成）")
+    run.add_argument("--pages", type=int, default=10, help="每个文档的页数")
+    run.add_argument("--seed", type=int, default=1, help="随机种子")
+    run.add_argument("--kinds", default=",".join(CORPUS_KINDS), help="文档类型，逗号分隔")
+    run.add_argument("--dpi", default="72,150,300", help="DPI 列表，逗号分隔")
+    run.add_argument("--formats", default="png,jpg", help="输出格式列表，逗号分隔")
+    run.add_argument("--presets", default=DEFAULT_PRESET,
+                     help="编码预设列表，逗号分隔（如 fast,balanced,smallest）")
+    run.add_argument("--quality", default="95", help="JPG/WebP 质量列表，逗号分隔")
+    run.add_argument("--workers", default=str(os.cpu_count() or 1), help="进程数列表，逗号分隔")
+    run.add_argument("-o", "--output", default="bench_results.json", help="结果 JSON 文件")
+
+    startup = sub.add_parser("startup", help="测量图形界面启动耗时")
+    startup.add_argument("--repeat", type=int, default=5, help="重复次数，结果取中位数（默认 5）")
+    startup.add_argument("-o", "--output", help="结果 JSON 文件")
+
+    cmp_parser = sub.add_parser("compare", help="对比两次基准测试结果")
+    cmp_parser.add_argument("baseline", help="基准结果 JSON")
+    cmp_parser.add_argument("current", help="本次结果 JSON")
+    cmp_parser.add_argument("--threshold", type=float, default=5.0,
+                            help="变慢超过该百分比时视为退化（默认 5）")
+    return parser
+
+
+def main(argv=None):
+    """命令行入口"""
+    multiprocessing.freeze_support()
+    args = build_parser().parse_args(argv)
+
+    if args.command == "generate":
+        corpus = generate_corpus(args.corpus, args.pages, args.seed, _str_list(args.kinds))
+        for kind, path in corpus.items():
+            print(f"{kind}: {path}")
+        return 0
+    if args.command == "run":
+        return run_benchmark(args)
+    if args.command == "startup":
+        return measure_startup(args)
+    return compare_results(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
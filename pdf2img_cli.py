@@ -0,0 +1,300 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PDF 转图片工具 - 命令行批量转换
+无需图形界面，适合在服务器上批量运行
+
+用法示例:
+    python pdf2img_cli.py docs/ "scans/**/*.pdf" a.pdf -o out --dpi 200 --format jpg
+
+进度以 JSON Lines 格式逐行输出到标准输出，最后一行为汇总信息。
+
+作者: zhifouli
+GitHub: https://github.com/zhifouli?tab=repositories
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import multiprocessing
+from multiprocessing import Event
+
+from pdf2img_converter import __version__
+from pdf2img_engine import (
+    BLANK_PAGE_MODES,
+    COLORSPACES,
+    DEFAULT_OPTIONS,
+    RENDER_PROFILES,
+    conversion_process_main,
+    default_worker_count,
+    parse_outputs,
+)
+from pdf2img_encoders import (
+    DEFAULT_PRESET,
+    ENCODER_PRESETS,
+    JPEG_SUBSAMPLING,
+    OUTPUT_FORMATS,
+    PNG_FILTERS,
+    available_formats,
+    pillow_available,
+)
+from pdf2img_inputs import iter_pdf_files
+from pdf2img_sinks import SINKS
+
+
+class JsonLinesReporter:
+    """
+    将进度消息以 JSON Lines 格式写到输出流
+
+    只实现 put()，可直接代替 progress_queue 传给 conversion_process_main。
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self.start_time = time.monotonic()
+        self.complete_message = None
+        self.space_warning = None
+
+    def put(self, message):
+        msg_type = message.get("type")
+        if msg_type == "conversion_complete":
+            self.complete_message = message
+        elif msg_type == "space_warning":
+            self.space_warning = message
+        elif msg_type == "page_stats_batch":
+            # 合并的逐页统计展开为单独的 page_stats 行
+            for page_message in message["pages"]:
+                self.put(page_message)
+            return
+        record = dict(message)
+        record["elapsed"] = round(time.monotonic() - self.start_time, 3)
+        self.stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.stream.flush()
+
+
+def collect_pdf_files(inputs, recursive=False):
+    """
+    将文件、目录、通配符展开为 PDF 文件列表（去重并保持顺序）
+    """
+    def warn_missing(item):
+        print(f"⚠ 未找到匹配的文件: {item}", file=sys.stderr)
+
+    return list(iter_pdf_files(inputs, recursive, on_missing=warn_missing))
+
+
+def add_conversion_arguments(parser):
+    """添加输入、输出目录和输出参数（命令行转换和分布式提交共用）"""
+    parser.add_argument("inputs", nargs="+",
+                        help="PDF 文件、目录或通配符（如 \"docs/**/*.pdf\"）")
+    parser.add_argument("-o", "--output", required=True, help="输出目录")
+    parser.add_argument("-r", "--recursive", action="store_true",
+                        help="递归搜索目录中的 PDF 文件")
+    parser.add_argument("--dpi", type=int, default=150, help="分辨率（默认 150）")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS,
+                        help="输出格式（默认 png，--sink tiff 时为 tiff；webp 需要 Pillow）")
+    parser.add_argument("--outputs",
+                        help="多输出，如 \"72:jpg,150:jpg,300:png\"：每页只解析一次，按各 DPI/格式"
+                             "分别输出到子目录 <dpi>dpi_<格式>（省略格式时使用 --format）")
+    parser.add_argument("--sink", choices=SINKS, default="dir",
+                        help="输出方式：dir 每页一个文件（默认）；zip/tar 每个 PDF 一个归档；"
+                             "tiff 每个 PDF 一个多页 TIFF")
+    parser.add_argument("--quality", type=int, default=95,
+                        help="JPG/WebP 图片质量 50-100（默认 95，WebP 为 100 时无损）")
+    parser.add_argument("--preset", choices=sorted(ENCODER_PRESETS), default=DEFAULT_PRESET,
+                        help=f"编码预设：fast 最快、smallest 文件最小（默认 {DEFAULT_PRESET}）")
+    parser.add_argument("--png-level", type=int, choices=range(10), metavar="0-9",
+                        help="PNG 压缩级别（覆盖预设）")
+    parser.add_argument("--png-filter", choices=PNG_FILTERS,
+                        help="PNG 行过滤方式（覆盖预设，adaptive 未安装 Pillow 时按 up 处理）")
+    parser.add_argument("--jpeg-progressive", action="store_true", default=None,
+                        help="输出渐进式 JPG（需要 Pillow）")
+    parser.add_argument("--jpeg-subsampling", choices=JPEG_SUBSAMPLING,
+                        help="JPG 色度抽样（覆盖预设，需要 Pillow）")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="忽略输出目录中的清单，重新渲染全部页面")
+    parser.add_argument("--no-pipeline", action="store_true",
+                        help="关闭渲染/编码/写盘流水线，逐页串行处理")
+    parser.add_argument("--encode-threads", type=int, default=2,
+                        help="每个进程的 PNG 编码线程数（默认 2）")
+    parser.add_argument("--max-long-edge", type=int, default=0,
+                        help="单页最长边像素上限，超出的页面自动降低 DPI；0 表示不限制")
+    parser.add_argument("--max-megapixels", type=float, default=0,
+                        help="单页像素数上限（百万像素），超出的页面自动降低 DPI；0 表示不限制")
+    parser.add_argument("--tile-memory-mb", type=int, default=256,
+                        help="每个进程的页面像素内存上限（MB），超大页面分块渲染；0 表示不限制（默认 256）")
+    parser.add_argument("--colorspace", choices=COLORSPACES, default="rgb",
+                        help="输出颜色：rgb 彩色、gray 灰度、bilevel 黑白、auto 无彩色内容的页面输出灰度（默认 rgb）")
+    parser.add_argument("--render-profile", choices=RENDER_PROFILES, default="quality",
+                        help="渲染档案：quality 最高质量（默认）；draft 降低抗锯齿、不渲染注释和表单，"
+                             "适合预览；ocr 保留文字抗锯齿、关闭图形抗锯齿、不渲染注释，适合文字识别")
+    parser.add_argument("--threshold", type=int, default=128,
+                        help="黑白模式的阈值 1-255，灰度低于该值的像素为黑色（默认 128）")
+    parser.add_argument("--passthrough", action="store_true",
+                        help="扫描件直通：只含一张整页图片的页面直接输出原始图片，不重新渲染")
+    parser.add_argument("--blank-pages", choices=BLANK_PAGE_MODES, default="render",
+                        help="空白页处理：render 照常转换（默认，不检测）；skip 不输出（仅 dir 输出方式，"
+                             "其他输出方式写占位图）；placeholder 输出很小的白色占位图")
+    parser.add_argument("--blank-threshold", type=int, default=DEFAULT_OPTIONS["blank_threshold"],
+                        help="空白页检测阈值（灰度级 0-255）：只有图片的页面，低分辨率预览中与底色相差超过该值的"
+                             "像素算作墨迹，没有墨迹才视为空白；有文字或矢量图形的页面总是照常转换"
+                             f"（默认 {DEFAULT_OPTIONS['blank_threshold']}）")
+    parser.add_argument("--page-timeout", type=float, default=DEFAULT_OPTIONS["page_timeout"],
+                        help="渲染进程超过这么多秒没有完成任何页面时视为卡死，结束并重启该进程、"
+                             f"隔离该文件；0 表示不限制（默认 {DEFAULT_OPTIONS['page_timeout']}）")
+    parser.add_argument("--file-timeout", type=float, default=0,
+                        help="单个文件的转换时长上限（秒），超时的文件记为失败并隔离；0 表示不限制（默认）")
+    parser.add_argument("--retry-quarantined", action="store_true",
+                        help="重新转换隔离名单中的文件（默认跳过曾导致渲染进程崩溃或超时的文件）")
+    parser.add_argument("--prefetch", type=int, default=0,
+                        help="输入预读：渲染时后台把接下来的这么多个 PDF 读入共享内存，"
+                             "适合网络共享盘上的输入；0 表示不预读（默认）")
+    parser.add_argument("--prefetch-mb", type=int, default=DEFAULT_OPTIONS["prefetch_mb"],
+                        help=f"预读占用的内存上限（MB，默认 {DEFAULT_OPTIONS['prefetch_mb']}），"
+                             "放不下的文件照常从磁盘读取")
+
+
+def conversion_settings(args):
+    """
+    检查 add_conversion_arguments 添加的参数并整理为转换参数
+
+    Returns:
+        (output_format, dpi, options)
+
+    Raises:
+        ValueError: 参数无效，消息可直接显示给用户
+    """
+    output_format = args.format or ("tiff" if args.sink == "tiff" else "png")
+    dpi = args.dpi
+    outputs = None
+    if args.outputs:
+        try:
+            outputs = parse_outputs(args.outputs, output_format)
+        except ValueError as e:
+            raise ValueError(f"--outputs {e}") from None
+        # 第一个输出作为主输出（用于汇总中的 DPI 和格式）
+        dpi, output_format = outputs[0]["dpi"], outputs[0]["format"]
+    for spec_format in {spec["format"] for spec in outputs or [{"format": output_format}]}:
+        if args.sink == "tiff" and spec_format != "tiff":
+            raise ValueError("--sink tiff 只能输出 tiff 格式")
+        if spec_format not in available_formats():
+            raise ValueError(f"输出 {spec_format} 格式需要安装 Pillow: pip install pillow")
+    if not pillow_available() and (args.jpeg_progressive or args.jpeg_subsampling):
+        print("⚠ 未安装 Pillow，JPG 使用 MuPDF 编码器，忽略渐进式/色度抽样设置",
+              file=sys.stderr)
+
+    options = {
+        "resume": not args.no_resume,
+        "pipeline": not args.no_pipeline,
+        "encode_threads": max(1, args.encode_threads),
+        "tile_memory_mb": max(0, args.tile_memory_mb),
+        "max_long_edge": max(0, args.max_long_edge),
+        "max_pixels": max(0, int(args.max_megapixels * 1000000)),
+        "passthrough": args.passthrough,
+        "blank_pages": args.blank_pages,
+        "blank_threshold": min(255, max(0, args.blank_threshold)),
+        "page_timeout": max(0.0, args.page_timeout),
+        "file_timeout": max(0.0, args.file_timeout),
+        "skip_quarantined": not args.retry_quarantined,
+        "prefetch_files": max(0, args.prefetch),
+        "prefetch_mb": max(1, args.prefetch_mb),
+        "colorspace": args.colorspace,
+        "render_profile": args.render_profile,
+        "sink": args.sink,
+        "outputs": outputs,
+        "bilevel_threshold": min(255, max(1, args.threshold)),
+        "encoder_preset": args.preset,
+        "png_compress_level": args.png_level,
+        "png_filter": args.png_filter,
+        "jpeg_progressive": args.jpeg_progressive,
+        "jpeg_subsampling": args.jpeg_subsampling
+    }
+    return output_format, dpi, options
+
+
+def build_parser():
+    """构建命令行参数解析器"""
+    parser = argparse.ArgumentParser(
+        description="批量将 PDF 文件转换为图片（无图形界面）"
+    )
+    add_conversion_arguments(parser)
+    parser.add_argument("--workers", type=int, default=default_worker_count(),
+                        help="并行进程数（默认 CPU 核心数）")
+    parser.add_argument("--ignore-space", action="store_true",
+                        help="预计输出超过输出目录所在磁盘的剩余空间时仍然转换（默认不开始转换）")
+    parser.add_argument("--version", action="version",
+                        version=f"%(prog)s {__version__}")
+    return parser
+
+
+def main(argv=None):
+    """命令行入口"""
+    multiprocessing.freeze_support()
+
+    args = build_parser().parse_args(argv)
+
+    pdf_files = collect_pdf_files(args.inputs, args.recursive)
+    if not pdf_files:
+        print("✗ 没有找到 PDF 文件", file=sys.stderr)
+        return 2
+
+    try:
+        output_format, dpi, options = conversion_settings(args)
+    except ValueError as e:
+        print(f"✗ {e}", file=sys.stderr)
+        return 2
+    options["space_check"] = "warn" if args.ignore_space else "abort"
+
+    os.makedirs(args.output, exist_ok=True)
+
+    reporter = JsonLinesReporter()
+    pause_event = Event()
+    stop_event = Event()
+
+    # Ctrl+C 时停止派发新任务，等待工作进程退出后输出汇总
+    signal.signal(signal.SIGINT, lambda signum, frame: stop_event.set())
+
+    start_time = time.monotonic()
+    conversion_process_main(
+        pdf_files, args.output, output_format, args.quality, dpi,
+        reporter, pause_event, stop_event, max(1, args.workers), options
+    )
+    wall_time = time.monotonic() - start_time
+
+    result = reporter.complete_message or {}
+    total_pages = result.get("total_pages", 0)
+    mb_written = result.get("bytes_written", 0) / (1024 * 1024)
+    reporter.put({
+        "type": "summary",
+        "files": len(pdf_files),
+        "success_count": result.get("success_count", 0),
+        "error_count": result.get("error_count", 0),
+        "pages": total_pages,
+        "skipped_pages": result.get("skipped_pages", 0),
+        "passthrough_pages": result.get("passthrough_pages", 0),
+        "blank_pages": result.get("blank_pages", 0),
+        "gray_pages": result.get("gray_pages", 0),
+        "quarantined_count": result.get("quarantined_count", 0),
+        "worker_restarts": result.get("worker_restarts", 0),
+        "pages_per_sec": round(total_pages / wall_time, 2) if wall_time > 0 else 0.0,
+        "mb_written": round(mb_written, 2),
+        "mb_per_sec": round(mb_written / wall_time, 2) if wall_time > 0 else 0.0,
+        "wall_time": round(wall_time, 3),
+        "stopped": result.get("stopped", False)
+    })
+
+    warning = reporter.space_warning
+    if warning and warning["action"] == "abort":
+        print(f"✗ 预计输出约 {warning['estimated_bytes'] / (1024 * 1024):.1f} MB，"
+              f"输出目录所在磁盘只剩 {warning['free_bytes'] / (1024 * 1024):.1f} MB；"
+              f"使用 --ignore-space 仍然转换", file=sys.stderr)
+        return 1
+    if result.get("stopped"):
+        return 130
+    return 1 if result.get("error_count") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,879 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PDF 转图片工具 - 多机分布式转换
+协调端把批次切成“文件 + 页码区间”的分片，写入共享文件系统上的工作队列目录；
+每台机器运行一个工作节点，用原子重命名领取分片，交给本机的渲染进程池
+（与单机转换相同的 render_pages 逻辑）。节点定期续租，节点失联后其分片租约过期，
+由其他节点或协调端放回待处理队列。
+
+队列目录结构:
+    batches/<批次>.json    批次参数和文件列表（提交时写入）
+    pending/<分片>.json    待处理的分片
+    running/<分片>.json    已领取的分片，文件修改时间即租约（节点定期更新）
+    done/<分片>.json       完成的分片，包含各页结果和耗时
+    failed/<分片>.json     出错或多次领取仍未完成的分片
+    nodes/<节点>.json      节点心跳和吞吐量
+
+用法示例:
+    python pdf2img_cluster.py submit --queue /mnt/share/queue /mnt/share/in -r -o /mnt/share/out
+    python pdf2img_cluster.py worker --queue /mnt/share/queue --workers 8      每台机器一个
+    python pdf2img_cluster.py wait --queue /mnt/share/queue                    汇总进度、写清单
+    python pdf2img_cluster.py status --queue /mnt/share/queue
+    python pdf2img_cluster.py local --queue q --nodes 3 docs/ -o out            本机多节点测试
+
+所有机器上 PDF 和输出目录的路径必须相同（相同的挂载点或 UNC 路径）。
+续转清单只由 wait 写入（每个文件只有一个写入者），未运行 wait 时已完成的分片在下次 wait 时补写。
+
+作者: zhifouli
+GitHub: https://github.com/zhifouli?tab=repositories
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import signal
+import socket
+import argparse
+import collections
+import multiprocessing
+from pathlib import Path
+from multiprocessing import Process, Event
+
+import fitz  # PyMuPDF
+
+from pdf2img_converter import __version__
+from pdf2img_cli import (
+    JsonLinesReporter,
+    add_conversion_arguments,
+    collect_pdf_files,
+    conversion_settings,
+)
+from pdf2img_engine import (
+    MANIFEST_VERSION,
+    RenderPool,
+    completed_pages_from_manifest,
+    default_worker_count,
+    estimate_page_costs,
+    file_fingerprint,
+    get_pdf_output_dir,
+    load_manifest,
+    manifest_page_info,
+    output_settings,
+    parse_outputs,
+    resolve_options,
+    save_manifest,
+)
+
+# 队列目录中的子目录
+QUEUE_DIRS = ("batches", "pending", "running", "done", "failed", "nodes")
+
+# 每个分片的默认页数
+DEFAULT_SHARD_PAGES = 50
+
+# 默认租约时长（秒）：节点超过这么久没有续租，其分片被放回待处理队列
+LEASE_SECONDS = 60
+
+# 节点每个租约周期内续租的次数
+RENEWALS_PER_LEASE = 4
+
+# 同一分片最多领取的次数，超过后移入 failed（避免反复拖垮节点的分片无限重试）
+MAX_SHARD_ATTEMPTS = 3
+
+# 空闲时检查队列的间隔（秒）
+POLL_INTERVAL = 1.0
+
+# wait 输出状态的间隔（秒）
+STATUS_INTERVAL = 5.0
+
+# 节点超过这么久没有心跳视为失联（秒）
+NODE_TIMEOUT = 3 * STATUS_INTERVAL
+
+# 节点吞吐量的统计窗口（秒）
+THROUGHPUT_WINDOW = 30.0
+
+
+def queue_path(queue_dir, kind, name=None):
+    """队列目录中的子目录或其中的文件"""
+    path = os.path.join(queue_dir, kind)
+    return path if name is None else os.path.join(path, name)
+
+
+def init_queue(queue_dir):
+    """创建队列目录结构"""
+    for kind in QUEUE_DIRS:
+        os.makedirs(queue_path(queue_dir, kind), exist_ok=True)
+
+
+def write_json(path, data):
+    """
+    原子地写出 JSON（先写临时文件再替换），其他机器不会读到写了一半的文件
+
+    临时文件名包含主机名和进程号，多台机器同时写同一文件时互不干扰。
+    """
+    temp_path = f"{path}.{socket.gethostname()}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+
+def read_json(path):
+    """读取 JSON 文件，不存在或已损坏时返回 None"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def list_shards(queue_dir, kind, batch_id=None):
+    """某个子目录中的分片编号（按编号排序，即按提交顺序）"""
+    try:
+        names = os.listdir(queue_path(queue_dir, kind))
+    except OSError:
+        return []
+    shard_ids = sorted(name[:-5] for name in names if name.endswith(".json"))
+    if batch_id is not None:
+        shard_ids = [shard_id for shard_id in shard_ids if shard_id.startswith(batch_id + "-")]
+    return shard_ids
+
+
+def latest_batch(queue_dir):
+    """最近提交的批次编号，没有时返回 None"""
+    batches = list_shards(queue_dir, "batches")
+    return batches[-1] if batches else None
+
+
+# ---------- 提交 ----------
+
+def submit_batch(queue_dir, pdf_files, output_dir, output_format, quality, dpi,
+                 options=None, shard_pages=DEFAULT_SHARD_PAGES, lease_seconds=LEASE_SECONDS):
+    """
+    把批次切成分片写入队列
+
+    与单机转换相同，先读取每个文件的页数和页面尺寸，启用续转时跳过清单中已完成的页面，
+    并写出初始清单（之后由 wait 合并完成的分片）。dir 输出方式按 shard_pages 页切分，
+    归档输出只能由一个节点写，每个文件一个分片。
+
+    Returns:
+        批次记录（写入 batches/<批次>.json 的内容）
+    """
+    init_queue(queue_dir)
+    options = resolve_options(options)
+    if options["outputs"]:
+        options["outputs"] = parse_outputs(options["outputs"], output_format)
+    settings = output_settings(output_format, quality, dpi, options)
+    output_dir = os.path.abspath(output_dir)
+    batch_id = f"{time.strftime('%Y%m%d%H%M%S')}{uuid.uuid4().hex[:4]}"
+    shard_pages = max(1, shard_pages)
+
+    files = []
+    shards = []
+    for file_index, pdf_path in enumerate(pdf_files):
+        pdf_path = os.path.abspath(pdf_path)
+        pdf_output_dir = get_pdf_output_dir(output_dir, pdf_path)
+        entry = {
+            "file_index": file_index,
+            "pdf_path": pdf_path,
+            "filename": os.path.basename(pdf_path),
+            "output_dir": pdf_output_dir,
+            "total_pages": 0,
+            "skipped_pages": 0,
+            "shards": []
+        }
+        files.append(entry)
+        try:
+            fingerprint = file_fingerprint(pdf_path)
+            with fitz.open(pdf_path) as pdf_document:
+                total_pages = len(pdf_document)
+                costs = estimate_page_costs(pdf_document, dpi, options)
+        except Exception as e:
+            entry["error"] = str(e)
+            continue
+
+        completed = {}
+        if options["resume"]:
+            completed = completed_pages_from_manifest(
+                load_manifest(pdf_output_dir), pdf_output_dir, fingerprint, settings,
+                Path(pdf_path).stem
+            )
+        save_manifest(pdf_output_dir, {
+            "version": MANIFEST_VERSION,
+            "source": fingerprint,
+            "settings": settings,
+            "total_pages": total_pages,
+            "pages": {str(page): info for page, info in completed.items()}
+        })
+        entry["total_pages"] = total_pages
+        entry["skipped_pages"] = len(completed)
+
+        remaining = [page for page in range(total_pages) if page + 1 not in completed]
+        if options["sink"] != "dir":
+            chunks = [remaining] if remaining else []
+        else:
+            chunks = [remaining[i:i + shard_pages] for i in range(0, len(remaining), shard_pages)]
+        for part, pages in enumerate(chunks):
+            shard_id = f"{batch_id}-{file_index:06d}-{part:04d}"
+            entry["shards"].append(shard_id)
+            shards.append({
+                "shard_id": shard_id,
+                "batch_id": batch_id,
+                "file_index": file_index,
+                "pdf_path": pdf_path,
+                "output_dir": output_dir,
+                "output_format": output_format,
+                "quality": quality,
+                "dpi": dpi,
+                "options": options,
+                "pages": pages,
+                "cost": int(sum(costs[page] for page in pages)),
+                "lease_seconds": lease_seconds,
+                "attempts": 0
+            })
+
+    batch = {
+        "batch_id": batch_id,
+        "created": time.time(),
+        "output_dir": output_dir,
+        "output_format": output_format,
+        "quality": quality,
+        "dpi": dpi,
+        "options": options,
+        "total_files": len(files),
+        "total_pages": sum(entry["total_pages"] for entry in files),
+        "pending_pages": sum(len(shard["pages"]) for shard in shards),
+        "total_shards": len(shards),
+        "files": files
+    }
+    write_json(queue_path(queue_dir, "batches", f"{batch_id}.json"), batch)
+    for shard in shards:
+        write_json(queue_path(queue_dir, "pending", f"{shard['shard_id']}.json"), shard)
+    return batch
+
+
+# ---------- 领取、续租、放回 ----------
+
+def claim_shard(queue_dir, node_id):
+    """
+    领取一个待处理的分片
+
+    pending/X.json 重命名为 running/X.json，重命名是原子的，多个节点同时领取时只有一个成功。
+    领取后立即更新修改时间（租约开始），再写入节点信息、领取次数和本次领取的令牌（claim）；
+    续租和完成时核对令牌，租约过期后被其他节点重新领取的分片，原节点不能再续租或写入完成。
+
+    Returns:
+        分片，没有可领取的分片时返回 None
+    """
+    for shard_id in list_shards(queue_dir, "pending"):
+        name = f"{shard_id}.json"
+        running_path = queue_path(queue_dir, "running", name)
+        try:
+            os.rename(queue_path(queue_dir, "pending", name), running_path)
+            os.utime(running_path)
+        except OSError:
+            # 已被其他节点领取（或刚领取就被当作过期放回）
+            continue
+        shard = read_json(running_path)
+        if shard is None:
+            continue
+        if os.path.exists(queue_path(queue_dir, "done", name)):
+            # 失联节点后来又完成了被放回的分片
+            _remove(running_path)
+            continue
+        shard["attempts"] = shard.get("attempts", 0) + 1
+        shard["node"] = node_id
+        shard["claimed"] = time.time()
+        shard["claim"] = uuid.uuid4().hex
+        write_json(running_path, shard)
+        if shard["attempts"] > MAX_SHARD_ATTEMPTS:
+            shard["error"] = f"已领取 {MAX_SHARD_ATTEMPTS} 次仍未完成"
+            finish_shard(queue_dir, shard, failed=True)
+            continue
+        return shard
+    return None
+
+
+def _holds_claim(path, shard):
+    """running/ 中的分片仍属于本次领取"""
+    current = read_json(path)
+    return current is not None and current.get("claim") == shard.get("claim")
+
+
+def renew_lease(queue_dir, shard):
+    """续租，分片已被放回或已被其他节点重新领取（租约过期）时返回 False"""
+    path = queue_path(queue_dir, "running", f"{shard['shard_id']}.json")
+    if not _holds_claim(path, shard):
+        return False
+    try:
+        os.utime(path)
+        return True
+    except OSError:
+        return False
+
+
+def release_shard(queue_dir, shard):
+    """把未完成的分片放回待处理队列（节点停止时），已不属于本次领取时不动"""
+    name = f"{shard['shard_id']}.json"
+    path = queue_path(queue_dir, "running", name)
+    if not _holds_claim(path, shard):
+        return
+    try:
+        os.rename(path, queue_path(queue_dir, "pending", name))
+    except OSError:
+        pass
+
+
+def requeue_expired(queue_dir):
+    """
+    把租约过期的分片放回待处理队列
+
+    租约时间取修改时间和状态变化时间中较晚者（领取时的重命名会更新后者），
+    时长以分片中的 lease_seconds 为准。各机器时钟应大致同步。
+
+    Returns:
+        放回的分片编号列表
+    """
+    now = time.time()
+    requeued = []
+    for shard_id in list_shards(queue_dir, "running"):
+        name = f"{shard_id}.json"
+        path = queue_path(queue_dir, "running", name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        age = now - max(stat.st_mtime, stat.st_ctime)
+        shard = read_json(path) if age > 1 else None
+        if shard is None or age < shard.get("lease_seconds", LEASE_SECONDS):
+            continue
+        try:
+            os.rename(path, queue_path(queue_dir, "pending", name))
+        except OSError:
+            continue
+        requeued.append(shard_id)
+    return requeued
+
+
+def finish_shard(queue_dir, shard, failed=False):
+    """
+    分片完成：写入 done/（出错时 failed/），再从 running/ 删除
+
+    先把 running/X.json 原子地重命名为带令牌的名字（不再被当作过期分片放回），
+    核对令牌后再写入结果；分片已被放回或已被其他节点重新领取时不写入。
+
+    Returns:
+        是否写入
+    """
+    name = f"{shard['shard_id']}.json"
+    running_path = queue_path(queue_dir, "running", name)
+    finishing_path = f"{running_path}.{shard['claim']}"
+    try:
+        os.rename(running_path, finishing_path)
+    except OSError:
+        return False
+    if not _holds_claim(finishing_path, shard):
+        # 取到的是其他节点的领取，原样放回
+        try:
+            os.rename(finishing_path, running_path)
+        except OSError:
+            pass
+        return False
+    shard["finished"] = time.time()
+    write_json(queue_path(queue_dir, "failed" if failed else "done", name), shard)
+    _remove(finishing_path)
+    return True
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def has_unfinished_shards(queue_dir):
+    """队列中是否还有待处理或处理中的分片"""
+    return bool(list_shards(queue_dir, "pending") or list_shards(queue_dir, "running"))
+
+
+# ---------- 工作节点 ----------
+
+class ClusterNode:
+    """
+    工作节点
+
+    每个分片作为一个任务交给本机的 RenderPool，同时处理的分片数等于进程数；
+    定期为处理中的分片续租、放回其他节点过期的分片，并写出心跳
+    （nodes/<节点>.json，包含完成的页数、字节数和最近的每秒页数）。
+    续租失败（租约已过期，分片可能已被其他节点领取）时立即放弃该任务、不写入结果。
+    停止时未完成的分片放回待处理队列。
+    """
+
+    def __init__(self, queue_dir, worker_count=None, node_id=None,
+                 exit_when_idle=False, stop_event=None):
+        self.queue_dir = queue_dir
+        self.worker_count = max(1, worker_count or default_worker_count())
+        self.node_id = node_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.exit_when_idle = exit_when_idle
+        self.pause_event = Event()
+        self.stop_event = stop_event or Event()
+        # task_id -> {"shard": 分片, "results": [逐页结果], "started": 开始时间}
+        self.active = {}
+        self.next_task_id = 0
+        self.started = time.time()
+        self.stats = {"shards_done": 0, "shards_failed": 0, "shards_lost": 0,
+                      "pages_done": 0, "bytes_written": 0}
+        self.recent = collections.deque()
+
+    def renew_interval(self):
+        """按处理中分片的最短租约计算续租间隔（同时是心跳间隔，不超过 STATUS_INTERVAL）"""
+        leases = [state["shard"].get("lease_seconds", LEASE_SECONDS)
+                  for state in self.active.values()]
+        return min(min(leases or [LEASE_SECONDS]) / RENEWALS_PER_LEASE, STATUS_INTERVAL)
+
+    def run(self):
+        """领取并处理分片，直到停止（exit_when_idle 时队列处理完后退出）"""
+        init_queue(self.queue_dir)
+        pool = RenderPool(self.worker_count, self.pause_event, self.stop_event)
+        pool.start()
+        last_renew = 0.0
+        try:
+            while not self.stop_event.is_set():
+                if time.monotonic() - last_renew >= self.renew_interval():
+                    last_renew = time.monotonic()
+                    self.renew_leases(pool)
+                    requeue_expired(self.queue_dir)
+                    self.write_heartbeat("running")
+
+                while len(self.active) < self.worker_count:
+                    shard = claim_shard(self.queue_dir, self.node_id)
+                    if shard is None:
+                        break
+                    self.submit(pool, shard)
+
+                if not self.active:
+                    if self.exit_when_idle and not has_unfinished_shards(self.queue_dir):
+                        break
+                    self.stop_event.wait(POLL_INTERVAL)
+                    continue
+
+                message = pool.get_result(timeout=0.2)
+                if message is not None:
+                    self.handle_result(message)
+        finally:
+            pool.shutdown()
+            for state in self.active.values():
+                release_shard(self.queue_dir, state["shard"])
+            self.active = {}
+            self.write_heartbeat("stopped")
+
+    def submit(self, pool, shard):
+        task_id = self.next_task_id
+        self.next_task_id += 1
+        self.active[task_id] = {"shard": shard, "results": [], "started": time.time()}
+        pool.submit({
+            "task_id": task_id,
+            "file_index": shard["file_index"],
+            "pdf_path": shard["pdf_path"],
+            "output_dir": shard["output_dir"],
+            "output_format": shard["output_format"],
+            "quality": shard["quality"],
+            "dpi": shard["dpi"],
+            "options": shard["options"],
+            "pages": shard["pages"]
+        })
+
+    def renew_leases(self, pool):
+        for task_id, state in self.active.items():
+            if state.get("lost_lease") or renew_lease(self.queue_dir, state["shard"]):
+                continue
+            # 租约已过期，分片可能已被其他节点领取并写同一份输出（归档会互相破坏）：
+            # 结束该任务，结果在 handle_result 中丢弃
+            state["lost_lease"] = True
+            pool.abort_tasks(lambda task, task_id=task_id: task["task_id"] == task_id,
+                             "租约已过期，分片交给其他节点处理")
+
+    def handle_result(self, message):
+        state = self.active.get(message["task_id"])
+        if state is None:
+            return
+        if message["type"] == "pages_done":
+            results = message["results"]
+            state["results"].extend(results)
+            self.stats["pages_done"] += len(results)
+            self.stats["bytes_written"] += sum(result["bytes"] for result in results)
+            self.recent.append((time.monotonic(), len(results)))
+            return
+
+        del self.active[message["task_id"]]
+        shard = state["shard"]
+        if state.get("lost_lease"):
+            self.stats["shards_lost"] += 1
+            return
+        if message["type"] == "task_done" and message["stopped"]:
+            release_shard(self.queue_dir, shard)
+            return
+        results = state["results"]
+        shard.update({
+            "node": self.node_id,
+            "started": state["started"],
+            "page_results": {str(result["page"]): manifest_page_info(result)
+                             for result in results},
+            "pages_done": len(results),
+            "bytes_written": sum(result["bytes"] for result in results),
+            "render_time": round(sum(result["render_time"] for result in results), 3),
+            "encode_time": round(sum(result["encode_time"] for result in results), 3),
+            "write_time": round(sum(result["write_time"] for result in results), 3),
+            "elapsed": round(time.time() - state["started"], 3)
+        })
+        failed = message["type"] == "task_error"
+        if failed:
+            shard["error"] = message["error"]
+        if not finish_shard(self.queue_dir, shard, failed=failed):
+            # 写入结果前发现分片已被重新领取
+            self.stats["shards_lost"] += 1
+        elif failed:
+            self.stats["shards_failed"] += 1
+        else:
+            self.stats["shards_done"] += 1
+
+    def pages_per_sec(self):
+        """最近 THROUGHPUT_WINDOW 秒的每秒页数"""
+        now = time.monotonic()
+        while self.recent and now - self.recent[0][0] > THROUGHPUT_WINDOW:
+            self.recent.popleft()
+        if not self.recent:
+            return 0.0
+        window = min(THROUGHPUT_WINDOW, time.time() - self.started)
+        return sum(count for _, count in self.recent) / max(window, 1e-3)
+
+    def write_heartbeat(self, state):
+        try:
+            write_json(queue_path(self.queue_dir, "nodes", f"{self.node_id}.json"), {
+                "node": self.node_id,
+                "host": socket.gethostname(),
+                "pid": os.getpid(),
+                "state": state,
+                "workers": self.worker_count,
+                "started": self.started,
+                "updated": time.time(),
+                "active_shards": [s["shard"]["shard_id"] for s in self.active.values()],
+                "pages_per_sec": round(self.pages_per_sec(), 2),
+                **self.stats
+            })
+        except OSError:
+            pass
+
+
+def node_main(queue_dir, worker_count, node_id=None, exit_when_idle=False):
+    """工作节点进程入口：Ctrl+C 时放回未完成的分片后退出"""
+    stop_event = Event()
+    signal.signal(signal.SIGINT, lambda signum, frame: stop_event.set())
+    ClusterNode(queue_dir, worker_count, node_id, exit_when_idle, stop_event).run()
+
+
+# ---------- 汇总 ----------
+
+def read_nodes(queue_dir):
+    """全部节点的心跳，alive 表示 NODE_TIMEOUT 秒内有心跳且未停止"""
+    now = time.time()
+    nodes = []
+    for node_id in list_shards(queue_dir, "nodes"):
+        node = read_json(queue_path(queue_dir, "nodes", f"{node_id}.json"))
+        if node is None:
+            continue
+        node["alive"] = node["state"] == "running" and now - node["updated"] < NODE_TIMEOUT
+        nodes.append(node)
+    return nodes
+
+
+def cluster_status(queue_dir, batch_id=None):
+    """
+    队列状态：各状态的分片数、完成的页数和字节数、各节点的吞吐量
+
+    batch_id 为 None 时统计最近的批次。各节点完成的页数和分片数取自本批次 done/ 和 failed/
+    中的分片（与 summary 相同），心跳只提供是否在线、进程数、丢失的分片数和每秒页数；
+    心跳定期才写一次，其中的计数会落后于已完成的分片，而且包含以前的批次。
+    """
+    batch_id = batch_id or latest_batch(queue_dir)
+    status = {"type": "cluster_status", "batch_id": batch_id}
+    for kind in ("pending", "running", "done", "failed"):
+        status[kind] = len(list_shards(queue_dir, kind, batch_id))
+    pages = bytes_written = 0
+    counts = collections.defaultdict(lambda: {"pages_done": 0, "shards_done": 0, "shards_failed": 0})
+    for kind in ("done", "failed"):
+        for shard_id in list_shards(queue_dir, kind, batch_id):
+            shard = read_json(queue_path(queue_dir, kind, f"{shard_id}.json")) or {}
+            node_counts = counts[shard.get("node", "?")]
+            node_counts[f"shards_{kind}"] += 1
+            node_counts["pages_done"] += shard.get("pages_done", 0)
+            if kind == "done":
+                pages += shard.get("pages_done", 0)
+                bytes_written += shard.get("bytes_written", 0)
+    nodes = {node["node"]: node for node in read_nodes(queue_dir)}
+    for node_id in counts.keys() - nodes.keys():
+        # 没有心跳的节点（心跳文件已删除）
+        nodes[node_id] = {"node": node_id, "alive": False}
+    status.update({
+        "pages_done": pages,
+        "bytes_written": bytes_written,
+        "nodes_alive": sum(1 for node in nodes.values() if node["alive"]),
+        "pages_per_sec": round(sum(node["pages_per_sec"] for node in nodes.values()
+                                   if node["alive"]), 2),
+        "nodes": [
+            {
+                **{key: node.get(key, 0) for key in ("node", "alive", "workers", "shards_lost",
+                                                     "pages_per_sec")},
+                **counts.get(node_id, {"pages_done": 0, "shards_done": 0, "shards_failed": 0})
+            }
+            for node_id, node in sorted(nodes.items())
+        ]
+    })
+    return status
+
+
+def wait_batch(queue_dir, batch_id=None, reporter=None, interval=STATUS_INTERVAL,
+               stop_event=None, local_nodes=()):
+    """
+    协调端：等待批次完成
+
+    放回过期的分片，把完成的分片合并进各文件的续转清单（清单只在这里写入），
+    文件的分片全部结束时输出 file_complete / file_error，定期输出 cluster_status，
+    最后输出按节点汇总的 summary。local_nodes 为本机启动的节点进程（local 命令），
+    批次结束后先等它们退出（写出 stopped 心跳），最后的 cluster_status 才显示节点已停止。
+
+    Returns:
+        summary 消息，批次不存在时返回 None
+    """
+    batch_id = batch_id or latest_batch(queue_dir)
+    batch = read_json(queue_path(queue_dir, "batches", f"{batch_id}.json")) if batch_id else None
+    if batch is None:
+        return None
+    reporter = reporter or JsonLinesReporter()
+
+    files = {entry["file_index"]: entry for entry in batch["files"]}
+    remaining = {file_index: set(entry["shards"]) for file_index, entry in files.items()}
+    manifests = {}
+    errors = {}
+    finished_files = set()
+    merged = set()
+    nodes = collections.defaultdict(lambda: {"shards": 0, "pages": 0, "bytes": 0, "busy_time": 0.0})
+    totals = {"pages": 0, "bytes": 0, "first_start": None, "last_finish": None}
+    last_status = 0.0
+
+    while True:
+        requeue_expired(queue_dir)
+
+        dirty = set()
+        for kind in ("done", "failed"):
+            for shard_id in list_shards(queue_dir, kind, batch_id):
+                if shard_id in merged:
+                    continue
+                shard = read_json(queue_path(queue_dir, kind, f"{shard_id}.json"))
+                if shard is None:
+                    continue
+                merged.add(shard_id)
+                file_index = shard["file_index"]
+                remaining[file_index].discard(shard_id)
+                if kind == "failed":
+                    errors.setdefault(file_index, shard.get("error", "未知错误"))
+                page_results = shard.get("page_results", {})
+                if page_results:
+                    if file_index not in manifests:
+                        manifests[file_index] = load_manifest(files[file_index]["output_dir"])
+                    if manifests[file_index] is not None:
+                        manifests[file_index]["pages"].update(page_results)
+                        dirty.add(file_index)
+                node = nodes[shard.get("node", "?")]
+                node["shards"] += 1
+                node["pages"] += shard.get("pages_done", 0)
+                node["bytes"] += shard.get("bytes_written", 0)
+                node["busy_time"] += shard.get("elapsed", 0.0)
+                totals["pages"] += shard.get("pages_done", 0)
+                totals["bytes"] += shard.get("bytes_written", 0)
+                if "started" in shard:
+                    totals["first_start"] = min(totals["first_start"] or shard["started"],
+                                                shard["started"])
+                    totals["last_finish"] = max(totals["last_finish"] or 0, shard["finished"])
+        for file_index in dirty:
+            try:
+                save_manifest(files[file_index]["output_dir"], manifests[file_index])
+            except OSError:
+                pass
+
+        for file_index, entry in files.items():
+            if file_index in finished_files or remaining[file_index]:
+                continue
+            finished_files.add(file_index)
+            error = entry.get("error") or errors.get(file_index)
+            message = {
+                "type": "file_error" if error else "file_complete",
+                "file_index": file_index,
+                "filename": entry["filename"]
+            }
+            if error:
+                message["error"] = error
+            reporter.put(message)
+
+        done = len(finished_files) == len(files)
+        stopped = stop_event is not None and stop_event.is_set()
+        if done or stopped:
+            for node in local_nodes:
+                node.join()
+        if done or stopped or time.monotonic() - last_status >= interval:
+            last_status = time.monotonic()
+            reporter.put(cluster_status(queue_dir, batch_id))
+        if done or stopped:
+            break
+        time.sleep(POLL_INTERVAL)
+
+    error_count = sum(1 for file_index in finished_files
+                      if files[file_index].get("error") or file_index in errors)
+    wall_time = 0.0
+    if totals["first_start"] is not None:
+        wall_time = totals["last_finish"] - totals["first_start"]
+    summary = {
+        "type": "summary",
+        "batch_id": batch_id,
+        "files": len(files),
+        "success_count": len(finished_files) - error_count,
+        "error_count": error_count,
+        "pages": totals["pages"],
+        "skipped_pages": sum(entry["skipped_pages"] for entry in files.values()),
+        "mb_written": round(totals["bytes"] / (1024 * 1024), 2),
+        "wall_time": round(wall_time, 3),
+        "pages_per_sec": round(totals["pages"] / wall_time, 2) if wall_time > 0 else 0.0,
+        "nodes": {
+            node_id: {
+                **info,
+                "busy_time": round(info["busy_time"], 3),
+                "pages_per_sec": round(info["pages"] / info["busy_time"], 2)
+                if info["busy_time"] > 0 else 0.0
+            }
+            for node_id, info in sorted(nodes.items())
+        },
+        "stopped": not done
+    }
+    reporter.put(summary)
+    return summary
+
+
+# ---------- 命令行 ----------
+
+def build_parser():
+    """构建命令行参数解析器"""
+    parser = argparse.ArgumentParser(description="多机分布式转换（共享目录工作队列）")
+    parser.add_argument("--version", action="version", version=f"%(prog)s {__version__}")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_submit_arguments(command):
+        add_conversion_arguments(command)
+        command.add_argument("--queue", required=True, help="共享文件系统上的工作队列目录")
+        command.add_argument("--shard-pages", type=int, default=DEFAULT_SHARD_PAGES,
+                             help=f"每个分片的页数（默认 {DEFAULT_SHARD_PAGES}，归档输出时每个文件一个分片）")
+        command.add_argument("--lease", type=float, default=LEASE_SECONDS,
+                             help=f"租约时长（秒），节点超时未续租时分片交给其他节点（默认 {LEASE_SECONDS}）")
+
+    def add_interval_argument(command):
+        command.add_argument("--interval", type=float, default=STATUS_INTERVAL,
+                             help=f"输出状态的间隔（秒，默认 {STATUS_INTERVAL:g}）")
+
+    submit = commands.add_parser("submit", help="切分批次并写入工作队列")
+    add_submit_arguments(submit)
+
+    worker = commands.add_parser("worker", help="运行工作节点（每台机器一个）")
+    worker.add_argument("--queue", required=True, help="工作队列目录")
+    worker.add_argument("--workers", type=int, default=default_worker_count(),
+                        help="本机渲染进程数（默认 CPU 核心数）")
+    worker.add_argument("--node-id", help="节点名称（默认 主机名-进程号）")
+    worker.add_argument("--exit-when-idle", action="store_true",
+                        help="队列中没有待处理和处理中的分片时退出")
+
+    wait = commands.add_parser("wait", help="汇总进度并写续转清单，直到批次完成")
+    wait.add_argument("--queue", required=True, help="工作队列目录")
+    wait.add_argument("--batch", help="批次编号（默认最近提交的批次）")
+    add_interval_argument(wait)
+
+    status = commands.add_parser("status", help="输出一次队列状态（JSON）")
+    status.add_argument("--queue", required=True, help="工作队列目录")
+    status.add_argument("--batch", help="批次编号（默认最近提交的批次）")
+
+    local = commands.add_parser("local", help="提交批次并在本机启动多个节点（测试用）")
+    add_submit_arguments(local)
+    local.add_argument("--nodes", type=int, default=2, help="节点数（默认 2）")
+    local.add_argument("--workers", type=int, default=1, help="每个节点的渲染进程数（默认 1）")
+    add_interval_argument(local)
+    return parser
+
+
+def submit_from_args(args):
+    """submit / local：整理参数并提交，出错时返回 None"""
+    pdf_files = collect_pdf_files(args.inputs, args.recursive)
+    if not pdf_files:
+        print("✗ 没有找到 PDF 文件", file=sys.stderr)
+        return None
+    try:
+        output_format, dpi, options = conversion_settings(args)
+    except ValueError as e:
+        print(f"✗ {e}", file=sys.stderr)
+        return None
+    os.makedirs(args.output, exist_ok=True)
+    batch = submit_batch(args.queue, pdf_files, args.output, output_format, args.quality, dpi,
+                         options, args.shard_pages, args.lease)
+    JsonLinesReporter().put({
+        "type": "batch_submitted",
+        "batch_id": batch["batch_id"],
+        "total_files": batch["total_files"],
+        "total_pages": batch["total_pages"],
+        "pending_pages": batch["pending_pages"],
+        "shards": batch["total_shards"]
+    })
+    return batch
+
+
+def main(argv=None):
+    """命令行入口"""
+    multiprocessing.freeze_support()
+    args = build_parser().parse_args(argv)
+
+    if args.command == "worker":
+        node_main(args.queue, args.workers, args.node_id, args.exit_when_idle)
+        return 0
+    if args.command == "status":
+        print(json.dumps(cluster_status(args.queue, args.batch), ensure_ascii=False))
+        return 0
+
+    stop_event = Event()
+    if args.command in ("submit", "local"):
+        batch = submit_from_args(args)
+        if batch is None:
+            return 2
+        if args.command == "submit":
+            return 0
+        batch_id = batch["batch_id"]
+        # 节点是普通进程（守护进程不能再创建渲染进程），Ctrl+C 同时送达各节点
+        nodes = [
+            Process(target=node_main, args=(args.queue, args.workers, f"local-{i + 1}", True))
+            for i in range(max(1, args.nodes))
+        ]
+        for node in nodes:
+            node.start()
+    else:
+        batch_id = args.batch
+        nodes = []
+
+    signal.signal(signal.SIGINT, lambda signum, frame: stop_event.set())
+    summary = wait_batch(args.queue, batch_id, interval=args.interval,
+                         stop_event=stop_event, local_nodes=nodes)
+    if summary is None:
+        print("✗ 队列中没有批次", file=sys.stderr)
+        return 2
+    if summary["stopped"]:
+        return 130
+    return 1 if summary["error_count"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,606 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PDF 转图片工具 - 图片编码器
+把渲染得到的原始像素编码为 PNG / JPG / TIFF / WebP
+
+- PNG 与 TIFF（含多页 TIFF）由本模块直接用 zlib 编码，不依赖第三方库
+- 安装了 Pillow 时，JPG 支持渐进式与色度抽样设置，并可输出 WebP；
+  未安装时 JPG 使用 MuPDF 自带的编码器
+- 预设 fast / balanced / smallest 在编码耗时与文件大小之间取舍，单项参数可覆盖预设
+
+作者: zhifouli
+GitHub: https://github.com/zhifouli?tab=repositories
+"""
+
+import io
+import struct
+import zlib
+import importlib.util
+
+# 支持的输出格式（WebP 需要 Pillow）
+OUTPUT_FORMATS = ("png", "jpg", "tiff", "webp")
+
+# PNG 编码
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_ROWS_PER_BLOCK = 64
+PNG_FILTERS = ("none", "sub", "up", "adaptive")
+PNG_FILTER_TYPES = {"none": 0, "sub": 1, "up": 2}
+
+# JPG 色度抽样
+JPEG_SUBSAMPLING = ("4:4:4", "4:2:2", "4:2:0")
+
+# TIFF 每个条带的行数
+TIFF_ROWS_PER_STRIP = 64
+
+# 黑白输出的默认阈值：灰度低于该值的像素为黑色
+BILEVEL_THRESHOLD = 128
+
+# 编码预设：速度与文件大小的取舍
+ENCODER_PRESETS = {
+    "fast": {
+        "png_compress_level": 1,
+        "png_filter": "none",
+        "jpeg_progressive": False,
+        "jpeg_subsampling": "4:2:0",
+        "jpeg_optimize": False,
+        "webp_method": 0,
+        "tiff_compress_level": 1,
+    },
+    "balanced": {
+        "png_compress_level": 6,
+        "png_filter": "none",
+        "jpeg_progressive": False,
+        "jpeg_subsampling": "4:2:0",
+        "jpeg_optimize": False,
+        "webp_method": 4,
+        "tiff_compress_level": 6,
+    },
+    "smallest": {
+        "png_compress_level": 9,
+        # 渲染出的文字页面带抗锯齿灰边，行过滤通常反而使文件变大
+        "png_filter": "none",
+        "jpeg_progressive": True,
+        "jpeg_subsampling": "4:2:0",
+        "jpeg_optimize": True,
+        "webp_method": 6,
+        "tiff_compress_level": 9,
+    },
+}
+DEFAULT_PRESET = "balanced"
+
+
+def pillow_available():
+    """是否安装了 Pillow（只查找模块不导入，图形界面启动时调用也不会加载 Pillow）"""
+    return importlib.util.find_spec("PIL") is not None
+
+
+def _pil_image():
+    """按需导入 Pillow 的 Image 模块（Pillow 为可选依赖），未安装时返回 None"""
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    return Image
+
+
+def available_formats():
+    """当前环境可用的输出格式"""
+    return tuple(f for f in OUTPUT_FORMATS if f != "webp" or pillow_available())
+
+
+def encoder_settings(options):
+    """
+    合并编码预设与单项参数
+
+    Args:
+        options: 扩展选项，"encoder_preset" 选择预设，
+            预设中的各项（如 "png_compress_level"）不为 None 时覆盖预设
+
+    Returns:
+        完整的编码参数字典（含 "preset"）
+    """
+    preset = options.get("encoder_preset") or DEFAULT_PRESET
+    if preset not in ENCODER_PRESETS:
+        raise ValueError(f"未知的编码预设: {preset}")
+    settings = dict(ENCODER_PRESETS[preset])
+    for key in settings:
+        if options.get(key) is not None:
+            settings[key] = options[key]
+    settings["preset"] = preset
+    return settings
+
+
+def _byte_difference(a, b):
+    """
+    逐字节计算 (a - b) mod 256
+
+    用大整数一次完成整块运算（SWAR）：每个字节先置最高位再相减，
+    保证借位不会跨越字节，最后修正最高位。
+    """
+    size = len(a)
+    if size == 0:
+        return b""
+    high = int.from_bytes(b"\x80" * size, "big")
+    low = high ^ ((1 << (8 * size)) - 1)
+    x = int.from_bytes(a, "big")
+    y = int.from_bytes(b, "big")
+    diff = ((x | high) - (y & low)) ^ (((x ^ y) & high) ^ high)
+    return diff.to_bytes(size, "big")
+
+
+def filter_rows(samples, rows, stride, bpp, mode, prev_row=None):
+    """
+    对若干行像素做 PNG 行过滤
+
+    Args:
+        samples: rows 行紧密排列的像素
+        rows: 行数
+        stride: 每行字节数
+        bpp: 每像素字节数
+        mode: "none" / "sub" / "up"
+        prev_row: 上一行像素（"up" 过滤跨块时使用），首行为 None
+
+    Returns:
+        (带过滤类型字节的数据, 本块最后一行原始像素)
+    """
+    row_list = [samples[r * stride:(r + 1) * stride] for r in range(rows)]
+    last_row = row_list[-1] if row_list else prev_row
+    filter_byte = bytes([PNG_FILTER_TYPES[mode]])
+    if mode == "none":
+        return b"".join(filter_byte + row for row in row_list), last_row
+
+    current = b"".join(row_list)
+    if mode == "sub":
+        reference = b"".join(b"\x00" * bpp + row[:-bpp] for row in row_list)
+    else:
+        first = prev_row if prev_row is not None else b"\x00" * stride
+        reference = first + current[:-stride]
+    diff = _byte_difference(current, reference)
+    return (b"".join(filter_byte + diff[r * stride:(r + 1) * stride] for r in range(rows)),
+            last_row)
+
+
+def threshold_gray(samples, threshold):
+    """把灰度像素二值化为 0/255（仍为每像素 1 字节）"""
+    table = bytes(0 if v < threshold else 255 for v in range(256))
+    return bytes(samples).translate(table)
+
+
+def pack_bits(samples, width, rows, threshold):
+    """
+    把灰度像素二值化并按位打包（每行补齐到整字节，1 为白色）
+
+    先用 translate 把每个像素映射为字符 "0"/"1"，再按二进制字符串整行转换为整数，
+    避免逐像素的 Python 循环。
+    """
+    table = bytes(48 if v < threshold else 49 for v in range(256))
+    bits = bytes(samples).translate(table)
+    padding = b"0" * ((-width) % 8)
+    row_bytes = (width + 7) // 8
+    return b"".join(
+        int(bits[r * width:(r + 1) * width] + padding, 2).to_bytes(row_bytes, "big")
+        for r in range(rows)
+    )
+
+
+def _png_chunk(tag, data):
+    """生成一个 PNG 数据块"""
+    return (struct.pack(">I", len(data)) + tag + data
+            + struct.pack(">I", zlib.crc32(tag + data) & 0xffffffff))
+
+
+def _png_header(width, height, n, dpi, bit_depth=8):
+    """PNG 文件头、IHDR 与记录分辨率的 pHYs 块"""
+    color_type = {1: 0, 3: 2}[n]
+    ppm = int(round(dpi / 0.0254))
+    return b"".join([
+        PNG_SIGNATURE,
+        _png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, bit_depth, color_type,
+                                        0, 0, 0)),
+        _png_chunk(b"pHYs", struct.pack(">IIB", ppm, ppm, 1))
+    ])
+
+
+def _stream_filter(mode):
+    """逐行编码时使用的过滤方式（自适应过滤只有 Pillow 支持，退化为 up）"""
+    return "up" if mode == "adaptive" else mode
+
+
+def encode_png(samples, width, height, n, dpi, compress_level=6, filter_mode="none",
+               threshold=None):
+    """
+    将像素数据编码为 PNG
+
+    zlib 压缩期间会释放 GIL，因此可以在多个编码线程中并行执行。
+    "none" 不做行过滤（与 MuPDF 的 PNG 输出一致，最快）；
+    "sub"/"up"/"adaptive" 对大面积渐变或照片类页面可能缩小文件，
+    对文字页面通常反而变大；"adaptive" 在安装了 Pillow 时逐行挑选过滤方式，
+    否则按 "up" 处理。
+
+    Args:
+        samples: 像素数据（逐行紧密排列）
+        width: 宽度
+        height: 高度
+        n: 每像素通道数（1 灰度 / 3 RGB）
+        dpi: 写入 pHYs 块的分辨率
+        compress_level: zlib 压缩级别 0-9
+        filter_mode: 行过滤方式，见 PNG_FILTERS
+        threshold: 不为 None 时输出 1 位黑白 PNG（samples 须为灰度）
+    """
+    if filter_mode == "adaptive" and threshold is None and _pil_image() is not None:
+        return _pillow_encode(samples, width, height, n, "PNG", dpi=(dpi, dpi),
+                              compress_level=compress_level)
+
+    mode = _stream_filter(filter_mode)
+    stride = width * n
+    compressor = zlib.compressobj(compress_level)
+    idat = []
+    prev_row = None
+    for y in range(0, height, PNG_ROWS_PER_BLOCK):
+        rows = min(height, y + PNG_ROWS_PER_BLOCK) - y
+        block = samples[y * stride:(y + rows) * stride]
+        if threshold is None:
+            block, prev_row = filter_rows(block, rows, stride, n, mode, prev_row)
+        else:
+            block, prev_row = filter_rows(pack_bits(block, width, rows, threshold), rows,
+                                          (width + 7) // 8, 1, mode, prev_row)
+        idat.append(compressor.compress(block))
+    idat.append(compressor.flush())
+
+    return b"".join([
+        _png_header(width, height, n, dpi, 8 if threshold is None else 1),
+        _png_chunk(b"IDAT", b"".join(idat)),
+        _png_chunk(b"IEND", b"")
+    ])
+
+
+class PngStreamWriter:
+    """
+    逐段写出 PNG 文件
+
+    像素按行追加，压缩后立即写入 IDAT 块，不需要在内存中保留整张图片。
+    """
+
+    def __init__(self, path, width, height, n, dpi, compress_level=6, filter_mode="none",
+                 threshold=None):
+        self.width = width
+        self.stride = width * n
+        self.n = n
+        self.threshold = threshold
+        self.filter_mode = _stream_filter(filter_mode)
+        self.prev_row = None
+        self.bytes_written = 0
+        self.compressor = zlib.compressobj(compress_level)
+        self.file = open(path, "wb")
+        self._write(_png_header(width, height, n, dpi, 8 if threshold is None else 1))
+
+    def _write(self, data):
+        self.file.write(data)
+        self.bytes_written += len(data)
+
+    def write_rows(self, samples, rows):
+        """追加若干行像素（samples 为紧密排列的 rows 行数据）"""
+        stride = self.stride
+        for y in range(0, rows, PNG_ROWS_PER_BLOCK):
+            count = min(rows, y + PNG_ROWS_PER_BLOCK) - y
+            block = samples[y * stride:(y + count) * stride]
+            if self.threshold is None:
+                block, self.prev_row = filter_rows(
+                    block, count, stride, self.n, self.filter_mode, self.prev_row
+                )
+            else:
+                block, self.prev_row = filter_rows(
+                    pack_bits(block, self.width, count, self.threshold), count,
+                    (self.width + 7) // 8, 1, self.filter_mode, self.prev_row
+                )
+            compressed = self.compressor.compress(block)
+            if compressed:
+                self._write(_png_chunk(b"IDAT", compressed))
+
+    def close(self):
+        """写出剩余数据和 IEND"""
+        self._write(_png_chunk(b"IDAT", self.compressor.flush()))
+        self._write(_png_chunk(b"IEND", b""))
+        self.file.close()
+
+    def abort(self):
+        """出错时关闭文件（不完整的文件保留，由续转清单判定无效）"""
+        self.file.close()
+
+
+def compress_tiff_page(samples, width, height, n, dpi, compress_level=6, threshold=None):
+    """
+    压缩一页 TIFF 的像素条带（不涉及文件位置，可在编码线程中并行执行）
+
+    Args:
+        threshold: 不为 None 时为 1 位黑白（samples 须为灰度）
+
+    Returns:
+        TiffWriter.write_page() 使用的页面数据
+    """
+    stride = width * n
+    strips = []
+    for y in range(0, height, TIFF_ROWS_PER_STRIP):
+        rows = min(height, y + TIFF_ROWS_PER_STRIP) - y
+        strip = samples[y * stride:(y + rows) * stride]
+        if threshold is not None:
+            strip = pack_bits(strip, width, rows, threshold)
+        strips.append(zlib.compress(strip, compress_level))
+    return {
+        "width": width,
+        "height": height,
+        "n": n,
+        "dpi": dpi,
+        "bits": 8 if threshold is None else 1,
+        "strips": strips,
+        "bytes": sum(len(strip) for strip in strips)
+    }
+
+
+def join_tiff_pages(pages):
+    """
+    把同一页自上而下各段的 compress_tiff_page() 结果合并为一页
+
+    除最后一段外，各段的行数须为 TIFF_ROWS_PER_STRIP 的整数倍，合并后每个条带的行数不变。
+    """
+    strips = [strip for page in pages for strip in page["strips"]]
+    return dict(pages[0], height=sum(page["height"] for page in pages), strips=strips,
+                bytes=sum(len(strip) for strip in strips))
+
+
+class TiffWriter:
+    """
+    顺序写出 TIFF 文件（小端序，Deflate 压缩，可包含多页）
+
+    每页按 IFD、附加数据、像素条带的顺序连续写出，写之前就能算出全部偏移，
+    IFD 的“下一页”偏移直接指向本页之后；只有 close() 时回到最后一页把它改为 0，
+    因此写入过程是纯顺序的，可以使用大缓冲区。
+    """
+
+    def __init__(self, fileobj):
+        self.file = fileobj
+        self.start = fileobj.tell()
+        self.last_pointer = None
+        # 第一页紧跟在 8 字节文件头之后
+        self.file.write(b"II*\x00\x08\x00\x00\x00")
+
+    def _offset(self):
+        return self.file.tell() - self.start
+
+    def write_page(self, page):
+        """
+        追加一页（page 由 compress_tiff_page() 生成）
+
+        Returns:
+            本页 IFD 在文件中的偏移
+        """
+        if self._offset() % 2:
+            self.file.write(b"\x00")
+        width, height, n = page["width"], page["height"], page["n"]
+        strips = page["strips"]
+        resolution = int(round(page["dpi"] * 100))
+
+        # 计算布局：IFD | 分辨率 | 每通道位数 | 条带偏移表 | 条带字节数表 | 条带
+        entry_count = 13
+        ifd_offset = self._offset()
+        resolution_offset = ifd_offset + 2 + 12 * entry_count + 4
+        bits_offset = resolution_offset + 16
+        offsets_offset = bits_offset + 6 + 2
+        counts_offset = offsets_offset + 4 * len(strips)
+        strip_offsets = []
+        position = counts_offset + 4 * len(strips)
+        for strip in strips:
+            strip_offsets.append(position)
+            position += len(strip)
+        next_offset = position + position % 2
+
+        # 只有一个条带时条带表的值直接存放在 IFD 中
+        single = len(strips) == 1
+        entries = [
+            (256, 4, 1, width),
+            (257, 4, 1, height),
+            (258, 3, n, page["bits"] if n == 1 else bits_offset),
+            (259, 3, 1, 8),
+            (262, 3, 1, 1 if n == 1 else 2),
+            (273, 4, len(strips), strip_offsets[0] if single else offsets_offset),
+            (277, 3, 1, n),
+            (278, 4, 1, TIFF_ROWS_PER_STRIP),
+            (279, 4, len(strips), len(strips[0]) if single else counts_offset),
+            (282, 5, 1, resolution_offset),
+            (283, 5, 1, resolution_offset + 8),
+            (284, 3, 1, 1),
+            (296, 3, 1, 2),
+        ]
+        ifd = [struct.pack("<H", entry_count)]
+        for tag, field_type, count, value in entries:
+            if field_type == 3 and count == 1:
+                ifd.append(struct.pack("<HHIHH", tag, field_type, count, value, 0))
+            else:
+                ifd.append(struct.pack("<HHII", tag, field_type, count, value))
+        self.last_pointer = self.file.tell() + 2 + 12 * entry_count
+        ifd.append(struct.pack("<I", next_offset))
+        ifd.append(struct.pack("<IIII", resolution, 100, resolution, 100))
+        ifd.append(struct.pack("<3Hxx", 8, 8, 8))
+        ifd.append(struct.pack(f"<{len(strips)}I", *strip_offsets))
+        ifd.append(struct.pack(f"<{len(strips)}I", *(len(strip) for strip in strips)))
+        self.file.write(b"".join(ifd))
+        for strip in strips:
+            self.file.write(strip)
+        return ifd_offset
+
+    def add_page(self, samples, width, height, n, dpi, compress_level=6, threshold=None):
+        """压缩并追加一页"""
+        return self.write_page(compress_tiff_page(samples, width, height, n, dpi,
+                                                  compress_level, threshold))
+
+    def close(self):
+        """把最后一页的“下一页”偏移改为 0（不关闭文件对象）"""
+        if self.last_pointer is not None:
+            end = self.file.tell()
+            self.file.seek(self.last_pointer)
+            self.file.write(b"\x00\x00\x00\x00")
+            self.file.seek(end)
+
+
+def encode_tiff(samples, width, height, n, dpi, compress_level=6, threshold=None):
+    """将像素数据编码为单页 TIFF"""
+    buffer = io.BytesIO()
+    writer = TiffWriter(buffer)
+    writer.add_page(samples, width, height, n, dpi, compress_level, threshold)
+    writer.close()
+    return buffer.getvalue()
+
+
+def _pillow_encode(samples, width, height, n, image_format, **params):
+    """用 Pillow 编码（Pillow 编码期间释放 GIL，可在编码线程中并行）"""
+    mode = "L" if n == 1 else "RGB"
+    image = _pil_image().frombuffer(mode, (width, height), samples, "raw", mode, 0, 1)
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, **params)
+    return buffer.getvalue()
+
+
+class PngEncoder:
+    """PNG 编码器"""
+
+    extension = "png"
+    thread_safe = True
+
+    def __init__(self, quality, settings):
+        self.compress_level = settings["png_compress_level"]
+        self.filter_mode = settings["png_filter"]
+        self.threshold = settings["bilevel_threshold"]
+
+    def encode(self, samples, width, height, n, dpi):
+        return encode_png(samples, width, height, n, dpi,
+                          self.compress_level, self.filter_mode, self.threshold)
+
+    def stream_writer(self, path, width, height, n, dpi):
+        """逐段写出的 PNG 文件（分块渲染超大页面时使用）"""
+        return PngStreamWriter(path, width, height, n, dpi,
+                               self.compress_level, self.filter_mode, self.threshold)
+
+
+class TiffEncoder:
+    """TIFF 编码器（Deflate 压缩）"""
+
+    extension = "tiff"
+    thread_safe = True
+
+    def __init__(self, quality, settings):
+        self.compress_level = settings["tiff_compress_level"]
+        self.threshold = settings["bilevel_threshold"]
+
+    def encode(self, samples, width, height, n, dpi):
+        return encode_tiff(samples, width, height, n, dpi, self.compress_level,
+                           self.threshold)
+
+    def encode_page(self, samples, width, height, n, dpi):
+        """只压缩条带，由多页 TIFF 输出按顺序写入"""
+        return compress_tiff_page(samples, width, height, n, dpi, self.compress_level,
+                                  self.threshold)
+
+
+class PillowJpegEncoder:
+    """Pillow JPG 编码器：支持渐进式、色度抽样和霍夫曼表优化"""
+
+    extension = "jpg"
+    thread_safe = True
+
+    def __init__(self, quality, settings):
+        self.threshold = settings["bilevel_threshold"]
+        self.params = {
+            "quality": quality,
+            "progressive": settings["jpeg_progressive"],
+            "optimize": settings["jpeg_optimize"],
+            "subsampling": settings["jpeg_subsampling"],
+        }
+
+    def encode(self, samples, width, height, n, dpi):
+        if self.threshold is not None:
+            samples = threshold_gray(samples, self.threshold)
+        return _pillow_encode(samples, width, height, n, "JPEG",
+                              dpi=(dpi, dpi), **self.params)
+
+
+class MupdfJpegEncoder:
+    """
+    MuPDF JPG 编码器（未安装 Pillow 时使用）
+
+    依赖 fitz 对象，只能在渲染线程中调用。
+    """
+
+    extension = "jpg"
+    thread_safe = False
+
+    def __init__(self, quality, settings):
+        self.quality = quality
+        self.threshold = settings["bilevel_threshold"]
+
+    def encode_pixmap(self, pix, dpi):
+        if self.threshold is not None:
+            return self.encode(pix.samples, pix.width, pix.height, pix.n, dpi)
+        pix.set_dpi(round(dpi), round(dpi))
+        return pix.tobytes("jpeg", jpg_quality=self.quality)
+
+    def encode(self, samples, width, height, n, dpi):
+        import fitz  # PyMuPDF
+        if self.threshold is not None:
+            samples = threshold_gray(samples, self.threshold)
+            pix = fitz.Pixmap(fitz.csGRAY, width, height, samples, False)
+            pix.set_dpi(round(dpi), round(dpi))
+            return pix.tobytes("jpeg", jpg_quality=self.quality)
+        colorspace = fitz.csGRAY if n == 1 else fitz.csRGB
+        return self.encode_pixmap(fitz.Pixmap(colorspace, width, height, samples, False), dpi)
+
+
+class WebpEncoder:
+    """WebP 编码器（需要 Pillow），质量 100 时为无损压缩"""
+
+    extension = "webp"
+    thread_safe = True
+
+    def __init__(self, quality, settings):
+        self.threshold = settings["bilevel_threshold"]
+        self.params = {
+            "quality": quality,
+            "lossless": quality >= 100,
+            "method": settings["webp_method"],
+        }
+
+    def encode(self, samples, width, height, n, dpi):
+        if self.threshold is not None:
+            samples = threshold_gray(samples, self.threshold)
+        return _pillow_encode(samples, width, height, n, "WEBP", **self.params)
+
+
+def make_encoder(output_format, quality, options):
+    """
+    创建输出格式对应的编码器
+
+    编码器提供 extension、thread_safe 和 encode(samples, width, height, n, dpi)；
+    thread_safe 为 False 的编码器还提供 encode_pixmap(pix, dpi)，须在渲染线程中调用。
+    options["colorspace"] 为 "bilevel" 时，编码器接收灰度像素并按阈值二值化：
+    PNG/TIFF 输出 1 位图片，JPG/WebP 输出只含黑白两色的灰度图片。
+
+    Raises:
+        ValueError: 格式未知，或所需的 Pillow 未安装
+    """
+    settings = encoder_settings(options)
+    settings["bilevel_threshold"] = None
+    if options.get("colorspace") == "bilevel":
+        settings["bilevel_threshold"] = options.get("bilevel_threshold") or BILEVEL_THRESHOLD
+    if output_format == "png":
+        return PngEncoder(quality, settings)
+    if output_format == "tiff":
+        return TiffEncoder(quality, settings)
+    if output_format == "jpg":
+        if _pil_image() is not None:
+            return PillowJpegEncoder(quality, settings)
+        return MupdfJpegEncoder(quality, settings)
+    if output_format == "webp":
+        if _pil_image() is None:
+            raise ValueError("输出 WebP 格式需要安装 Pillow: pip install pillow")
+        return WebpEncoder(quality, settings)
+    raise ValueError(f"不支持的输出格式: {output_format}")
@@ -0,0 +1,2997 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PDF 转图片工具 - 渲染引擎
+页面渲染、编码流水线、渲染进程池、任务调度和断点续转清单。
+
+导入本模块会加载 PyMuPDF；图形界面不直接导入本模块，只在转换进程中使用，
+命令行、基准测试和转换服务直接导入。
+
+作者: zhifouli
+GitHub: https://github.com/zhifouli?tab=repositories
+"""
+
+import os
+import time
+import shutil
+import signal
+import json
+import hashlib
+import threading
+import heapq
+import queue
+import collections
+from pathlib import Path
+import multiprocessing
+import multiprocessing.connection
+from multiprocessing import Process, resource_tracker, shared_memory
+import fitz  # PyMuPDF
+
+from pdf2img_encoders import (
+    DEFAULT_PRESET,
+    OUTPUT_FORMATS,
+    TIFF_ROWS_PER_STRIP,
+    encoder_settings,
+    make_encoder,
+)
+from pdf2img_sinks import completed_archive_pages, make_sink
+from pdf2img_worker import default_worker_count
+
+
+# 单个渲染任务最多包含的页数
+MAX_CHUNK_PAGES = 16
+
+# 每个工作进程同时保持打开的文档数
+DOCUMENT_CACHE_SIZE = 4
+
+# 输入预读每次读取的字节数（两次读取之间检查是否已关闭）
+PREFETCH_READ_BYTES = 8 * 1024 * 1024
+
+# Linux 共享内存所在的文件系统，预读前检查剩余空间（容器中通常只有 64 MB）
+SHM_DIR = "/dev/shm"
+
+# 断点续转清单文件名（位于每个 <name>_imgs 输出目录中）
+MANIFEST_NAME = "pdf2img_manifest.json"
+MANIFEST_VERSION = 1
+
+# 输出根目录中的隔离名单：导致渲染进程崩溃或超时的文件
+QUARANTINE_NAME = "pdf2img_quarantine.json"
+
+# 检查文件超时的间隔（秒）
+FILE_TIMEOUT_CHECK_INTERVAL = 1.0
+
+# 单页处理的各个阶段
+STAGES = ("open", "render", "encode", "write")
+
+# 耗时统计中列出的最慢页面数
+SLOWEST_PAGES = 10
+
+# 计算源文件指纹时，从文件头尾各读取的字节数
+FINGERPRINT_SAMPLE_BYTES = 1024 * 1024
+
+# 清单最短写盘间隔（秒）
+MANIFEST_FLUSH_INTERVAL = 2.0
+
+# 扫描件直通时判断图片铺满页面的最小容差（点）
+PASSTHROUGH_TOLERANCE = 2
+
+# 输出颜色模式
+COLORSPACES = ("rgb", "gray", "bilevel", "auto")
+
+# 渲染档案：文字/图形的抗锯齿级别（0-8，0 为关闭）、是否渲染注释和表单控件
+# quality 为 MuPDF 默认的最高质量；draft 用于预览，ocr 用于文字识别（保留文字抗锯齿）
+RENDER_PROFILES = {
+    "quality": {"text_aa": 8, "graphics_aa": 8, "annots": True},
+    "draft": {"text_aa": 4, "graphics_aa": 0, "annots": False},
+    "ocr": {"text_aa": 8, "graphics_aa": 0, "annots": False},
+}
+
+# 空白页的处理方式：render 照常渲染（不检测）/ skip 不输出 / placeholder 输出很小的白色占位图
+BLANK_PAGE_MODES = ("render", "skip", "placeholder")
+
+# 空白页检测的灰度预览分辨率
+BLANK_PROBE_DPI = 24
+
+# 空白页占位图的分辨率（A4 页面约 8x11 像素）
+BLANK_PLACEHOLDER_DPI = 1
+
+# 自动颜色模式下检测页面是否含彩色内容的预览分辨率
+COLOR_PROBE_DPI = 48
+
+# 分块渲染时每个条带的最少行数，条带行数取它的整数倍；
+# 与 TIFF 每个条带的行数一致，多页 TIFF 可以把各条带合并为同一页
+TILE_MIN_ROWS = TIFF_ROWS_PER_STRIP
+
+# 开始前预估输出大小时各格式每个输出像素的字节数，按默认预设下的矢量图页面测得
+OUTPUT_BYTES_PER_PIXEL = {"png": 0.37, "jpg": 0.34, "tiff": 0.37, "webp": 0.21}
+
+# 转换中按实际写入的字节数复查剩余空间：完成的代价达到待渲染总代价的这个比例后开始，
+# 之后每隔 SPACE_RECHECK_INTERVAL 秒复查一次
+SPACE_RECHECK_FRACTION = 0.02
+SPACE_RECHECK_INTERVAL = 10.0
+
+# 使用上述经验值时各颜色模式相对彩色输出的系数
+COLORSPACE_SIZE_FACTOR = {"rgb": 1.0, "gray": 0.5, "bilevel": 0.1, "auto": 0.8}
+
+# 预估耗时：单个渲染进程每秒处理的输出像素数（按输出格式）
+PIXELS_PER_SECOND = {"png": 7e6, "jpg": 11e6, "tiff": 7e6, "webp": 3.5e6}
+
+# 检查剩余空间时在预估输出大小上留出的余量（预估只是经验值）
+SPACE_MARGIN = 1.2
+
+# 剩余空间不足时的处理方式：ignore 不检查 / warn 只发送 space_warning /
+# abort 停止批次 / ask 等待界面确认（控制队列中的 space_confirm 消息）
+SPACE_CHECKS = ("ignore", "warn", "abort", "ask")
+
+# 扩展选项默认值
+DEFAULT_OPTIONS = {
+    # 跳过输出目录清单中已完成且文件完好的页面
+    "resume": True,
+    # 渲染/编码/写盘流水线
+    "pipeline": True,
+    "encode_threads": 2,
+    "pipeline_depth": 4,
+    # 编码预设（fast / balanced / smallest），见 pdf2img_encoders.ENCODER_PRESETS
+    "encoder_preset": DEFAULT_PRESET,
+    # 单项编码参数，None 表示使用预设中的值
+    "png_compress_level": None,
+    "png_filter": None,
+    "jpeg_progressive": None,
+    "jpeg_subsampling": None,
+    "jpeg_optimize": None,
+    "webp_method": None,
+    "tiff_compress_level": None,
+    # 像素预算：单页最大像素数 / 最长边像素数，超出时降低该页 DPI；0 表示不限制
+    "max_pixels": 0,
+    "max_long_edge": 0,
+    # 扫描件直通：只含一张整页图片的页面直接输出原始图片，不重新渲染
+    "passthrough": False,
+    # 渲染档案，见 RENDER_PROFILES
+    "render_profile": "quality",
+    # 空白页处理方式，见 BLANK_PAGE_MODES；skip 只用于 dir 输出方式，其他输出方式写占位图
+    "blank_pages": "render",
+    # 空白页检测阈值：只有图片的页面，低分辨率灰度预览中与底色相差超过该值（0-255 灰度级）
+    # 的像素算作墨迹，没有墨迹像素才是空白；有文字或矢量图形的页面总是照常渲染
+    "blank_threshold": 32,
+    # 输出颜色模式：rgb / gray（灰度）/ bilevel（黑白）/ auto（无彩色内容的页面输出灰度）
+    "colorspace": "rgb",
+    # 黑白模式的阈值：灰度低于该值的像素为黑色
+    "bilevel_threshold": 128,
+    # 输出方式：dir 每页一个文件 / zip / tar / tiff（多页 TIFF），归档为每个 PDF 一个文件
+    "sink": "dir",
+    # 多输出：[{"dpi": 72, "format": "jpg"}, ...]，每页只解析一次，按各 DPI/格式分别输出到
+    # 子目录 <dpi>dpi_<格式>；None 表示只按 dpi / output_format 输出一份
+    "outputs": None,
+    # 进度消息合并间隔（秒），0 表示逐条发送
+    "progress_interval": 0.1,
+    # 每个进程用于页面像素的内存上限（MB），超大页面改为分块渲染；0 表示不限制
+    "tile_memory_mb": 256,
+    # 预计输出超过输出目录所在磁盘的剩余空间时的处理方式，见 SPACE_CHECKS
+    "space_check": "warn",
+    # 渲染进程超过这么多秒没有完成任何页面时视为卡死，结束并重启该进程；0 表示不限制
+    "page_timeout": 300,
+    # 单个文件从开始渲染起的总时长上限（秒），超时的文件记为失败；0 表示不限制
+    "file_timeout": 0,
+    # 跳过隔离名单中的文件（曾导致渲染进程崩溃或超时，且文件未改变）
+    "skip_quarantined": True,
+    # 输入预读：渲染当前文件时，后台把接下来的这么多个 PDF 读入共享内存，
+    # 渲染进程直接从内存打开（适合网络共享盘）；0 表示不预读
+    "prefetch_files": 0,
+    # 预读占用的内存上限（MB），放不下的文件照常从路径打开
+    "prefetch_mb": 256,
+}
+
+
+def resolve_options(options=None):
+    """合并扩展选项与默认值"""
+    resolved = dict(DEFAULT_OPTIONS)
+    if options:
+        resolved.update(options)
+    return resolved
+
+
+def get_pdf_output_dir(output_dir, pdf_path):
+    """单个 PDF 的图片输出目录"""
+    return os.path.join(output_dir, f"{Path(pdf_path).stem}_imgs")
+
+
+def parse_outputs(outputs, default_format="png"):
+    """
+    整理多输出参数
+
+    Args:
+        outputs: 字符串 "72:jpg,150:jpg,300:png"（省略格式时使用 default_format），
+            或 [{"dpi": 72, "format": "jpg"}, ...]
+        default_format: 未指定格式时的输出格式
+
+    Returns:
+        [{"dpi": 72, "format": "jpg"}, ...]，重复项只保留一个
+
+    Raises:
+        ValueError: 参数无效
+    """
+    if isinstance(outputs, str):
+        items = []
+        for item in outputs.split(","):
+            item = item.strip()
+            if not item:
+                continue
+            dpi, _, output_format = item.partition(":")
+            items.append({"dpi": dpi, "format": output_format or default_format})
+    else:
+        items = list(outputs or [])
+
+    specs = []
+    for item in items:
+        try:
+            dpi = int(item["dpi"])
+            output_format = str(item.get("format") or default_format).lower()
+        except (KeyError, TypeError, ValueError, AttributeError):
+            raise ValueError(f"无效的输出: {item}")
+        if output_format == "jpeg":
+            output_format = "jpg"
+        if dpi <= 0 or output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"无效的输出: {item}")
+        spec = {"dpi": dpi, "format": output_format}
+        if spec not in specs:
+            specs.append(spec)
+    if not specs:
+        raise ValueError("至少需要一个输出")
+    return specs
+
+
+def output_subdir(spec):
+    """多输出时某个输出的子目录名"""
+    return f"{spec['dpi']}dpi_{spec['format']}"
+
+
+def file_fingerprint(pdf_path):
+    """
+    计算源文件指纹：大小、修改时间，以及文件头尾采样的 SHA-256
+
+    只对头尾采样做哈希，避免每次续转都完整读取大文件。
+    """
+    stat = os.stat(pdf_path)
+    digest = hashlib.sha256()
+    with open(pdf_path, "rb") as f:
+        digest.update(f.read(FINGERPRINT_SAMPLE_BYTES))
+        if stat.st_size > FINGERPRINT_SAMPLE_BYTES:
+            f.seek(max(FINGERPRINT_SAMPLE_BYTES, stat.st_size - FINGERPRINT_SAMPLE_BYTES))
+            digest.update(f.read())
+    return {
+        "size": stat.st_size,
+        "mtime": int(stat.st_mtime),
+        "sample_sha256": digest.hexdigest()
+    }
+
+
+def load_manifest(pdf_output_dir):
+    """读取输出目录中的清单，不存在或已损坏时返回 None"""
+    try:
+        with open(os.path.join(pdf_output_dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(manifest, dict) or manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def save_manifest(pdf_output_dir, manifest):
+    """原子地写入清单（先写临时文件再替换）"""
+    os.makedirs(pdf_output_dir, exist_ok=True)
+    manifest_path = os.path.join(pdf_output_dir, MANIFEST_NAME)
+    temp_path = manifest_path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(temp_path, manifest_path)
+
+
+def load_quarantine(output_dir):
+    """
+    读取输出根目录中的隔离名单
+
+    Returns:
+        {PDF 绝对路径: {"source": 文件指纹, "error": 错误信息, "time": 隔离时间}}
+    """
+    try:
+        with open(os.path.join(output_dir, QUARANTINE_NAME), "r", encoding="utf-8") as f:
+            quarantine = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return quarantine if isinstance(quarantine, dict) else {}
+
+
+def save_quarantine(output_dir, quarantine):
+    """原子地写入隔离名单，名单为空时删除文件"""
+    quarantine_path = os.path.join(output_dir, QUARANTINE_NAME)
+    if not quarantine:
+        try:
+            os.remove(quarantine_path)
+        except OSError:
+            pass
+        return
+    os.makedirs(output_dir, exist_ok=True)
+    temp_path = quarantine_path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(quarantine, f, ensure_ascii=False, indent=1)
+    os.replace(temp_path, quarantine_path)
+
+
+def completed_pages_from_manifest(manifest, pdf_output_dir, fingerprint, settings,
+                                  pdf_name=None):
+    """
+    从清单中取出可以跳过的页面
+
+    源文件指纹或转换参数不一致时清单作废；
+    记录为已完成的页面还需输出文件存在且大小一致才算有效。
+    归档输出不能追加，只有整个归档已完成时才跳过（全部页面）。
+
+    Returns:
+        {页码(从 1 开始): 文件字节数}
+    """
+    if (manifest is None or manifest.get("source") != fingerprint
+            or manifest.get("settings") != settings):
+        return {}
+
+    sink = settings.get("sink", "dir")
+    if sink != "dir":
+        # 多输出时每个输出一个归档，全部完成才算完成
+        archive_dirs = [os.path.join(pdf_output_dir, output_subdir(spec))
+                        for spec in settings.get("outputs") or []] or [pdf_output_dir]
+        pages = manifest.get("pages", {})
+        archived = None
+        for archive_dir in archive_dirs:
+            archived = completed_archive_pages(archive_dir, pdf_name, sink,
+                                               manifest.get("total_pages", 0))
+            if not archived:
+                return {}
+        if any(str(page) not in pages for page in archived):
+            return {}
+        return {page: pages[str(page)] for page in archived}
+
+    completed = {}
+    for page, info in manifest.get("pages", {}).items():
+        if "outputs" in info:
+            names = [os.path.join(output["dir"], name) for output in info["outputs"]
+                     for name in output.get("parts") or [output["file"]]]
+        else:
+            # 跳过的空白页没有输出文件
+            names = info.get("parts") or ([info["file"]] if info["file"] else [])
+        try:
+            size = sum(os.path.getsize(os.path.join(pdf_output_dir, name)) for name in names)
+        except OSError:
+            continue
+        if size == info["bytes"]:
+            completed[int(page)] = info
+    return completed
+
+
+def _wait_if_paused(pause_event, stop_event):
+    """
+    暂停时阻塞等待，返回 False 表示已收到停止信号
+    """
+    while pause_event.is_set():
+        if stop_event.is_set():
+            return False
+        multiprocessing.Event().wait(0.1)
+    return not stop_event.is_set()
+
+
+def _encode_job(job):
+    """编码阶段：把原始像素转换为图片数据"""
+    if "data" not in job:
+        start = time.perf_counter()
+        job["data"] = job.pop("encoder").encode(
+            job.pop("samples"), job["width"], job["height"], job["n"], job["dpi"]
+        )
+        job["encode_time"] = time.perf_counter() - start
+    return job
+
+
+def _write_job(job, sink, on_page):
+    """写盘阶段：交给输出方式写出并回报结果"""
+    tiled = job.pop("tiled", None)
+    if tiled is not None:
+        # 分块渲染的条带由所属页面汇总
+        tiled.add(job)
+        return
+    data = job.pop("data")
+    start = time.perf_counter()
+    size = sink.write(job["page"], job["file"], data)
+    sink.page_done(job["page"])
+    write_time = time.perf_counter() - start
+    if on_page is not None:
+        result = {
+            "page": job["page"],
+            "file": job["file"],
+            "dpi": job["dpi"],
+            "colorspace": job["colorspace"],
+            "bytes": size,
+            "render_time": job["render_time"],
+            "encode_time": job["encode_time"],
+            "write_time": write_time
+        }
+        if job.get("passthrough"):
+            result["passthrough"] = True
+        if job.get("blank"):
+            result["blank"] = True
+        on_page(result)
+
+
+class PagePipeline:
+    """
+    渲染 → 编码 → 写盘 流水线
+
+    渲染在调用线程中进行（fitz 对象不跨线程使用），渲染结果放入有界队列，
+    由若干编码线程压缩，再由一个写盘线程按完成顺序交给输出方式写出。
+    队列有界，渲染快于编码/写盘时会阻塞等待，内存占用保持在固定范围内；
+    给出 memory_limit 时还按字节数限制：提交到写完之间的页面像素合计超过上限时，
+    put() 等待前面的页面写完（流水线为空时总是放行）。
+    """
+
+    def __init__(self, encode_threads, depth, sink, on_page=None, memory_limit=None):
+        self.sink = sink
+        self.on_page = on_page
+        self.error = None
+        self.memory_limit = memory_limit
+        self.memory_used = 0
+        self.memory_condition = threading.Condition()
+        self.encode_queue = queue.Queue(maxsize=depth)
+        self.write_queue = queue.Queue(maxsize=depth)
+        self.encoders = [
+            threading.Thread(target=self._encode_loop, daemon=True)
+            for _ in range(max(1, encode_threads))
+        ]
+        self.writer = threading.Thread(target=self._write_loop, daemon=True)
+        for thread in self.encoders:
+            thread.start()
+        self.writer.start()
+
+    def _encode_loop(self):
+        while True:
+            job = self.encode_queue.get()
+            if job is None:
+                break
+            if self.error is not None:
+                self._release(job.pop("memory", 0))
+                continue
+            try:
+                self.write_queue.put(_encode_job(job))
+            except Exception as e:
+                self._release(job.pop("memory", 0))
+                self.error = e
+
+    def _write_loop(self):
+        while True:
+            job = self.write_queue.get()
+            if job is None:
+                break
+            memory = job.pop("memory", 0)
+            try:
+                if self.error is None:
+                    # 多输出时每个输出有自己的输出方式和结果回调
+                    _write_job(job, job.pop("sink", None) or self.sink,
+                               job.pop("on_page", None) or self.on_page)
+            except Exception as e:
+                self.error = e
+            finally:
+                self._release(memory)
+
+    def _release(self, memory):
+        if memory:
+            with self.memory_condition:
+                self.memory_used -= memory
+                self.memory_condition.notify_all()
+
+    def put(self, job):
+        """提交一页（已编码的直接进入写盘队列）"""
+        if self.memory_limit is not None:
+            data = job.get("samples", job.get("data"))
+            memory = len(data) if isinstance(data, (bytes, bytearray)) else 0
+            with self.memory_condition:
+                while (self.memory_used and self.memory_used + memory > self.memory_limit
+                       and self.error is None):
+                    self.memory_condition.wait(0.1)
+                self.memory_used += memory
+            job["memory"] = memory
+        if "data" in job:
+            self.write_queue.put(job)
+        else:
+            self.encode_queue.put(job)
+
+    def close(self):
+        """等待队列中的页面全部写完，有阶段出错时抛出异常"""
+        for _ in self.encoders:
+            self.encode_queue.put(None)
+        for thread in self.encoders:
+            thread.join()
+        self.write_queue.put(None)
+        self.writer.join()
+        if self.error is not None:
+            raise self.error
+
+
+def apply_render_profile(options):
+    """
+    按渲染档案设置 MuPDF 的抗锯齿级别（进程内全局生效，每个任务开始时调用）
+
+    Returns:
+        渲染档案
+    """
+    profile = RENDER_PROFILES[options["render_profile"]]
+    mupdf = getattr(fitz, "mupdf", None)
+    if mupdf is not None and hasattr(mupdf, "fz_set_graphics_aa_level"):
+        mupdf.fz_set_text_aa_level(profile["text_aa"])
+        mupdf.fz_set_graphics_aa_level(profile["graphics_aa"])
+    else:
+        # 旧版 PyMuPDF 只能统一设置
+        fitz.TOOLS.set_aa_level(min(profile["text_aa"], profile["graphics_aa"]))
+    return profile
+
+
+def page_is_gray(page, options=None):
+    """
+    判断页面是否只有灰度内容
+
+    以低分辨率渲染一次 RGB 预览，所有像素的 R/G/B 都相等即为灰度页面。
+    黑色文字的抗锯齿边缘仍是灰色，不会被误判为彩色。
+    """
+    zoom = COLOR_PROBE_DPI / 72
+    samples = _get_pixmap(page, resolve_options(options), matrix=fitz.Matrix(zoom, zoom),
+                          alpha=False).samples
+    return samples[0::3] == samples[1::3] == samples[2::3]
+
+
+def ink_pixels(samples, threshold):
+    """
+    灰度预览中的墨迹像素数
+
+    以出现最多的灰度值为页面底色，与底色相差超过 threshold 级的像素算作墨迹
+    （按 256 级直方图计算）。
+    """
+    if not samples:
+        return 0
+    histogram = collections.Counter(samples)
+    background = max(histogram, key=histogram.get)
+    return sum(n for value, n in histogram.items() if abs(value - background) > threshold)
+
+
+def _has_text(display_list):
+    """显示列表中有没有非空白字符"""
+    textpage = display_list.get_textpage()
+    # 较新的 PyMuPDF 返回底层的 mupdf 对象
+    if not isinstance(textpage, fitz.TextPage):
+        textpage = fitz.TextPage(textpage)
+    return bool(textpage.extractText().strip())
+
+
+def _has_visible_drawings(page):
+    """页面有没有可见的矢量图形（只有白色填充、没有描边的背景矩形不算）"""
+    for item in page.get_cdrawings():
+        if item.get("color") is not None:
+            return True
+        fill = item.get("fill")
+        if fill is not None and any(component < 1 for component in fill):
+            return True
+    return False
+
+
+def check_blank_page(page, options, display_list=None):
+    """
+    渲染前低成本判断页面是否空白
+
+    判断是保守的，宁可照常渲染也不丢内容：
+    1. 没有内容流、也没有会渲染的注释和表单控件：空白
+    2. 有任何文字（哪怕只有页码）或可见的矢量图形：不是空白
+    3. 其余页面（只有图片，如扫描件）以 BLANK_PROBE_DPI 渲染灰度预览，
+       与底色相差超过 blank_threshold 级的墨迹像素一个也没有时才是空白；
+       扫描白纸的轻微噪点在预览中被平均掉，扫描的页码、污点都会留下墨迹像素
+
+    Args:
+        page: fitz.Page
+        options: 扩展选项
+        display_list: 已有的同一页显示列表（可选），没有时按需创建
+
+    Returns:
+        (是否空白, 显示列表)：检查过内容时返回所用的显示列表，正文渲染可直接复用，
+        不必再解析一次页面内容；否则为传入的 display_list
+    """
+    annots = RENDER_PROFILES[options["render_profile"]]["annots"]
+    if not page.get_contents() and (
+            not annots or (page.first_annot is None and page.first_widget is None)):
+        return True, display_list
+    if display_list is None:
+        display_list = page.get_displaylist(annots=annots)
+    if _has_text(display_list) or _has_visible_drawings(page):
+        return False, display_list
+    zoom = BLANK_PROBE_DPI / 72
+    pix = display_list.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY,
+                                  alpha=False)
+    return ink_pixels(pix.samples, options["blank_threshold"]) == 0, display_list
+
+
+def blank_page_job(job, page_rect, encoder, check_time):
+    """
+    空白页的占位图任务：按页面比例、BLANK_PLACEHOLDER_DPI 分辨率的白色灰度图片
+
+    Args:
+        job: 页面任务（page / file），补充编码后的数据后返回
+        page_rect: 页面尺寸
+        encoder: 本页使用的编码器
+        check_time: 空白检测的耗时，计入渲染耗时
+    """
+    zoom = BLANK_PLACEHOLDER_DPI / 72
+    rect = (page_rect * fitz.Matrix(zoom, zoom)).irect
+    pix = fitz.Pixmap(fitz.csGRAY, fitz.IRect(0, 0, max(1, rect.width), max(1, rect.height)),
+                      False)
+    pix.set_rect(pix.irect, (255,))
+    start = time.perf_counter()
+    job.update({
+        "data": _encode_pixmap(encoder, pix, BLANK_PLACEHOLDER_DPI),
+        "dpi": BLANK_PLACEHOLDER_DPI,
+        "colorspace": "gray",
+        "blank": True,
+        "render_time": check_time,
+        "encode_time": time.perf_counter() - start
+    })
+    return job
+
+
+def skipped_blank_result(page_number, check_time):
+    """跳过（不输出）的空白页的页面结果"""
+    return {
+        "page": page_number,
+        "file": None,
+        "dpi": 0,
+        "colorspace": "gray",
+        "bytes": 0,
+        "render_time": check_time,
+        "encode_time": 0.0,
+        "write_time": 0.0,
+        "blank": True
+    }
+
+
+def page_colorspace(page, options):
+    """按颜色模式选择本页的渲染色彩空间"""
+    mode = options["colorspace"]
+    if mode in ("gray", "bilevel"):
+        return fitz.csGRAY
+    if mode == "auto" and page_is_gray(page, options):
+        return fitz.csGRAY
+    return fitz.csRGB
+
+
+def page_zoom(page_rect, dpi, options):
+    """
+    计算单页的缩放比例
+
+    默认为 dpi / 72；设置了像素上限（max_pixels）或长边上限（max_long_edge）时，
+    超出上限的页面按比例缩小，不超出的页面保持原 DPI。
+    """
+    zoom = dpi / 72
+    width, height = abs(page_rect.width), abs(page_rect.height)
+    if width <= 0 or height <= 0:
+        return zoom
+    if options["max_long_edge"] > 0:
+        zoom = min(zoom, options["max_long_edge"] / max(width, height))
+    if options["max_pixels"] > 0:
+        zoom = min(zoom, (options["max_pixels"] / (width * height)) ** 0.5)
+    return zoom
+
+
+def _tile_raster_limit(options):
+    """
+    单页整幅渲染（以及分块渲染的每个条带）允许的最大像素字节数
+
+    使用流水线时每进程的内存上限一半留给正在渲染的一页，
+    另一半由流水线按字节数限制（PagePipeline 的 memory_limit），合计不超过上限。
+    """
+    ceiling = options["tile_memory_mb"] * 1024 * 1024
+    if ceiling <= 0:
+        return None
+    if options["pipeline"]:
+        return ceiling // 2
+    return ceiling
+
+
+def _tile_rows(rect, n, raster_limit):
+    """
+    分块渲染时每个条带的行数
+
+    条带与整页使用同一个上限 raster_limit，行数取 TILE_MIN_ROWS 的整数倍。
+
+    Returns:
+        条带行数；不限制内存、整页不超过上限或一个条带就能容纳整页时返回 None（整页渲染）
+    """
+    stride = rect.width * n
+    if raster_limit is None or stride * rect.height <= raster_limit:
+        return None
+    rows = max(TILE_MIN_ROWS, raster_limit // max(1, stride) // TILE_MIN_ROWS * TILE_MIN_ROWS)
+    return rows if rows < rect.height else None
+
+
+def _strip_samples(pix, target, y0, y1):
+    """从分块渲染结果中取出 [y0, y1) 行、与整页同宽的像素"""
+    offset = y0 - pix.y
+    samples = pix.samples_mv
+    stride = pix.stride
+    if pix.x == target.x0 and pix.width == target.width:
+        return bytes(samples[offset * stride:(offset + y1 - y0) * stride])
+
+    # 边缘取整与整页不一致时逐行裁剪
+    n = pix.n
+    left = (target.x0 - pix.x) * n
+    row_bytes = target.width * n
+    rows = []
+    for r in range(offset, offset + y1 - y0):
+        row = bytes(samples[r * stride + max(0, left):r * stride + left + row_bytes])
+        rows.append(row.ljust(row_bytes, b"\xff"))
+    return b"".join(rows)
+
+
+def _get_pixmap(source, options, **kwargs):
+    """
+    渲染 fitz.Page 或 fitz.DisplayList
+
+    是否渲染注释由渲染档案决定；DisplayList 在创建时已经决定，不再传 annots。
+    """
+    if isinstance(source, fitz.Page):
+        kwargs["annots"] = RENDER_PROFILES[options["render_profile"]]["annots"]
+    return source.get_pixmap(**kwargs)
+
+
+def _encode_pixmap(encoder, pix, dpi):
+    """用编码器编码一个 Pixmap（在渲染线程中调用）"""
+    if encoder.thread_safe:
+        return encoder.encode(pix.samples, pix.width, pix.height, pix.n, dpi)
+    return encoder.encode_pixmap(pix, dpi)
+
+
+class _TiledPage:
+    """
+    分块渲染的一页：按条带编号顺序汇总各条带，全部条带处理完后回报整页结果
+
+    条带由写盘线程（不使用流水线时由渲染线程）交来，编码线程完成的先后不影响顺序。
+    PNG 条带流式压缩进同一个文件；编码器能合并条带时（多页 TIFF）合并为一页写出；
+    其他格式每个条带写成单独的文件 <name>_NNNN_partKK.<扩展名>。
+    """
+
+    def __init__(self, job, strip_count, encoder, sink, writer, stream_path, on_page):
+        self.page = job["page"]
+        self.file = job["file"]
+        self.strip_count = strip_count
+        self.encoder = encoder
+        self.sink = sink
+        self.writer = writer
+        self.stream_path = stream_path
+        self.on_page = on_page
+        self.next_index = 1
+        self.pending = {}
+        self.parts = []
+        # 编码器能合并条带时暂存各条带的编码结果
+        self.joined = [] if hasattr(encoder, "join_strips") else None
+        self.aborted = False
+        self.lock = threading.Lock()
+        self.result = {
+            "page": job["page"],
+            "file": job["file"],
+            "dpi": job["dpi"],
+            "colorspace": job["colorspace"],
+            "tiled": True,
+            "bytes": 0,
+            "render_time": 0.0,
+            "encode_time": 0.0,
+            "write_time": 0.0
+        }
+
+    def part_name(self, index):
+        """条带的文件名；只有一个条带时就是整页的文件名"""
+        if self.strip_count == 1:
+            return self.file
+        return f"{Path(self.file).stem}_part{index:02d}.{self.encoder.extension}"
+
+    def add(self, strip):
+        """收到一个条带（已编码，或流式写出时为原始像素）"""
+        with self.lock:
+            if self.aborted:
+                return
+            try:
+                self.pending[strip["index"]] = strip
+                while self.next_index in self.pending:
+                    self._write_strip(self.pending.pop(self.next_index))
+                    self.next_index += 1
+                if self.next_index > self.strip_count:
+                    self._finish()
+            except Exception:
+                self._abort_locked()
+                raise
+
+    def abort(self):
+        """渲染出错：关闭流式写出的文件，之后到达的条带全部丢弃"""
+        with self.lock:
+            self._abort_locked()
+
+    def _abort_locked(self):
+        if not self.aborted and self.writer is not None:
+            self.writer.abort()
+        self.aborted = True
+        self.pending.clear()
+
+    def _write_strip(self, strip):
+        result = self.result
+        result["render_time"] += strip["render_time"]
+        result["encode_time"] += strip.get("encode_time", 0.0)
+        start = time.perf_counter()
+        if self.writer is not None:
+            # 流式压缩与写盘交替进行，统一计入编码时间
+            self.writer.write_rows(strip["data"], strip["rows"])
+            result["encode_time"] += time.perf_counter() - start
+            return
+        if self.joined is not None:
+            self.joined.append(strip["data"])
+            return
+        name = self.part_name(strip["index"])
+        result["bytes"] += self.sink.write(self.page, name, strip["data"])
+        result["write_time"] += time.perf_counter() - start
+        self.parts.append(name)
+
+    def _finish(self):
+        result = self.result
+        start = time.perf_counter()
+        if self.writer is not None:
+            self.writer.close()
+            result["bytes"] = self.sink.write_file(self.page, self.file, self.stream_path)
+        elif self.joined is not None:
+            result["bytes"] = self.sink.write(self.page, self.file,
+                                              self.encoder.join_strips(self.joined))
+        elif self.strip_count > 1:
+            result["file"] = self.parts[0]
+            result["parts"] = self.parts
+        self.sink.page_done(self.page)
+        result["write_time"] += time.perf_counter() - start
+        if self.on_page is not None:
+            self.on_page(result)
+
+
+def render_page_tiled(page, mat, colorspace, job, encoder, sink, dpi, strip_rows, options,
+                      on_page=None, pipeline=None, on_strip=None):
+    """
+    按水平条带分块渲染一页，内存占用与页面尺寸无关
+
+    page 可以是 fitz.Page 或同一页的 fitz.DisplayList（多输出时）。
+    渲染线程只负责光栅化，条带与普通页面一样经流水线编码和写盘，由 _TiledPage 汇总。
+
+    Args:
+        strip_rows: 每个条带的行数，见 _tile_rows
+        pipeline: 流水线，None 时在渲染线程中编码和写盘
+        on_strip: 每渲染完一个条带时调用（无参数），渲染进程借此表明仍在工作
+    """
+    target = (page.rect * mat).irect
+    starts = range(target.y0, target.y1, strip_rows)
+    inverse = ~mat
+
+    writer = None
+    stream_path = None
+    if hasattr(encoder, "stream_writer"):
+        stream_path = sink.stream_path(job["file"])
+        writer = encoder.stream_writer(stream_path, target.width, target.height,
+                                       colorspace.n, dpi)
+    tiled = _TiledPage(job, len(starts), encoder, sink, writer, stream_path, on_page)
+
+    try:
+        for index, y0 in enumerate(starts, 1):
+            y1 = min(target.y1, y0 + strip_rows)
+            # 上下各多取一行，避免取整导致缺行
+            clip = fitz.Rect(target.x0, y0 - 1, target.x1, y1 + 1) * inverse
+            start = time.perf_counter()
+            pix = _get_pixmap(page, options, matrix=mat, clip=clip, colorspace=colorspace,
+                              alpha=False)
+            strip = {
+                "tiled": tiled,
+                "index": index,
+                "page": job["page"],
+                "dpi": dpi,
+                "rows": y1 - y0,
+                "render_time": time.perf_counter() - start
+            }
+            if writer is not None:
+                strip["data"] = _strip_samples(pix, target, y0, y1)
+            else:
+                if pix.y != y0 or pix.height != y1 - y0:
+                    pix = fitz.Pixmap(colorspace, target.width, y1 - y0,
+                                      _strip_samples(pix, target, y0, y1), False)
+                if encoder.thread_safe:
+                    strip.update({
+                        "samples": pix.samples,
+                        "width": pix.width,
+                        "height": pix.height,
+                        "n": pix.n,
+                        "encoder": encoder
+                    })
+                else:
+                    start = time.perf_counter()
+                    strip["data"] = encoder.encode_pixmap(pix, dpi)
+                    strip["encode_time"] = time.perf_counter() - start
+            pix = None
+
+            if pipeline is not None:
+                pipeline.put(strip)
+            else:
+                _write_job(_encode_job(strip), sink, on_page)
+            if on_strip is not None:
+                on_strip()
+    except Exception:
+        tiled.abort()
+        raise
+
+
+def _covers_page(bbox, page_rect):
+    """图片区域是否覆盖整个页面（允许少量误差）"""
+    tolerance_x = max(PASSTHROUGH_TOLERANCE, page_rect.width * 0.01)
+    tolerance_y = max(PASSTHROUGH_TOLERANCE, page_rect.height * 0.01)
+    return (bbox.x0 <= page_rect.x0 + tolerance_x and bbox.y0 <= page_rect.y0 + tolerance_y
+            and bbox.x1 >= page_rect.x1 - tolerance_x and bbox.y1 >= page_rect.y1 - tolerance_y)
+
+
+def extract_page_image(pdf_document, page, encoder, options):
+    """
+    扫描件直通：页面只有一张铺满整页的图片时，直接取出图片数据
+
+    要求页面未旋转、没有注释、没有可见文字（OCR 隐藏文字层不影响）和矢量图形，
+    图片无透明蒙版且未旋转/翻转。图片格式与输出格式一致时原样写出，
+    否则只对这张图片解码后重新编码，不做整页光栅化。
+    颜色模式为灰度/黑白时，彩色图片会先转换为灰度。
+
+    Returns:
+        {"data": 图片数据, "dpi": 图片在页面上的实际 DPI, "colorspace": "gray"/"rgb"}，
+        不满足条件时返回 None
+    """
+    if page.rotation or page.first_annot is not None:
+        return None
+
+    infos = page.get_image_info(xrefs=True)
+    if len(infos) != 1:
+        return None
+    info = infos[0]
+    xref = info["xref"]
+    a, b, c, d = info["transform"][:4]
+    if xref <= 0 or info["has-mask"] or b or c or a <= 0 or d <= 0:
+        return None
+    if not _covers_page(fitz.Rect(info["bbox"]), page.rect):
+        return None
+
+    width, height = info["width"], info["height"]
+    if options["max_long_edge"] > 0 and max(width, height) > options["max_long_edge"]:
+        return None
+    if options["max_pixels"] > 0 and width * height > options["max_pixels"]:
+        return None
+
+    # 只允许不可见文字（type 3）
+    if any(span["type"] != 3 for span in page.get_texttrace()):
+        return None
+    if page.get_drawings():
+        return None
+
+    dpi = round(width / (page.rect.width / 72), 2)
+    mode = options["colorspace"]
+    image = pdf_document.extract_image(xref)
+    if image and image.get("colorspace") in ((1,) if mode == "gray" else (1, 3)):
+        ext = image.get("ext")
+        if mode != "bilevel" and (encoder.extension, ext) in (("jpg", "jpeg"), ("png", "png")):
+            return {"data": image["image"], "dpi": dpi,
+                    "colorspace": "gray" if image["colorspace"] == 1 else "rgb"}
+
+    # 格式或颜色模式不同：解码这张图片后转换
+    pix = fitz.Pixmap(pdf_document, xref)
+    if pix.alpha:
+        pix = fitz.Pixmap(pix, 0)
+    if mode in ("gray", "bilevel"):
+        if pix.colorspace is None or pix.colorspace.n != 1:
+            pix = fitz.Pixmap(fitz.csGRAY, pix)
+    elif pix.colorspace is None or pix.colorspace.n not in (1, 3):
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+    return {"data": _encode_pixmap(encoder, pix, dpi), "dpi": dpi,
+            "colorspace": "gray" if pix.n == 1 else "rgb"}
+
+
+def render_pages(pdf_document, pdf_path, output_dir, output_format, quality, dpi,
+                 pages, pause_event, stop_event, on_page=None, options=None, on_strip=None):
+    """
+    将 PDF 中指定的页面渲染为图片
+
+    Args:
+        pdf_document: 已打开的 fitz 文档
+        pdf_path: PDF 文件路径（用于生成输出文件名）
+        output_dir: 输出目录
+        output_format: 输出格式 (png/jpg/tiff/webp)
+        quality: 图片质量
+        dpi: DPI
+        pages: 需要渲染的页码（从 0 开始）；归档输出时为整个文件的全部页面
+        pause_event: 暂停事件
+        stop_event: 停止事件
+        on_page: 每完成一页时的回调，参数为
+            {"page": 页码(从 1 开始), "file": 文件名, "dpi": 实际 DPI,
+             "colorspace": "gray"/"rgb", "bytes": 字节数,
+             "render_time"/"encode_time"/"write_time": 各阶段耗时（秒）}
+        options: 扩展选项，见 DEFAULT_OPTIONS
+        on_strip: 分块渲染的大页面每渲染完一个条带时调用（无参数）
+
+    Returns:
+        全部页面完成返回 True，收到停止信号返回 False
+    """
+    options = resolve_options(options)
+    apply_render_profile(options)
+    pdf_name = Path(pdf_path).stem
+    pdf_output_dir = get_pdf_output_dir(output_dir, pdf_path)
+    os.makedirs(pdf_output_dir, exist_ok=True)
+
+    raster_limit = _tile_raster_limit(options)
+    if options["outputs"]:
+        return _render_outputs(pdf_document, pdf_name, pdf_output_dir, quality, pages,
+                               raster_limit, pause_event, stop_event, on_page, options,
+                               on_strip)
+
+    sink = make_sink(options["sink"], pdf_output_dir, pdf_name, [page + 1 for page in pages])
+    try:
+        encoder = sink.wrap_encoder(make_encoder(output_format, quality, options))
+        return _render_to_sink(pdf_document, pdf_name, pages, dpi, encoder, sink,
+                               raster_limit, pause_event, stop_event, on_page, options,
+                               on_strip)
+    finally:
+        sink.close()
+
+
+def _render_to_sink(pdf_document, pdf_name, pages, dpi, encoder, sink, raster_limit,
+                    pause_event, stop_event, on_page, options, on_strip=None):
+    """render_pages 的主循环：逐页渲染并经流水线交给输出方式"""
+    pipeline = None
+    if options["pipeline"]:
+        pipeline = PagePipeline(
+            options["encode_threads"], options["pipeline_depth"], sink, on_page, raster_limit
+        )
+
+    try:
+        for page_num in pages:
+            # 检查暂停/停止
+            if not _wait_if_paused(pause_event, stop_event):
+                return False
+            if pipeline is not None and pipeline.error is not None:
+                break
+
+            page = pdf_document[page_num]
+            current_page = page_num + 1
+
+            # 生成输出文件名
+            output_filename = f"{pdf_name}_{current_page:04d}.{encoder.extension}"
+            job = {
+                "page": current_page,
+                "file": output_filename
+            }
+
+            # 空白页：不输出或只写占位图；做过预览时正文从预览的显示列表渲染
+            source = page
+            if options["blank_pages"] != "render":
+                start = time.perf_counter()
+                blank, display_list = check_blank_page(page, options)
+                if blank:
+                    check_time = time.perf_counter() - start
+                    if options["blank_pages"] == "skip" and options["sink"] == "dir":
+                        if on_page is not None:
+                            on_page(skipped_blank_result(current_page, check_time))
+                        continue
+                    job = blank_page_job(job, page.rect, encoder, check_time)
+                    if pipeline is not None:
+                        pipeline.put(job)
+                    else:
+                        _write_job(job, sink, on_page)
+                    continue
+                source = display_list
+
+            # 扫描件直通：直接输出页面中的原始图片
+            if options["passthrough"]:
+                start = time.perf_counter()
+                image = extract_page_image(pdf_document, page, encoder, options)
+                if image is not None:
+                    job.update({
+                        "data": image["data"],
+                        "dpi": image["dpi"],
+                        "colorspace": image["colorspace"],
+                        "passthrough": True,
+                        "render_time": 0.0,
+                        "encode_time": time.perf_counter() - start
+                    })
+                    if pipeline is not None:
+                        pipeline.put(job)
+                    else:
+                        _write_job(job, sink, on_page)
+                    continue
+
+            # 按像素预算计算本页的缩放比例，实际 DPI 写入图片元数据
+            zoom = page_zoom(source.rect, dpi, options)
+            mat = fitz.Matrix(zoom, zoom)
+            page_dpi = round(zoom * 72, 2)
+            job["dpi"] = page_dpi
+
+            # 按颜色模式选择色彩空间（自动模式的检测计入渲染耗时）
+            start = time.perf_counter()
+            colorspace = page_colorspace(source, options)
+            job["colorspace"] = "gray" if colorspace.n == 1 else "rgb"
+
+            # 整页像素超过内存上限时分块渲染
+            strip_rows = _tile_rows((source.rect * mat).irect, colorspace.n, raster_limit)
+            if strip_rows is not None:
+                render_page_tiled(source, mat, colorspace, job, encoder, sink, page_dpi,
+                                  strip_rows, options, on_page, pipeline, on_strip)
+                continue
+
+            pix = _get_pixmap(source, options, matrix=mat, colorspace=colorspace, alpha=False)
+            job["render_time"] = time.perf_counter() - start
+
+            if encoder.thread_safe:
+                # 交给编码阶段压缩
+                job.update({
+                    "samples": pix.samples,
+                    "width": pix.width,
+                    "height": pix.height,
+                    "n": pix.n,
+                    "encoder": encoder
+                })
+            else:
+                # MuPDF 编码依赖 fitz，只能在渲染线程中完成
+                start = time.perf_counter()
+                job["data"] = encoder.encode_pixmap(pix, page_dpi)
+                job["encode_time"] = time.perf_counter() - start
+            pix = None
+
+            if pipeline is not None:
+                pipeline.put(job)
+            else:
+                _write_job(_encode_job(job), sink, on_page)
+    finally:
+        if pipeline is not None:
+            pipeline.close()
+
+    return True
+
+
+class _PageOutputs:
+    """
+    多输出时汇总一页的各个输出
+
+    各输出由写盘线程或渲染线程（分块渲染）分别回报，全部完成后合并为一条页面结果：
+    file 为第一个输出的文件（含子目录），bytes 与各阶段耗时为所有输出之和，
+    outputs 列出每个输出的子目录、文件名、DPI 和字节数。
+    """
+
+    def __init__(self, page, subdirs, interpret_time, on_page):
+        self.page = page
+        self.subdirs = subdirs
+        self.interpret_time = interpret_time
+        self.on_page = on_page
+        self.results = {}
+        self.lock = threading.Lock()
+
+    def callback(self, subdir):
+        """某个输出的结果回调"""
+        return lambda result: self.add(subdir, result)
+
+    def add(self, subdir, result):
+        with self.lock:
+            self.results[subdir] = result
+            if len(self.results) < len(self.subdirs):
+                return
+        results = [self.results[name] for name in self.subdirs]
+        outputs = []
+        for name, item in zip(self.subdirs, results):
+            output = {"dir": name, "file": item["file"], "dpi": item["dpi"],
+                      "bytes": item["bytes"]}
+            if "parts" in item:
+                output["parts"] = item["parts"]
+            outputs.append(output)
+        if self.on_page is not None:
+            result = {
+                "page": self.page,
+                "file": os.path.join(self.subdirs[0], results[0]["file"]),
+                "dpi": results[0]["dpi"],
+                "colorspace": results[0]["colorspace"],
+                "bytes": sum(item["bytes"] for item in results),
+                "render_time": self.interpret_time + sum(item["render_time"] for item in results),
+                "encode_time": sum(item["encode_time"] for item in results),
+                "write_time": sum(item["write_time"] for item in results),
+                "outputs": outputs
+            }
+            if results[0].get("blank"):
+                result["blank"] = True
+            self.on_page(result)
+
+
+def _render_outputs(pdf_document, pdf_name, pdf_output_dir, quality, pages, raster_limit,
+                    pause_event, stop_event, on_page, options, on_strip=None):
+    """
+    多输出：每页只解析一次页面内容（fitz.DisplayList），再按各输出的 DPI 光栅化
+
+    每个输出有自己的子目录、输出方式和编码器，共用一条流水线。
+    扫描件直通在多输出时不生效。
+    """
+    targets = []
+    pipeline = None
+    try:
+        for spec in options["outputs"]:
+            subdir = output_subdir(spec)
+            target_dir = os.path.join(pdf_output_dir, subdir)
+            os.makedirs(target_dir, exist_ok=True)
+            sink = make_sink(options["sink"], target_dir, pdf_name,
+                             [page + 1 for page in pages])
+            targets.append({
+                "subdir": subdir,
+                "dpi": spec["dpi"],
+                "sink": sink,
+                "encoder": sink.wrap_encoder(make_encoder(spec["format"], quality, options))
+            })
+        if options["pipeline"]:
+            pipeline = PagePipeline(
+                options["encode_threads"], options["pipeline_depth"], None, on_page,
+                raster_limit
+            )
+
+        subdirs = [target["subdir"] for target in targets]
+        for page_num in pages:
+            if not _wait_if_paused(pause_event, stop_event):
+                return False
+            if pipeline is not None and pipeline.error is not None:
+                break
+
+            page = pdf_document[page_num]
+            current_page = page_num + 1
+
+            # 解析一次页面内容，空白检测、颜色检测和各输出的光栅化都基于这份显示列表
+            start = time.perf_counter()
+            display_list = None
+            if options["blank_pages"] != "render":
+                blank, display_list = check_blank_page(page, options)
+                if blank:
+                    check_time = time.perf_counter() - start
+                    if options["blank_pages"] == "skip" and options["sink"] == "dir":
+                        if on_page is not None:
+                            result = skipped_blank_result(current_page, check_time)
+                            result["outputs"] = []
+                            on_page(result)
+                        continue
+                    collector = _PageOutputs(current_page, subdirs, check_time, on_page)
+                    for target in targets:
+                        job = blank_page_job({
+                            "page": current_page,
+                            "file": f"{pdf_name}_{current_page:04d}.{target['encoder'].extension}"
+                        }, page.rect, target["encoder"], 0.0)
+                        if pipeline is not None:
+                            job["sink"] = target["sink"]
+                            job["on_page"] = collector.callback(target["subdir"])
+                            pipeline.put(job)
+                        else:
+                            _write_job(job, target["sink"], collector.callback(target["subdir"]))
+                    continue
+            if display_list is None:
+                display_list = page.get_displaylist(
+                    annots=RENDER_PROFILES[options["render_profile"]]["annots"])
+            colorspace = page_colorspace(display_list, options)
+            collector = _PageOutputs(current_page, subdirs, time.perf_counter() - start, on_page)
+
+            for target in targets:
+                encoder = target["encoder"]
+                sink = target["sink"]
+                zoom = page_zoom(page.rect, target["dpi"], options)
+                mat = fitz.Matrix(zoom, zoom)
+                page_dpi = round(zoom * 72, 2)
+                job = {
+                    "page": current_page,
+                    "file": f"{pdf_name}_{current_page:04d}.{encoder.extension}",
+                    "dpi": page_dpi,
+                    "colorspace": "gray" if colorspace.n == 1 else "rgb"
+                }
+                on_output = collector.callback(target["subdir"])
+
+                strip_rows = _tile_rows((display_list.rect * mat).irect, colorspace.n,
+                                        raster_limit)
+                if strip_rows is not None:
+                    render_page_tiled(display_list, mat, colorspace, job, encoder, sink,
+                                      page_dpi, strip_rows, options, on_output, pipeline,
+                                      on_strip)
+                    continue
+
+                start = time.perf_counter()
+                pix = display_list.get_pixmap(matrix=mat, colorspace=colorspace, alpha=False)
+                job["render_time"] = time.perf_counter() - start
+                if encoder.thread_safe:
+                    job.update({
+                        "samples": pix.samples,
+                        "width": pix.width,
+                        "height": pix.height,
+                        "n": pix.n,
+                        "encoder": encoder
+                    })
+                else:
+                    start = time.perf_counter()
+                    job["data"] = encoder.encode_pixmap(pix, page_dpi)
+                    job["encode_time"] = time.perf_counter() - start
+                pix = None
+
+                if pipeline is not None:
+                    job["sink"] = sink
+                    job["on_page"] = on_output
+                    pipeline.put(job)
+                else:
+                    _write_job(_encode_job(job), sink, on_output)
+            display_list = None
+    finally:
+        try:
+            if pipeline is not None:
+                pipeline.close()
+        finally:
+            for target in targets:
+                target["sink"].close()
+
+    return True
+
+
+def convert_pdf_worker(pdf_path, output_dir, output_format, quality, dpi, 
+                       progress_queue, pause_event, stop_event, options=None):
+    """
+    独立进程中的 PDF 转换工作函数（逐页串行转换单个文件）
+    
+    Args:
+        pdf_path: PDF 文件路径
+        output_dir: 输出目录
+        output_format: 输出格式 (png/jpg/tiff/webp)
+        quality: 图片质量
+        dpi: DPI
+        progress_queue: 进度消息队列
+        pause_event: 暂停事件
+        stop_event: 停止事件
+        options: 扩展选项，见 DEFAULT_OPTIONS
+    """
+    try:
+        filename = os.path.basename(pdf_path)
+        
+        # 发送开始消息
+        progress_queue.put({
+            "type": "file_start",
+            "filename": filename
+        })
+        
+        # 打开 PDF
+        pdf_document = fitz.open(pdf_path)
+        total_pages = len(pdf_document)
+        
+        # 发送总页数
+        progress_queue.put({
+            "type": "file_total_pages",
+            "total_pages": total_pages
+        })
+        
+        def on_page(result):
+            progress_queue.put({
+                "type": "file_progress",
+                "filename": filename,
+                "current_page": result["page"],
+                "total_pages": total_pages
+            })
+        
+        try:
+            finished = render_pages(
+                pdf_document, pdf_path, output_dir, output_format, quality, dpi,
+                range(total_pages), pause_event, stop_event, on_page, options
+            )
+        finally:
+            pdf_document.close()
+        
+        if not finished:
+            return False
+        
+        # 发送完成消息
+        progress_queue.put({
+            "type": "file_complete",
+            "filename": filename
+        })
+        
+        return True
+        
+    except Exception as e:
+        progress_queue.put({
+            "type": "file_error",
+            "filename": os.path.basename(pdf_path),
+            "error": str(e)
+        })
+        return False
+
+
+class CoalescingProgress:
+    """
+    合并高频进度消息的进度通道
+
+    file_progress / overall_progress 只保留最新值，page_stats 合并为一条
+    page_stats_batch，每隔 interval 秒统一发出；其余控制消息（文件开始/完成/出错、
+    转换完成等）立即发出，发出前先把缓存的进度推送出去以保证顺序。
+    interval 为 0 时不做合并。
+    """
+
+    def __init__(self, target, interval):
+        self.target = target
+        self.interval = interval
+        self.latest = {}
+        self.page_stats = []
+        self.last_flush = time.monotonic()
+
+    def put(self, message):
+        msg_type = message["type"]
+        if self.interval <= 0:
+            self.target.put(message)
+            return
+
+        if msg_type == "file_progress":
+            key = message.get("file_index", message["filename"])
+            self.latest[(msg_type, key)] = message
+        elif msg_type == "overall_progress":
+            self.latest[(msg_type,)] = message
+        elif msg_type == "page_stats":
+            self.page_stats.append(message)
+        else:
+            self.flush()
+            self.target.put(message)
+            return
+        self.poll()
+
+    def poll(self):
+        """距上次发送超过 interval 时推送缓存的进度"""
+        if time.monotonic() - self.last_flush >= self.interval:
+            self.flush()
+
+    def flush(self):
+        """立即推送缓存的进度"""
+        self.last_flush = time.monotonic()
+        if self.page_stats:
+            self.target.put({
+                "type": "page_stats_batch",
+                "pages": self.page_stats
+            })
+            self.page_stats = []
+        for message in self.latest.values():
+            self.target.put(message)
+        self.latest = {}
+
+
+class _PageResultBatcher:
+    """
+    工作进程内的逐页结果缓冲
+
+    写盘线程与渲染线程都会回报页面结果，这里加锁合并后按固定间隔
+    以一条 pages_done 消息发给主进程，减少跨进程队列的消息数。
+    """
+
+    def __init__(self, result_queue, task_id, file_index, interval):
+        self.result_queue = result_queue
+        self.task_id = task_id
+        self.file_index = file_index
+        self.interval = interval
+        self.results = []
+        self.lock = threading.Lock()
+        self.last_flush = time.monotonic()
+
+    def add(self, result):
+        with self.lock:
+            self.results.append(result)
+            if time.monotonic() - self.last_flush >= self.interval:
+                self._flush_locked()
+
+    def flush(self):
+        with self.lock:
+            self._flush_locked()
+
+    def keepalive(self):
+        """
+        分块渲染的大页面每个条带调用一次
+
+        一页要渲染很久时主进程收不到页面结果，这里按同样的间隔发送 keepalive 消息，
+        进程池的卡死检测据此知道进程仍在工作。
+        """
+        with self.lock:
+            if time.monotonic() - self.last_flush < self.interval:
+                return
+            if self.results:
+                self._flush_locked()
+                return
+            self.last_flush = time.monotonic()
+            self.result_queue.put({
+                "type": "keepalive",
+                "task_id": self.task_id,
+                "file_index": self.file_index
+            })
+
+    def _flush_locked(self):
+        self.last_flush = time.monotonic()
+        if not self.results:
+            return
+        self.result_queue.put({
+            "type": "pages_done",
+            "task_id": self.task_id,
+            "file_index": self.file_index,
+            "results": self.results
+        })
+        self.results = []
+
+
+class _ResultPipe:
+    """
+    工作进程的结果管道
+
+    提供与队列相同的 put()；写盘线程和渲染线程都会发送结果，发送时加锁。
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.lock = threading.Lock()
+
+    def put(self, message):
+        with self.lock:
+            self.connection.send(message)
+
+
+class InputPrefetcher:
+    """
+    输入预读（运行在转换进程中）
+
+    后台线程按调度顺序把接下来要渲染的 PDF 整个读入共享内存，派发任务时附上共享内存名，
+    渲染进程用 fitz.open(stream=...) 从内存打开，不再在文件之间等待网络共享盘的打开和读取；
+    同一文件的多段任务在各进程中映射同一块内存。
+    预读的文件数和总字节数有上限，放不下或尚未读完的文件照常从路径打开。
+    """
+
+    def __init__(self, max_files, max_bytes):
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        # 路径 -> 共享内存（读完的文件）
+        self.buffers = {}
+        # 已占用（含正在读取）的字节数
+        self.used_bytes = 0
+        # 接下来要渲染的文件：[(路径, 大小), ...]
+        self.wanted = []
+        # 读取失败或放不下的文件，不再尝试
+        self.skipped = set()
+        self.loading = None
+        self.closed = False
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def want(self, files):
+        """
+        更新接下来要渲染的文件（按派发顺序），只预读前 max_files 个
+
+        Args:
+            files: [(路径, 文件大小), ...]
+        """
+        with self.condition:
+            self.wanted = list(files)[:self.max_files]
+            self.condition.notify()
+
+    def get(self, path):
+        """已读完的文件的共享内存 {"name", "size"}，没有时返回 None"""
+        with self.condition:
+            buffer = self.buffers.get(path)
+            if buffer is None:
+                return None
+            return {"name": buffer.name, "size": buffer.size}
+
+    def release(self, path):
+        """文件不再渲染时释放它的共享内存（渲染进程已映射的部分在关闭文档后回收）"""
+        with self.condition:
+            self.wanted = [item for item in self.wanted if item[0] != path]
+            buffer = self.buffers.pop(path, None)
+            self.skipped.discard(path)
+            if buffer is None:
+                return
+            self.used_bytes -= buffer.size
+            self.condition.notify()
+        self._free(buffer)
+
+    def close(self):
+        """停止预读并释放全部共享内存"""
+        with self.condition:
+            self.closed = True
+            buffers = list(self.buffers.values())
+            self.buffers.clear()
+            self.condition.notify()
+        self.thread.join()
+        for buffer in buffers:
+            self._free(buffer)
+
+    @staticmethod
+    def _free(buffer):
+        buffer.close()
+        try:
+            buffer.unlink()
+        except FileNotFoundError:
+            pass
+
+    def _next_file(self):
+        """下一个要读取的文件，放不下的文件记入 skipped"""
+        for path, size in self.wanted:
+            if path in self.buffers or path in self.skipped:
+                continue
+            if size <= 0 or size > self.max_bytes:
+                self.skipped.add(path)
+                continue
+            if self.used_bytes + size > self.max_bytes:
+                # 等前面的文件释放后再读
+                return None
+            return path, size
+        return None
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.closed and (item := self._next_file()) is None:
+                    self.condition.wait()
+                if self.closed:
+                    return
+                path, size = item
+                self.used_bytes += size
+                self.loading = path
+            buffer = self._read(path, size)
+            with self.condition:
+                self.loading = None
+                if buffer is not None and not self.closed and path not in self.skipped:
+                    self.buffers[path] = buffer
+                    continue
+                self.used_bytes -= size
+                self.skipped.add(path)
+            if buffer is not None:
+                self._free(buffer)
+
+    def _read(self, path, size):
+        """把文件读入新建的共享内存，失败或文件大小已改变时返回 None"""
+        # 共享内存写满时进程会收到 SIGBUS，先确认剩余空间
+        if os.path.isdir(SHM_DIR) and shutil.disk_usage(SHM_DIR).free < size:
+            return None
+        try:
+            buffer = shared_memory.SharedMemory(create=True, size=size)
+        except OSError:
+            return None
+        try:
+            with open(path, "rb") as f:
+                offset = 0
+                while offset < size and not self.closed:
+                    count = f.readinto(buffer.buf[offset:min(size, offset + PREFETCH_READ_BYTES)])
+                    if not count:
+                        break
+                    offset += count
+                if offset == size and not f.read(1):
+                    return buffer
+        except OSError:
+            pass
+        self._free(buffer)
+        return None
+
+
+def open_prefetched(prefetch):
+    """
+    在渲染进程中打开预读到共享内存的 PDF
+
+    Returns:
+        (fitz.Document, SharedMemory, 内存视图)：由 _close_cached 按顺序关闭
+    """
+    buffer = shared_memory.SharedMemory(name=prefetch["name"])
+    view = buffer.buf[:prefetch["size"]]
+    try:
+        try:
+            pdf_document = fitz.open(stream=view, filetype="pdf")
+        except TypeError:
+            # 较早的 PyMuPDF 只接受 bytes，复制一份
+            pdf_document = fitz.open(stream=view.tobytes(), filetype="pdf")
+            view.release()
+            view = None
+    except Exception:
+        if view is not None:
+            view.release()
+        buffer.close()
+        raise
+    return pdf_document, buffer, view
+
+
+def _close_cached(entry):
+    """关闭渲染进程缓存的文档，预读的文档随后释放内存视图和共享内存"""
+    pdf_document, buffer, view = entry
+    pdf_document.close()
+    if view is not None:
+        view.release()
+    if buffer is not None:
+        buffer.close()
+
+
+def render_worker_main(task_connection, result_connection, pause_event, stop_event):
+    """
+    渲染进程池中的工作进程
+
+    从 task_connection 接收任务（某个 PDF 的一段页码），结果写入 result_connection。
+    kind 为 "scan" 的任务只打开文件，回报页数和每页代价（scan_done），
+    打开时崩溃或卡死的文件和渲染时一样由进程池监护。每个进程持有自己的 fitz 文档句柄，最近使用的 DOCUMENT_CACHE_SIZE 个文档保持打开，
+    调度器在多个文件之间切换时不必反复打开。任务带有 prefetch 时从预读的共享内存打开；
+    这类文档最多缓存一个，转换进程释放的预读内存不会被各进程长期占住。
+    收到 None 或主进程关闭管道时退出。
+    """
+    # 中断信号由主进程统一处理，工作进程只响应 stop_event
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    result_queue = _ResultPipe(result_connection)
+    documents = collections.OrderedDict()
+
+    try:
+        while True:
+            try:
+                task = task_connection.recv()
+            except EOFError:
+                break
+            if task is None:
+                break
+
+            task_id = task["task_id"]
+            file_index = task["file_index"]
+            options = resolve_options(task.get("options"))
+            batcher = _PageResultBatcher(
+                result_queue, task_id, file_index, options["progress_interval"]
+            )
+
+            open_time = 0.0
+            try:
+                # 常驻进程池（转换服务）中同一路径的文件可能已被替换，缓存按大小和修改时间区分；
+                # 预读的文件按共享内存区分，不必再访问原路径
+                prefetch = task.get("prefetch")
+                if prefetch is not None:
+                    cache_key = (task["pdf_path"], prefetch["name"])
+                else:
+                    stat = os.stat(task["pdf_path"])
+                    cache_key = (task["pdf_path"], stat.st_size, stat.st_mtime_ns)
+                entry = documents.pop(cache_key, None)
+                if entry is None:
+                    start = time.perf_counter()
+                    if prefetch is not None:
+                        for key in [key for key, item in documents.items() if item[1] is not None]:
+                            _close_cached(documents.pop(key))
+                        try:
+                            entry = open_prefetched(prefetch)
+                        except FileNotFoundError:
+                            # 预读内存已被释放（文件已取消或结束），从路径打开
+                            entry = None
+                    if entry is None:
+                        entry = (fitz.open(task["pdf_path"]), None, None)
+                    open_time = time.perf_counter() - start
+                documents[cache_key] = entry
+                pdf_document = entry[0]
+                while len(documents) > DOCUMENT_CACHE_SIZE:
+                    _close_cached(documents.popitem(last=False)[1])
+
+                if task.get("kind") == "scan":
+                    result_queue.put({
+                        "type": "scan_done",
+                        "task_id": task_id,
+                        "file_index": file_index,
+                        "open_time": open_time,
+                        "total_pages": len(pdf_document),
+                        "costs": estimate_page_costs(pdf_document, task["dpi"], options)
+                    })
+                    continue
+
+                try:
+                    finished = render_pages(
+                        pdf_document, task["pdf_path"], task["output_dir"],
+                        task["output_format"], task["quality"], task["dpi"],
+                        task["pages"], pause_event, stop_event, batcher.add,
+                        options, batcher.keepalive
+                    )
+                finally:
+                    batcher.flush()
+            except Exception as e:
+                result_queue.put({
+                    "type": "task_error",
+                    "task_id": task_id,
+                    "file_index": file_index,
+                    "error": str(e)
+                })
+                continue
+
+            result_queue.put({
+                "type": "task_done",
+                "task_id": task_id,
+                "file_index": file_index,
+                "open_time": open_time,
+                "stopped": not finished
+            })
+    finally:
+        for entry in documents.values():
+            _close_cached(entry)
+
+
+class RenderPool:
+    """
+    渲染进程池（带监护）
+
+    每个工作进程有自己的任务管道和结果管道，一次只派发一个任务，
+    因此主进程知道每个任务在哪个进程上运行。get_result() 同时检查各进程：
+    进程异常退出（如 MuPDF 崩溃），或超过 page_timeout 秒没有完成任何页面（卡死）时，
+    结束并重启该进程，它的任务以 task_error 回报（crashed 为 True），其他进程不受影响。
+    暂停期间不计时。
+    """
+
+    def __init__(self, worker_count, pause_event, stop_event):
+        self.worker_count = max(1, int(worker_count))
+        self.pause_event = pause_event
+        self.stop_event = stop_event
+        # 等待派发的任务
+        self.pending = collections.deque()
+        # 已收到、尚未取走的结果消息
+        self.results = collections.deque()
+        # 每个进程一项：{"process", "task_connection", "result_connection",
+        #                "task", "page_timeout", "last_progress"}
+        self.slots = []
+        self.restarts = 0
+
+    @property
+    def workers(self):
+        """当前的工作进程"""
+        return [slot["process"] for slot in self.slots]
+
+    def start(self):
+        """启动全部工作进程"""
+        # 工作进程会附加到转换进程预读的共享内存；先启动资源跟踪进程让各进程共用，
+        # 否则 fork 出的进程各自启动跟踪进程，退出时把这些内存当作泄漏报告
+        if os.name == "posix":
+            resource_tracker.ensure_running()
+        for _ in range(self.worker_count):
+            self.slots.append(self._start_worker())
+
+    def _start_worker(self):
+        task_reader, task_writer = multiprocessing.Pipe(duplex=False)
+        result_reader, result_writer = multiprocessing.Pipe(duplex=False)
+        worker = Process(
+            target=render_worker_main,
+            args=(task_reader, result_writer, self.pause_event, self.stop_event),
+            daemon=True
+        )
+        worker.start()
+        # 子进程一端只由子进程持有，子进程退出后主进程才能读到管道结束
+        task_reader.close()
+        result_writer.close()
+        return {
+            "process": worker,
+            "task_connection": task_writer,
+            "result_connection": result_reader,
+            "task": None,
+            "page_timeout": 0,
+            "last_progress": time.monotonic()
+        }
+
+    def submit(self, task):
+        """提交一个渲染任务"""
+        self.pending.append(task)
+        self._dispatch()
+
+    def get_result(self, timeout=0.1):
+        """获取一条结果消息，超时返回 None"""
+        if not self.results:
+            self._poll(timeout)
+        return self.results.popleft() if self.results else None
+
+    def running_tasks(self):
+        """正在各进程上运行的任务"""
+        return [slot["task"] for slot in self.slots if slot["task"] is not None]
+
+    def abort_tasks(self, predicate, error):
+        """
+        放弃满足 predicate(task) 的任务：未派发的直接移除，运行中的结束其进程并重启
+
+        每个被放弃的任务回报一条 task_error。
+
+        Returns:
+            放弃的任务数
+        """
+        aborted = [task for task in self.pending if predicate(task)]
+        for task in aborted:
+            self.pending.remove(task)
+            self.results.append(self._task_error(task, error))
+        for slot in self.slots:
+            task = slot["task"]
+            if task is not None and predicate(task):
+                self._restart(slot, error)
+                aborted.append(task)
+        self._dispatch()
+        return len(aborted)
+
+    @staticmethod
+    def _task_error(task, error):
+        return {
+            "type": "task_error",
+            "task_id": task["task_id"],
+            "file_index": task["file_index"],
+            "error": error,
+            "crashed": True
+        }
+
+    def _dispatch(self):
+        """把等待的任务交给空闲的进程"""
+        for slot in self.slots:
+            if not self.pending:
+                return
+            if slot["task"] is not None:
+                continue
+            task = self.pending.popleft()
+            try:
+                slot["task_connection"].send(task)
+            except OSError:
+                # 进程已退出，任务放回，由 _poll 重启进程
+                self.pending.appendleft(task)
+                continue
+            slot["task"] = task
+            slot["page_timeout"] = resolve_options(task.get("options"))["page_timeout"]
+            slot["last_progress"] = time.monotonic()
+
+    def _receive(self, slot):
+        """读取进程已发出的全部结果"""
+        connection = slot["result_connection"]
+        try:
+            while connection.poll():
+                message = connection.recv()
+                slot["last_progress"] = time.monotonic()
+                if message["type"] == "keepalive":
+                    # 只用于卡死检测
+                    continue
+                if message["type"] in ("task_done", "task_error", "scan_done"):
+                    slot["task"] = None
+                self.results.append(message)
+        except (EOFError, OSError):
+            pass
+
+    def _poll(self, timeout):
+        """等待结果，并检查进程是否退出或卡死"""
+        self._dispatch()
+        waitables = {}
+        for slot in self.slots:
+            waitables[slot["result_connection"]] = slot
+            waitables[slot["process"].sentinel] = slot
+        ready = multiprocessing.connection.wait(list(waitables), timeout)
+        for obj in ready:
+            self._receive(waitables[obj])
+
+        now = time.monotonic()
+        for slot in self.slots:
+            if not slot["process"].is_alive():
+                self._restart(slot, f"渲染进程异常退出（退出码 {slot['process'].exitcode}）")
+            elif slot["task"] is None:
+                continue
+            elif self.pause_event.is_set():
+                # 暂停期间不计时
+                slot["last_progress"] = now
+            elif slot["page_timeout"] and now - slot["last_progress"] > slot["page_timeout"]:
+                if slot["task"].get("kind") == "scan":
+                    error = f"打开文件超过 {slot['page_timeout']:g} 秒没有完成，已结束渲染进程"
+                else:
+                    error = f"超过 {slot['page_timeout']:g} 秒没有完成任何页面，已结束渲染进程"
+                self._restart(slot, error)
+        self._dispatch()
+
+    def _restart(self, slot, error):
+        """结束并重启进程，正在运行的任务回报 task_error"""
+        process = slot["process"]
+        if process.is_alive():
+            process.kill()
+        process.join(timeout=1)
+        # 先取走进程退出前发出的结果（任务可能已经完成）
+        self._receive(slot)
+        task = slot["task"]
+        if task is not None:
+            self.results.append(self._task_error(task, error))
+        slot["task_connection"].close()
+        slot["result_connection"].close()
+        slot.update(self._start_worker())
+        self.restarts += 1
+
+    def shutdown(self, timeout=5):
+        """通知工作进程退出，超时未退出的进程强制结束"""
+        for slot in self.slots:
+            try:
+                slot["task_connection"].send(None)
+            except OSError:
+                pass
+
+        # 退出前需要读空结果管道，否则写管道的进程无法结束
+        deadline = time.monotonic() + timeout
+        while any(slot["process"].is_alive() for slot in self.slots):
+            if time.monotonic() > deadline:
+                break
+            ready = multiprocessing.connection.wait(
+                [slot["result_connection"] for slot in self.slots], 0.05)
+            for slot in self.slots:
+                if slot["result_connection"] in ready:
+                    self._receive(slot)
+
+        for slot in self.slots:
+            if slot["process"].is_alive():
+                slot["process"].terminate()
+            slot["process"].join(timeout=1)
+            slot["task_connection"].close()
+            slot["result_connection"].close()
+        self.slots = []
+        self.pending.clear()
+
+
+def _percentile(sorted_values, percent):
+    """最近秩法求百分位数（sorted_values 需已排序）"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+    return sorted_values[min(len(sorted_values), int(rank)) - 1]
+
+
+class TimingStats:
+    """
+    汇总逐页各阶段耗时，生成运行结束时的统计（总计、百分位、最慢页面）
+    """
+
+    def __init__(self):
+        self.samples = {stage: [] for stage in STAGES}
+        self.bytes = []
+        self.slowest = []
+
+    def add_open(self, seconds):
+        self.samples["open"].append(seconds)
+
+    def add_page(self, filename, page, render_time, encode_time, write_time, output_bytes):
+        self.samples["render"].append(render_time)
+        self.samples["encode"].append(encode_time)
+        self.samples["write"].append(write_time)
+        self.bytes.append(output_bytes)
+
+        total = render_time + encode_time + write_time
+        entry = (total, filename, page, render_time, encode_time, write_time)
+        if len(self.slowest) < SLOWEST_PAGES:
+            heapq.heappush(self.slowest, entry)
+        elif total > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    def totals(self):
+        """各阶段累计耗时（秒，所有进程之和）"""
+        return {stage: sum(values) for stage, values in self.samples.items()}
+
+    def summary(self):
+        """各阶段的总计/平均/百分位，以及最慢的若干页"""
+        stages = {}
+        for stage, values in self.samples.items():
+            ordered = sorted(values)
+            stages[stage] = {
+                "count": len(ordered),
+                "total": round(sum(ordered), 4),
+                "mean": round(sum(ordered) / len(ordered), 4) if ordered else 0.0,
+                "p50": round(_percentile(ordered, 50), 4),
+                "p90": round(_percentile(ordered, 90), 4),
+                "p99": round(_percentile(ordered, 99), 4),
+                "max": round(ordered[-1], 4) if ordered else 0.0
+            }
+        slowest = [
+            {
+                "filename": filename,
+                "page": page,
+                "total_time": round(total, 4),
+                "render_time": round(render_time, 4),
+                "encode_time": round(encode_time, 4),
+                "write_time": round(write_time, 4)
+            }
+            for total, filename, page, render_time, encode_time, write_time
+            in sorted(self.slowest, reverse=True)
+        ]
+        return {
+            "stages": stages,
+            "bytes": {
+                "total": sum(self.bytes),
+                "mean": round(sum(self.bytes) / len(self.bytes)) if self.bytes else 0
+            },
+            "slowest_pages": slowest
+        }
+
+
+def output_settings(output_format, quality, dpi, options):
+    """影响输出图片内容的参数，记录在清单中用于判断能否续转"""
+    settings = {
+        "format": output_format,
+        "quality": quality,
+        "dpi": dpi,
+        "max_pixels": options["max_pixels"],
+        "max_long_edge": options["max_long_edge"],
+        "passthrough": options["passthrough"],
+        "colorspace": options["colorspace"],
+        "bilevel_threshold": options["bilevel_threshold"],
+        "sink": options["sink"],
+        "encoder": encoder_settings(options)
+    }
+    if options["outputs"]:
+        settings["outputs"] = options["outputs"]
+    # 默认档案和默认的空白页处理不写入，之前的清单仍可续转
+    if options["render_profile"] != "quality":
+        settings["render_profile"] = options["render_profile"]
+    if options["blank_pages"] != "render":
+        settings["blank_pages"] = options["blank_pages"]
+        settings["blank_threshold"] = options["blank_threshold"]
+    return settings
+
+
+def manifest_page_info(result):
+    """把 render_pages 的逐页结果整理为清单中该页的记录"""
+    page_info = {
+        "file": result["file"],
+        "dpi": result["dpi"],
+        "bytes": result["bytes"]
+    }
+    if "parts" in result:
+        page_info["parts"] = result["parts"]
+    if "outputs" in result:
+        page_info["outputs"] = result["outputs"]
+    if result.get("blank"):
+        page_info["blank"] = True
+    return page_info
+
+
+def estimate_page_costs(pdf_document, dpi, options):
+    """
+    估算每页的渲染代价（输出像素数），只读取页面尺寸，不解析页面内容
+
+    Returns:
+        每页像素数的列表（多输出时为各输出之和）
+    """
+    dpis = [spec["dpi"] for spec in options["outputs"] or []] or [dpi]
+    costs = []
+    for page_num in range(len(pdf_document)):
+        rect = pdf_document.page_cropbox(page_num)
+        area = abs(rect.width * rect.height)
+        costs.append(sum(area * page_zoom(rect, d, options) ** 2 for d in dpis))
+    return costs
+
+
+def estimate_output_bytes(pixels, output_format, dpi, options, bytes_per_pixel=None):
+    """
+    按输出像素数估算输出字节数
+
+    多输出时像素按各输出 DPI 的平方分摊到各格式。
+
+    Args:
+        bytes_per_pixel: 实际测得的每像素字节数（已写入字节数 / 已完成的代价）；
+            None 时按 OUTPUT_BYTES_PER_PIXEL 和 COLORSPACE_SIZE_FACTOR 估算
+    """
+    if bytes_per_pixel is not None:
+        return int(pixels * bytes_per_pixel)
+    factor = COLORSPACE_SIZE_FACTOR.get(options["colorspace"], 1.0)
+    specs = options["outputs"] or [{"dpi": dpi, "format": output_format}]
+    weight = sum(spec["dpi"] ** 2 for spec in specs)
+    per_pixel = sum(
+        spec["dpi"] ** 2 * OUTPUT_BYTES_PER_PIXEL.get(spec["format"], 0.4) * factor
+        for spec in specs
+    ) / weight
+    return int(pixels * per_pixel)
+
+
+def estimate_seconds(pixels, output_format, dpi, options, worker_count):
+    """按输出像素数估算渲染耗时（秒），多输出时同样按 DPI 平方分摊"""
+    specs = options["outputs"] or [{"dpi": dpi, "format": output_format}]
+    weight = sum(spec["dpi"] ** 2 for spec in specs)
+    seconds_per_pixel = sum(
+        spec["dpi"] ** 2 / PIXELS_PER_SECOND.get(spec["format"], 7e6) for spec in specs
+    ) / weight
+    return pixels * seconds_per_pixel / max(1, worker_count)
+
+
+def free_disk_space(path):
+    """
+    path 所在磁盘的剩余空间（字节）
+
+    path 尚不存在时检查其最近的已存在上级目录，无法获取时返回 None。
+    """
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
+    try:
+        return shutil.disk_usage(path).free
+    except OSError:
+        return None
+
+
+class JobScheduler:
+    """
+    渲染任务调度器
+
+    总是从剩余代价最大的文件中切出下一段页码（最大优先，缩短整体耗时），
+    段的大小随剩余总页数递减：开始时大段减少调度开销，
+    临近结束时切成小段，让所有进程同时收尾。
+    支持取消单个文件和提高单个文件的优先级。
+    split_files 为 False 时（归档输出只能由一个进程写）每个文件整体作为一个任务。
+    """
+
+    def __init__(self, worker_count, split_files=True):
+        self.worker_count = max(1, worker_count)
+        self.split_files = split_files
+        self.entries = {}
+        self.heap = []
+        self.remaining_pages = 0
+        self.priority_counter = 0
+
+    def _push(self, file_index):
+        entry = self.entries[file_index]
+        entry["version"] += 1
+        key = (-entry["priority"], -entry["remaining_cost"], file_index)
+        heapq.heappush(self.heap, (key, entry["version"], file_index))
+
+    def add_file(self, file_index, pages, costs):
+        """
+        加入一个文件的待渲染页面
+
+        Args:
+            file_index: 文件序号
+            pages: 待渲染的页码（从 0 开始）
+            costs: 每页的渲染代价（按页码索引）
+        """
+        pages = collections.deque(pages)
+        if not pages:
+            return
+        self.entries[file_index] = {
+            "pages": pages,
+            "costs": costs,
+            "remaining_cost": sum(costs[page] for page in pages),
+            "priority": 0,
+            "version": 0
+        }
+        self.remaining_pages += len(pages)
+        self._push(file_index)
+
+    def has_pending(self):
+        return self.remaining_pages > 0
+
+    def pending_pages(self, file_index):
+        entry = self.entries.get(file_index)
+        return len(entry["pages"]) if entry else 0
+
+    def next_chunk(self):
+        """
+        取出下一段待渲染页面
+
+        Returns:
+            (文件序号, 页码列表)，没有待渲染页面时返回 None
+        """
+        while self.heap:
+            _, version, file_index = heapq.heappop(self.heap)
+            entry = self.entries.get(file_index)
+            if entry is None or entry["version"] != version:
+                continue
+
+            chunk_size = -(-self.remaining_pages // (self.worker_count * 2))
+            chunk_size = max(1, min(MAX_CHUNK_PAGES, chunk_size))
+            if not self.split_files:
+                chunk_size = len(entry["pages"])
+            pages = []
+            while entry["pages"] and len(pages) < chunk_size:
+                page = entry["pages"].popleft()
+                entry["remaining_cost"] -= entry["costs"][page]
+                pages.append(page)
+            self.remaining_pages -= len(pages)
+
+            if entry["pages"]:
+                self._push(file_index)
+            else:
+                del self.entries[file_index]
+            return file_index, pages
+        return None
+
+    def upcoming_files(self, count):
+        """按派发顺序排在最前的 count 个文件（含已派发部分页面的文件）"""
+        current = [item for item in self.heap
+                   if item[2] in self.entries and self.entries[item[2]]["version"] == item[1]]
+        return [file_index for _, _, file_index in heapq.nsmallest(count, current)]
+
+    def cancel(self, file_index):
+        """取消文件中尚未派发的页面，返回取消的页数"""
+        entry = self.entries.pop(file_index, None)
+        if entry is None:
+            return 0
+        self.remaining_pages -= len(entry["pages"])
+        return len(entry["pages"])
+
+    def prioritize(self, file_index):
+        """把文件提到队首（后提的排在更前面）"""
+        entry = self.entries.get(file_index)
+        if entry is None:
+            return False
+        self.priority_counter += 1
+        entry["priority"] = self.priority_counter
+        self._push(file_index)
+        return True
+
+
+class ConversionCoordinator:
+    """
+    转换协调器（运行在转换进程中）
+
+    预先读取所有文件的页数和页面尺寸，由 JobScheduler 按代价排序、切分任务，
+    交给渲染进程池并行处理，并把各进程的逐页结果汇总为 file_* / overall_progress 消息
+    （高频进度消息经 CoalescingProgress 合并后发出）。
+    启用续转时，清单中已完成的页面不再重复渲染。
+    """
+
+    def __init__(self, pdf_files, output_dir, output_format, quality, dpi,
+                 progress_queue, pause_event, stop_event,
+                 worker_count=None, options=None, control_queue=None):
+        self.pdf_files = pdf_files
+        self.output_dir = output_dir
+        self.output_format = output_format
+        self.quality = quality
+        self.dpi = dpi
+        self.pause_event = pause_event
+        self.stop_event = stop_event
+        self.control_queue = control_queue
+        self.options = resolve_options(options)
+        if self.options["outputs"]:
+            self.options["outputs"] = parse_outputs(self.options["outputs"], output_format)
+        self.worker_count = worker_count or default_worker_count()
+        self.settings = output_settings(output_format, quality, dpi, self.options)
+        self.progress = CoalescingProgress(progress_queue, self.options["progress_interval"])
+        self.scheduler = JobScheduler(self.worker_count,
+                                      split_files=self.options["sink"] == "dir")
+        self.timing = TimingStats()
+
+        self.files = {}
+        self.total_files = len(pdf_files)
+        self.success_count = 0
+        self.error_count = 0
+        self.cancelled_count = 0
+        self.total_pages_done = 0
+        self.skipped_pages = 0
+        self.passthrough_pages = 0
+        self.blank_pages = 0
+        self.gray_pages = 0
+        self.bytes_written = 0
+        # 等待交给渲染进程读取的文件、正在读取的文件，以及是否已全部读取完
+        self.scan_queue = collections.deque()
+        self.scanning = set()
+        self.scanned = False
+        # 本次运行待渲染的总代价，以及已完成页面的代价和写入字节数，用于转换中复查剩余空间
+        self.pending_cost = 0
+        self.run_cost = 0
+        self.run_bytes = 0
+        self.space_warned = False
+        self.last_space_check = time.monotonic()
+        self.next_task_id = 0
+        self.outstanding = 0
+        self.max_outstanding = self.worker_count * 2
+        self.last_flush = time.monotonic()
+        self.quarantine = load_quarantine(output_dir)
+        self.quarantined_count = 0
+        self.worker_restarts = 0
+        self.last_timeout_check = time.monotonic()
+        # 输入预读，第一次派发时创建
+        self.prefetcher = None
+
+    # ---------- 文件状态 ----------
+
+    def flush_manifests(self, force=False):
+        """定期把各文件的清单写盘"""
+        if not force and time.monotonic() - self.last_flush < MANIFEST_FLUSH_INTERVAL:
+            return
+        self.last_flush = time.monotonic()
+        for state in self.files.values():
+            if state["manifest_dirty"]:
+                try:
+                    save_manifest(state["output_dir"], state["manifest"])
+                except OSError:
+                    pass
+                state["manifest_dirty"] = False
+
+    def finish_file(self, file_index, error=None, cancelled=False):
+        """文件结束（完成/出错/取消），已结束的文件忽略"""
+        state = self.files[file_index]
+        if state["finished"]:
+            return
+        state["finished"] = True
+        self.scheduler.cancel(file_index)
+        if self.prefetcher is not None:
+            self.prefetcher.release(self.pdf_files[file_index])
+
+        # 不再渲染的页面的代价，界面据此从总代价中扣除
+        unfinished = state.get("cost", 0) - state.get("done_cost", 0)
+        if cancelled:
+            self.cancelled_count += 1
+            self.progress.put({
+                "type": "file_cancelled",
+                "file_index": file_index,
+                "filename": state["filename"],
+                "unfinished_pixels": int(unfinished)
+            })
+        elif error is None:
+            self.success_count += 1
+            # 重试的隔离文件这次转换成功，移出隔离名单
+            if self.quarantine.pop(os.path.abspath(self.pdf_files[file_index]), None):
+                self.save_quarantine()
+            self.progress.put({
+                "type": "file_complete",
+                "file_index": file_index,
+                "filename": state["filename"]
+            })
+        else:
+            self.error_count += 1
+            self.progress.put({
+                "type": "file_error",
+                "file_index": file_index,
+                "filename": state["filename"],
+                "error": error,
+                "quarantined": state.get("quarantined", False),
+                "unfinished_pixels": int(unfinished)
+            })
+        self.progress.put({
+            "type": "overall_progress",
+            "current_file": self.success_count + self.error_count + self.cancelled_count,
+            "total_files": self.total_files
+        })
+
+    def scan_file(self, file_index):
+        """
+        建立文件状态并检查隔离名单，文件排入待读取队列
+
+        打开文件、读取页数和页面尺寸由渲染进程完成（见 dispatch），
+        有问题的 PDF 在打开时崩溃或卡死不会影响转换进程。
+        """
+        pdf_path = self.pdf_files[file_index]
+        state = {
+            "filename": os.path.basename(pdf_path),
+            "output_dir": get_pdf_output_dir(self.output_dir, pdf_path),
+            "total_pages": 0,
+            "done_pages": 0,
+            "skipped_pages": 0,
+            "outstanding_tasks": 0,
+            "manifest": None,
+            "manifest_dirty": False,
+            "started": False,
+            "finished": False
+        }
+        self.files[file_index] = state
+        quarantine_error = None
+        try:
+            fingerprint = file_fingerprint(pdf_path)
+            state["source"] = fingerprint
+            quarantine_error = self.quarantined_error(pdf_path, fingerprint)
+            state["quarantined"] = quarantine_error is not None
+        except Exception as e:
+            quarantine_error = str(e)
+        if quarantine_error is not None:
+            self.start_file(file_index)
+            self.finish_file(file_index, quarantine_error)
+            return
+        self.scan_queue.append(file_index)
+
+    def file_scanned(self, file_index, total_pages, costs):
+        """渲染进程读出页数和每页代价后读取清单，把待渲染页面交给调度器"""
+        state = self.files[file_index]
+        if state["finished"]:
+            return
+        pdf_path = self.pdf_files[file_index]
+        fingerprint = state["source"]
+        completed = {}
+        if self.options["resume"]:
+            completed = completed_pages_from_manifest(
+                load_manifest(state["output_dir"]), state["output_dir"],
+                fingerprint, self.settings, Path(pdf_path).stem
+            )
+        state["manifest"] = {
+            "version": MANIFEST_VERSION,
+            "source": fingerprint,
+            "settings": self.settings,
+            "total_pages": total_pages,
+            "pages": {str(page): info for page, info in completed.items()}
+        }
+        state["manifest_dirty"] = True
+        state["total_pages"] = total_pages
+        state["done_pages"] = len(completed)
+        state["skipped_pages"] = len(completed)
+        state["costs"] = costs
+        state["cost"] = sum(costs)
+        state["done_cost"] = sum(costs[page - 1] for page in completed if page <= total_pages)
+        self.skipped_pages += len(completed)
+
+        remaining = [page for page in range(total_pages) if page + 1 not in completed]
+        self.scheduler.add_file(file_index, remaining, costs)
+
+    def start_file(self, file_index):
+        """文件的第一段任务派发时发送开始消息"""
+        state = self.files[file_index]
+        if state["started"]:
+            return
+        state["started"] = True
+        self.progress.put({
+            "type": "file_start",
+            "file_index": file_index,
+            "filename": state["filename"]
+        })
+        self.progress.put({
+            "type": "file_total_pages",
+            "file_index": file_index,
+            "total_pages": state["total_pages"],
+            "skipped_pages": state["skipped_pages"]
+        })
+        if state["done_pages"]:
+            self.progress.put({
+                "type": "file_progress",
+                "file_index": file_index,
+                "filename": state["filename"],
+                "current_page": state["done_pages"],
+                "total_pages": state["total_pages"]
+            })
+
+    def quarantined_error(self, pdf_path, fingerprint):
+        """文件在隔离名单中且未改变时返回跳过原因，否则返回 None"""
+        entry = self.quarantine.get(os.path.abspath(pdf_path))
+        if (not self.options["skip_quarantined"] or not isinstance(entry, dict)
+                or entry.get("source") != fingerprint):
+            return None
+        return f"已隔离，跳过（{entry.get('error')}）"
+
+    def quarantine_file(self, file_index, error):
+        """把导致渲染进程崩溃或超时的文件加入隔离名单，文件改变之前不再转换"""
+        state = self.files[file_index]
+        if state.get("quarantined") or "source" not in state:
+            return
+        state["quarantined"] = True
+        self.quarantined_count += 1
+        self.quarantine[os.path.abspath(self.pdf_files[file_index])] = {
+            "source": state["source"],
+            "error": error,
+            "time": time.strftime("%Y-%m-%d %H:%M:%S")
+        }
+        self.save_quarantine()
+
+    def save_quarantine(self):
+        try:
+            save_quarantine(self.output_dir, self.quarantine)
+        except OSError:
+            pass
+
+    def maybe_finish_file(self, file_index):
+        """没有待派发和进行中的任务时文件完成"""
+        state = self.files[file_index]
+        if (not state["finished"] and state["outstanding_tasks"] == 0
+                and self.scheduler.pending_pages(file_index) == 0):
+            self.start_file(file_index)
+            self.finish_file(file_index)
+
+    def record_page(self, file_index, result):
+        """记录工作进程完成的一页"""
+        state = self.files[file_index]
+        self.total_pages_done += 1
+        self.bytes_written += result["bytes"]
+        self.timing.add_page(
+            state["filename"], result["page"], result["render_time"],
+            result["encode_time"], result["write_time"], result["bytes"]
+        )
+        message = {
+            "type": "page_stats",
+            "file_index": file_index,
+            "filename": state["filename"],
+            "page": result["page"],
+            "file": result["file"],
+            "dpi": result["dpi"],
+            "colorspace": result["colorspace"],
+            "bytes": result["bytes"],
+            "render_time": result["render_time"],
+            "encode_time": result["encode_time"],
+            "write_time": result["write_time"],
+            "passthrough": result.get("passthrough", False),
+            "blank": result.get("blank", False),
+            # 该页的预估代价（输出像素数），界面按代价计算总进度；文件结束后完成的页面不再计入
+            "cost": 0 if state["finished"] else int(state["costs"][result["page"] - 1])
+        }
+        state["done_cost"] += message["cost"]
+        if message["cost"]:
+            self.run_cost += message["cost"]
+            self.run_bytes += result["bytes"]
+        if "parts" in result:
+            message["parts"] = result["parts"]
+        if "outputs" in result:
+            message["outputs"] = result["outputs"]
+        self.progress.put(message)
+        if result.get("passthrough"):
+            self.passthrough_pages += 1
+        if result.get("blank"):
+            self.blank_pages += 1
+        elif result["colorspace"] == "gray":
+            self.gray_pages += 1
+        state["manifest"]["pages"][str(result["page"])] = manifest_page_info(result)
+        state["manifest_dirty"] = True
+        if state["finished"]:
+            return
+        state["done_pages"] += 1
+        self.progress.put({
+            "type": "file_progress",
+            "file_index": file_index,
+            "filename": state["filename"],
+            "current_page": state["done_pages"],
+            "total_pages": state["total_pages"]
+        })
+
+    # ---------- 调度 ----------
+
+    def handle_control(self):
+        """处理界面发来的取消/优先请求"""
+        if self.control_queue is None:
+            return
+        while True:
+            try:
+                command = self.control_queue.get_nowait()
+            except queue.Empty:
+                return
+            self.apply_control(command)
+
+    def apply_control(self, command):
+        """执行一条取消/优先请求"""
+        file_index = command.get("file_index")
+        if file_index not in self.files:
+            return
+        if command["type"] == "cancel_file":
+            # 已派发的任务继续完成，未派发的页面全部取消
+            self.start_file(file_index)
+            self.finish_file(file_index, cancelled=True)
+        elif command["type"] == "prioritize_file":
+            self.scheduler.prioritize(file_index)
+
+    def check_space(self, estimated_bytes, free_bytes):
+        """
+        预计输出超过剩余空间时按 options["space_check"] 处理
+
+        warn 只发送 space_warning；abort 发送后停止批次；ask 发送后等待界面通过控制队列回复
+        {"type": "space_confirm", "proceed": True/False}，等待期间照常处理取消/优先请求。
+        """
+        mode = self.options["space_check"]
+        if (mode == "ignore" or free_bytes is None
+                or estimated_bytes * SPACE_MARGIN <= free_bytes):
+            return
+        self.progress.put({
+            "type": "space_warning",
+            "estimated_bytes": estimated_bytes,
+            "free_bytes": free_bytes,
+            "output_dir": self.output_dir,
+            "action": mode
+        })
+        if mode == "abort":
+            self.stop_event.set()
+        elif mode == "ask" and self.control_queue is not None:
+            while not self.stop_event.is_set():
+                try:
+                    command = self.control_queue.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if command.get("type") == "space_confirm":
+                    if not command.get("proceed"):
+                        self.stop_event.set()
+                    return
+                self.apply_control(command)
+
+    def recheck_space(self):
+        """
+        按已完成页面实际写入的字节数重新预估剩余输出，超过剩余空间时按 check_space 处理
+
+        开始前的预估只用各格式的经验值，扫描件、照片等页面可能大出数倍；
+        完成的代价达到 SPACE_RECHECK_FRACTION 后每隔 SPACE_RECHECK_INTERVAL 秒复查一次，
+        每个批次最多提示一次。
+        """
+        if (self.space_warned or self.options["space_check"] == "ignore"
+                or self.run_cost < self.pending_cost * SPACE_RECHECK_FRACTION):
+            return
+        now = time.monotonic()
+        if now - self.last_space_check < SPACE_RECHECK_INTERVAL:
+            return
+        self.last_space_check = now
+        free_bytes = free_disk_space(self.output_dir)
+        remaining_bytes = estimate_output_bytes(
+            max(self.pending_cost - self.run_cost, 0), self.output_format, self.dpi,
+            self.options, self.run_bytes / self.run_cost)
+        if free_bytes is not None and remaining_bytes * SPACE_MARGIN > free_bytes:
+            self.space_warned = True
+            self.check_space(remaining_bytes, free_bytes)
+
+    def dispatch(self, pool, limit=None):
+        """
+        补充任务，保持每个进程都有活干
+
+        Args:
+            pool: 渲染进程池（只用到 submit）
+            limit: 本次最多派发的任务数，None 表示派发到 max_outstanding 为止
+
+        Returns:
+            本次派发的任务数
+        """
+        if not self.scanned:
+            return self.dispatch_scans(pool, limit)
+        if self.options["prefetch_files"] > 0 and self.prefetcher is None:
+            self.prefetcher = InputPrefetcher(self.options["prefetch_files"],
+                                              self.options["prefetch_mb"] * 1024 * 1024)
+        dispatched = 0
+        while self.outstanding < self.max_outstanding:
+            if limit is not None and dispatched >= limit:
+                break
+            chunk = self.scheduler.next_chunk()
+            if chunk is None:
+                break
+            file_index, pages = chunk
+            self.start_file(file_index)
+            self.files[file_index]["outstanding_tasks"] += 1
+            pool.submit({
+                "task_id": self.next_task_id,
+                "file_index": file_index,
+                "pdf_path": self.pdf_files[file_index],
+                "output_dir": self.output_dir,
+                "output_format": self.output_format,
+                "quality": self.quality,
+                "dpi": self.dpi,
+                "options": self.options,
+                "pages": pages,
+                "prefetch": (None if self.prefetcher is None
+                             else self.prefetcher.get(self.pdf_files[file_index]))
+            })
+            self.next_task_id += 1
+            self.outstanding += 1
+            dispatched += 1
+        if dispatched and self.prefetcher is not None:
+            self.prefetcher.want([
+                (self.pdf_files[index], self.files[index]["source"]["size"])
+                for index in self.scheduler.upcoming_files(self.options["prefetch_files"])
+            ])
+        return dispatched
+
+    def dispatch_scans(self, pool, limit=None):
+        """
+        把待读取的文件交给渲染进程（kind 为 "scan" 的任务），全部读取完后结束扫描阶段
+
+        停止后不再读取剩下的文件，它们不计入本批次。
+        """
+        if self.stop_event.is_set():
+            for file_index in self.scan_queue:
+                del self.files[file_index]
+            self.scan_queue.clear()
+        dispatched = 0
+        while self.scan_queue and self.outstanding < self.max_outstanding:
+            if limit is not None and dispatched >= limit:
+                break
+            file_index = self.scan_queue.popleft()
+            if self.files[file_index]["finished"]:
+                continue
+            self.scanning.add(file_index)
+            self.files[file_index]["outstanding_tasks"] += 1
+            pool.submit({
+                "task_id": self.next_task_id,
+                "kind": "scan",
+                "file_index": file_index,
+                "pdf_path": self.pdf_files[file_index],
+                "dpi": self.dpi,
+                "options": self.options
+            })
+            self.next_task_id += 1
+            self.outstanding += 1
+            dispatched += 1
+        if not self.scan_queue and not self.scanning:
+            self.finish_scan()
+        return dispatched
+
+    def close_prefetcher(self):
+        """批次结束时释放预读的共享内存"""
+        if self.prefetcher is not None:
+            self.prefetcher.close()
+            self.prefetcher = None
+
+    def handle_result(self, message, pool=None):
+        """
+        处理工作进程的结果消息
+
+        渲染进程崩溃或卡死时文件加入隔离名单，并通过 pool 放弃该文件的其他任务。
+        """
+        file_index = message["file_index"]
+        state = self.files[file_index]
+
+        if message["type"] == "pages_done":
+            for result in message["results"]:
+                self.record_page(file_index, result)
+            self.recheck_space()
+            return
+
+        self.outstanding -= 1
+        state["outstanding_tasks"] -= 1
+        if message.get("open_time"):
+            self.timing.add_open(message["open_time"])
+
+        if file_index in self.scanning:
+            # 读取文件的任务：崩溃或卡死的文件加入隔离名单
+            self.scanning.discard(file_index)
+            if message["type"] == "scan_done":
+                self.file_scanned(file_index, message["total_pages"], message["costs"])
+            else:
+                if message.get("crashed"):
+                    self.quarantine_file(file_index, message["error"])
+                self.start_file(file_index)
+                self.finish_file(file_index, message["error"])
+            if not self.scan_queue and not self.scanning:
+                self.finish_scan()
+            return
+
+        if message["type"] == "task_error":
+            if message.get("crashed") and not state.get("quarantined"):
+                self.quarantine_file(file_index, message["error"])
+                if pool is not None:
+                    pool.abort_tasks(lambda task: task["file_index"] == file_index,
+                                     message["error"])
+            self.finish_file(file_index, message["error"])
+        elif not message["stopped"]:
+            self.maybe_finish_file(file_index)
+
+    def check_file_timeouts(self, pool):
+        """
+        超过 file_timeout 的文件记为失败并隔离，放弃其全部任务
+
+        只计文件有任务在渲染进程上运行的时间（排队和暂停不计）。
+        """
+        timeout = self.options["file_timeout"]
+        now = time.monotonic()
+        elapsed = now - self.last_timeout_check
+        if not timeout or elapsed < FILE_TIMEOUT_CHECK_INTERVAL:
+            return
+        self.last_timeout_check = now
+        if self.pause_event.is_set():
+            return
+        for file_index in {task["file_index"] for task in pool.running_tasks()}:
+            state = self.files[file_index]
+            if state["finished"]:
+                continue
+            state["run_time"] = state.get("run_time", 0.0) + elapsed
+            if state["run_time"] > timeout:
+                error = f"文件处理超过 {timeout:g} 秒"
+                self.quarantine_file(file_index, error)
+                self.finish_file(file_index, error)
+                pool.abort_tasks(lambda task: task["file_index"] == file_index, error)
+
+    def scan_files(self):
+        """
+        开始批次：建立全部文件的状态，待读取的文件由 dispatch 交给渲染进程
+
+        全部读取完后 finish_scan 发送 scan_complete 并检查剩余空间，之后才派发渲染任务。
+        """
+        self.progress.put({
+            "type": "overall_progress",
+            "current_file": 0,
+            "total_files": self.total_files
+        })
+
+        # 页数和页面尺寸在渲染任务之前由渲染进程读取
+        for file_index in range(self.total_files):
+            if self.stop_event.is_set():
+                break
+            self.scan_file(file_index)
+
+    def finish_scan(self):
+        """全部文件读取完：预估总代价、输出大小和耗时，检查剩余空间"""
+        self.scanned = True
+        # 按页面尺寸预估总代价、输出大小和耗时（只计尚未完成的页面）
+        total_cost = sum(s.get("cost", 0) for s in self.files.values())
+        done_cost = sum(s.get("done_cost", 0) for s in self.files.values())
+        pending_cost = total_cost - done_cost
+        self.pending_cost = pending_cost
+        # 开始前不渲染样本页，只按页面面积和各格式的经验值估算；转换中再按实际写入量复查
+        estimated_bytes = estimate_output_bytes(
+            pending_cost, self.output_format, self.dpi, self.options)
+        free_bytes = free_disk_space(self.output_dir)
+        self.progress.put({
+            "type": "scan_complete",
+            "total_files": self.total_files,
+            "total_pages": sum(s["total_pages"] for s in self.files.values()),
+            "pending_pages": self.scheduler.remaining_pages,
+            "estimated_pixels": int(total_cost),
+            "done_pixels": int(done_cost),
+            "estimated_bytes": estimated_bytes,
+            "estimated_seconds": round(estimate_seconds(
+                pending_cost, self.output_format, self.dpi, self.options, self.worker_count), 1),
+            "free_bytes": free_bytes
+        })
+        if free_bytes is not None and estimated_bytes * SPACE_MARGIN > free_bytes:
+            self.space_warned = True
+        self.check_space(estimated_bytes, free_bytes)
+        for file_index in list(self.files):
+            self.maybe_finish_file(file_index)
+
+    def is_done(self):
+        """文件已全部读取，且没有进行中和待派发的任务"""
+        return (self.scanned and self.outstanding == 0
+                and not self.scheduler.has_pending())
+
+    def complete(self):
+        """结束批次：写出清单并发送耗时统计和完成消息"""
+        self.flush_manifests(force=True)
+
+        # 各阶段耗时统计
+        self.progress.put({
+            "type": "timing_summary",
+            **self.timing.summary()
+        })
+
+        # 发送最终完成消息
+        self.progress.put({
+            "type": "conversion_complete",
+            "success_count": self.success_count,
+            "error_count": self.error_count,
+            "cancelled_count": self.cancelled_count,
+            "total_files": self.total_files,
+            "total_pages": self.total_pages_done,
+            "skipped_pages": self.skipped_pages,
+            "passthrough_pages": self.passthrough_pages,
+            "blank_pages": self.blank_pages,
+            "gray_pages": self.gray_pages,
+            "quarantined_count": self.quarantined_count,
+            "worker_restarts": self.worker_restarts,
+            "bytes_written": self.bytes_written,
+            "stage_times": self.timing.totals(),
+            "stopped": self.stop_event.is_set()
+        })
+
+    def run(self):
+        """执行整个批次"""
+        pool = RenderPool(self.worker_count, self.pause_event, self.stop_event)
+        pool.start()
+        self.scan_files()
+
+        try:
+            while not self.stop_event.is_set():
+                self.handle_control()
+                self.dispatch(pool)
+                self.check_file_timeouts(pool)
+                self.flush_manifests()
+                self.progress.poll()
+
+                if self.is_done():
+                    break
+
+                message = pool.get_result()
+                if message is not None:
+                    self.handle_result(message, pool)
+        finally:
+            self.worker_restarts = pool.restarts
+            pool.shutdown()
+            self.close_prefetcher()
+            self.flush_manifests(force=True)
+
+        self.complete()
+
+
+def conversion_process_main(pdf_files, output_dir, output_format, quality, dpi,
+                            progress_queue, pause_event, stop_event,
+                            worker_count=None, options=None, control_queue=None):
+    """
+    转换进程主函数
+
+    Args:
+        pdf_files: PDF 文件路径列表
+        output_dir: 输出目录
+        output_format: 输出格式 (png/jpg/tiff/webp)
+        quality: 图片质量
+        dpi: DPI
+        progress_queue: 进度消息队列
+        pause_event: 暂停事件
+        stop_event: 停止事件
+        worker_count: 并行进程数，默认 CPU 核心数
+        options: 扩展选项，见 DEFAULT_OPTIONS
+        control_queue: 接收 cancel_file / prioritize_file 请求的队列
+    """
+    ConversionCoordinator(
+        pdf_files, output_dir, output_format, quality, dpi,
+        progress_queue, pause_event, stop_event,
+        worker_count, options, control_queue
+    ).run()
@@ -0,0 +1,1266 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PDF 转图片工具 - 图形界面
+只依赖 tkinter，不导入 PyMuPDF：渲染在转换进程中进行（见 pdf2img_worker）。
+
+作者: zhifouli
+GitHub: https://github.com/zhifouli?tab=repositories
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import threading
+import collections
+import tkinter as tk
+from concurrent.futures import ProcessPoolExecutor
+from tkinter import filedialog, messagebox, simpledialog, ttk
+
+from pdf2img_converter import __app_name__, __author__, __github__, __version__
+from pdf2img_encoders import DEFAULT_PRESET, ENCODER_PRESETS, available_formats
+from pdf2img_inputs import iter_pdf_files, path_key
+from pdf2img_worker import ConversionHost, default_worker_count, read_page_count
+
+# 窗口显示后延迟多久预启动转换进程（毫秒）
+PRESTART_DELAY_MS = 200
+
+# 长边上限下拉框中“不限制”选项
+LONG_EDGE_UNLIMITED = "不限制"
+
+# 界面中的颜色模式名称
+COLORSPACE_LABELS = {"彩色": "rgb", "灰度": "gray", "黑白": "bilevel", "自动": "auto"}
+
+# 界面中的渲染档案名称（草稿：降低抗锯齿、不渲染注释；OCR：只保留文字抗锯齿）
+RENDER_PROFILE_LABELS = {"高质量": "quality", "草稿": "draft", "OCR": "ocr"}
+
+# 勾选“预读输入（网络盘）”时预读的文件数（内存上限使用默认值）
+GUI_PREFETCH_FILES = 2
+
+# 界面中的输出方式名称
+SINK_LABELS = {"文件夹": "dir", "ZIP": "zip", "TAR": "tar", "多页TIFF": "tiff"}
+
+# 实时速度的统计窗口（秒）
+SPEED_WINDOW = 5.0
+
+# 每次定时检查最多用于处理进度消息的时间（秒）
+UI_DRAIN_BUDGET = 0.05
+
+# 后台扫描文件夹时每批交给界面的文件数
+SCAN_BATCH = 500
+
+# 同时在读取页数的文件数上限（只读取列表中可见的文件）
+INFO_MAX_PENDING = 64
+
+# 文件列表中鼠标滚轮每格滚动的行数
+WHEEL_ROWS = 3
+
+
+def format_duration(seconds):
+    """将秒数格式化为 时:分:秒"""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes:02d}:{seconds:02d}"
+
+
+def format_size(size):
+    """将字节数格式化为 KB/MB/GB"""
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+class VirtualFileList(tk.Frame):
+    """
+    虚拟化的文件列表
+
+    Treeview 中只保留可见的几行，滚动时按偏移重新填充内容，
+    列表中有几万个文件时添加、滚动和标记的开销也只与可见行数有关。
+    选择按文件序号记录（单击切换选中，与原来的多选列表框一致）。
+    """
+
+    def __init__(self, master, columns, get_row, on_visible=None, height=6):
+        """
+        Args:
+            master: 父控件
+            columns: [(列名, 标题, 宽度, 是否拉伸), ...]
+            get_row: get_row(index) 返回 (各列的值, 文字颜色或 None)
+            on_visible: on_visible(range) 在可见行变化后调用，用于按需加载信息
+            height: 初始行数
+        """
+        super().__init__(master)
+        self.get_row = get_row
+        self.on_visible = on_visible
+        self.count = 0
+        self.first = 0
+        self.selected = set()
+        self.rows = []
+        self.colors = set()
+        
+        self.tree = ttk.Treeview(
+            self,
+            columns=[column[0] for column in columns],
+            show="headings",
+            selectmode="none",
+            height=height
+        )
+        for name, title, width, stretch in columns:
+            self.tree.heading(name, text=title, anchor="w")
+            self.tree.column(name, width=width, stretch=stretch, anchor="w")
+        self.tree.tag_configure("selected", background="#cce8ff")
+        
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill="both", expand=True)
+        
+        self.tree.bind("<Configure>", self.on_resize)
+        self.tree.bind("<Button-1>", self.on_click)
+        self.tree.bind("<MouseWheel>", self.on_wheel)
+        self.tree.bind("<Button-4>", lambda e: self.scroll_to(self.first - WHEEL_ROWS))
+        self.tree.bind("<Button-5>", lambda e: self.scroll_to(self.first + WHEEL_ROWS))
+        self.set_row_count(height)
+    
+    def set_row_count(self, rows):
+        """调整 Treeview 中的行数（可见行数）"""
+        rows = max(1, rows)
+        while len(self.rows) < rows:
+            self.rows.append(self.tree.insert("", "end"))
+        while len(self.rows) > rows:
+            self.tree.delete(self.rows.pop())
+        self.scroll_to(self.first)
+    
+    def on_resize(self, event):
+        """窗口大小变化时按可用高度调整行数"""
+        style = ttk.Style()
+        try:
+            row_height = int(style.lookup("Treeview", "rowheight") or 20)
+        except (ValueError, tk.TclError):
+            row_height = 20
+        # 第一行的纵坐标即表头高度（行尚未显示时按一行估计）
+        bbox = self.tree.bbox(self.rows[0]) if self.count else ""
+        heading_height = bbox[1] if bbox else row_height + 4
+        rows = (event.height - heading_height) // row_height
+        if rows != len(self.rows):
+            self.set_row_count(rows)
+    
+    def set_count(self, count):
+        """列表长度变化后刷新（只重绘可见行）"""
+        self.count = count
+        self.selected = {index for index in self.selected if index < count}
+        self.scroll_to(self.first)
+    
+    def scroll_to(self, first):
+        """从第 first 个文件开始显示"""
+        self.first = max(0, min(first, self.count - len(self.rows)))
+        self.refresh()
+    
+    def refresh(self):
+        """重新填充可见行"""
+        for position, item in enumerate(self.rows):
+            index = self.first + position
+            if index < self.count:
+                self.fill_row(item, index)
+                self.tree.move(item, "", position)
+            else:
+                self.tree.detach(item)
+        if self.count:
+            self.scrollbar.set(self.first / self.count,
+                               min(1.0, (self.first + len(self.rows)) / self.count))
+        else:
+            self.scrollbar.set(0, 1)
+        if self.on_visible is not None and self.count:
+            self.on_visible(range(self.first, min(self.first + len(self.rows), self.count)))
+    
+    def refresh_index(self, index):
+        """只重绘一个文件（不可见时什么也不做）"""
+        position = index - self.first
+        if 0 <= position < len(self.rows) and index < self.count:
+            self.fill_row(self.rows[position], index)
+    
+    def fill_row(self, item, index):
+        values, color = self.get_row(index)
+        tags = []
+        if color:
+            tag = f"fg_{color}"
+            if tag not in self.colors:
+                self.tree.tag_configure(tag, foreground=color)
+                self.colors.add(tag)
+            tags.append(tag)
+        if index in self.selected:
+            tags.append("selected")
+        self.tree.item(item, values=values, tags=tags)
+    
+    def on_scrollbar(self, action, amount, unit=None):
+        """滚动条拖动（moveto）或点击（scroll）"""
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * self.count))
+        elif action == "scroll":
+            step = len(self.rows) if unit == "pages" else 1
+            self.scroll_to(self.first + int(amount) * step)
+    
+    def on_wheel(self, event):
+        """Windows/macOS 鼠标滚轮"""
+        if event.delta:
+            self.scroll_to(self.first - WHEEL_ROWS * (1 if event.delta > 0 else -1))
+    
+    def on_click(self, event):
+        """单击行切换选中状态"""
+        if self.tree.identify_region(event.x, event.y) not in ("cell", "tree"):
+            return None
+        item = self.tree.identify_row(event.y)
+        if item not in self.rows:
+            return None
+        index = self.first + self.rows.index(item)
+        if index < self.count:
+            self.selected ^= {index}
+            self.refresh_index(index)
+        return "break"
+    
+    def selected_indices(self):
+        """选中的文件序号（升序）"""
+        return sorted(self.selected)
+    
+    def clear_selection(self):
+        self.selected.clear()
+        self.refresh()
+
+
+class PDF2ImageConverter:
+    def __init__(self, root):
+        self.root = root
+        self.root.title(f"{__app_name__} V{__version__}")
+        
+        # 设置窗口大小
+        window_width = 700
+        window_height = 715
+        
+        screen_width = self.root.winfo_screenwidth()
+        screen_height = self.root.winfo_screenheight()
+        
+        center_x = int((screen_width - window_width) / 2)
+        center_y = int((screen_height - window_height) / 2)
+        
+        self.root.geometry(f"{window_width}x{window_height}+{center_x}+{center_y}")
+        self.root.resizable(True, True)
+        
+        # 设置窗口图标
+        try:
+            if getattr(sys, 'frozen', False):
+                icon_path = os.path.join(sys._MEIPASS, 'icon.ico')
+            else:
+                icon_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'icon.ico')
+            
+            if os.path.exists(icon_path):
+                self.root.iconbitmap(icon_path)
+        except Exception as e:
+            print(f"⚠ 无法加载图标: {e}")
+        
+        self.pdf_files = []
+        # 规范化路径 -> 文件序号，添加时按此去重
+        self.file_index = {}
+        # 文件序号 -> {"size": 字节数, "pages": 页数}，列表显示到时才读取
+        self.file_info = {}
+        # 文件序号 -> 状态颜色
+        self.file_colors = {}
+        self.is_converting = False
+        
+        # 后台扫描文件夹/通配符：线程分批放入 scan_queue，界面定时取出
+        self.scan_queue = queue.Queue()
+        self.scan_stop = threading.Event()
+        self.scan_threads = 0
+        # 读取页数的进程（首次需要时启动，界面进程不加载 PyMuPDF）
+        self.info_executor = None
+        self.info_queue = queue.Queue()
+        self.info_pending = set()
+        
+        # 多进程相关
+        self.conversion_host = None
+        # 预启动、尚未使用的转换进程
+        self.spare_host = None
+        self.progress_queue = None
+        self.pause_event = None
+        self.stop_event = None
+        self.control_queue = None
+        self.is_paused = False
+        
+        self.setup_ui()
+        self.reset_run_stats()
+        self.check_progress_queue()
+        self.check_input_queues()
+    
+    def setup_ui(self):
+        """设置用户界面"""
+        # 底部信息栏（先创建，使用 pack(side="bottom")）
+        footer_frame = tk.Frame(self.root, bg="#f0f0f0", pady=8)
+        footer_frame.pack(side="bottom", fill="x")
+        
+        # 作者信息（左侧）
+        author_label = tk.Label(
+            footer_frame,
+            text=f"© 2025 {__author__}",
+            font=("Arial", 9),
+            bg="#f0f0f0",
+            fg="#666"
+        )
+        author_label.pack(side="left", padx=10)
+        
+        # GitHub 链接（右侧）
+        github_label = tk.Label(
+            footer_frame,
+            text="GitHub: zhifouli",
+            font=("Arial", 9),
+            bg="#f0f0f0",
+            fg="#1976D2",
+            cursor="hand2"
+        )
+        github_label.pack(side="right", padx=10)
+        github_label.bind("<Button-1>", lambda e: self.open_github())
+        
+        # 标题
+        title_label = tk.Label(
+            self.root, 
+            text=f"{__app_name__} V{__version__}", 
+            font=("Arial", 16, "bold"),
+            pady=10
+        )
+        title_label.pack()
+        
+        # 文件选择区域
+        file_frame = tk.LabelFrame(self.root, text="选择 PDF 文件", padx=10, pady=10)
+        file_frame.pack(padx=20, pady=(5, 10), fill="both", expand=True)
+        
+        # 文件列表（虚拟化：只创建可见的行，页数和大小显示到时才读取）
+        self.file_list = VirtualFileList(
+            file_frame,
+            columns=[
+                ("name", "文件名", 260, True),
+                ("pages", "页数", 60, False),
+                ("size", "大小", 80, False),
+                ("folder", "所在文件夹", 200, True)
+            ],
+            get_row=self.file_row,
+            on_visible=self.request_file_info,
+            height=6
+        )
+        self.file_list.pack(fill="both", expand=True)
+        
+        self.file_count_label = tk.Label(file_frame, text="共 0 个文件", fg="#666", anchor="w")
+        self.file_count_label.pack(fill="x")
+        
+        # 按钮区域
+        btn_frame = tk.Frame(file_frame)
+        btn_frame.pack(pady=5)
+        
+        tk.Button(
+            btn_frame, 
+            text="添加 PDF 文件", 
+            command=self.add_files,
+            width=12
+        ).pack(side="left", padx=4)
+        
+        tk.Button(
+            btn_frame,
+            text="添加文件夹",
+            command=self.add_folder,
+            width=12
+        ).pack(side="left", padx=4)
+        
+        tk.Button(
+            btn_frame,
+            text="按通配符添加",
+            command=self.add_pattern,
+            width=12
+        ).pack(side="left", padx=4)
+        
+        tk.Button(
+            btn_frame, 
+            text="清空列表", 
+            command=self.clear_files,
+            width=12
+        ).pack(side="left", padx=4)
+        
+        # 转换过程中调整单个文件
+        self.prioritize_btn = tk.Button(
+            btn_frame,
+            text="优先处理所选",
+            command=self.prioritize_selected,
+            width=12,
+            state="disabled"
+        )
+        self.prioritize_btn.pack(side="left", padx=4)
+        
+        self.cancel_file_btn = tk.Button(
+            btn_frame,
+            text="取消所选",
+            command=self.cancel_selected,
+            width=12,
+            state="disabled"
+        )
+        self.cancel_file_btn.pack(side="left", padx=4)
+        
+        # 设置区域
+        settings_frame = tk.LabelFrame(self.root, text="转换设置", padx=10, pady=10)
+        settings_frame.pack(padx=20, pady=(0, 10), fill="x")
+        
+        # 格式选择
+        format_frame = tk.Frame(settings_frame)
+        format_frame.pack(fill="x", pady=5)
+        
+        tk.Label(format_frame, text="输出格式:", width=10, anchor="w").pack(side="left")
+        self.format_var = tk.StringVar(value="png")
+        tk.Radiobutton(
+            format_frame, 
+            text="PNG", 
+            variable=self.format_var, 
+            value="png"
+        ).pack(side="left", padx=10)
+        tk.Radiobutton(
+            format_frame, 
+            text="JPG", 
+            variable=self.format_var, 
+            value="jpg"
+        ).pack(side="left", padx=10)
+        # TIFF 无需额外依赖；WebP 需要 Pillow
+        for output_format in ("tiff", "webp"):
+            if output_format in available_formats():
+                tk.Radiobutton(
+                    format_frame,
+                    text=output_format.upper(),
+                    variable=self.format_var,
+                    value=output_format
+                ).pack(side="left", padx=10)
+        
+        # 编码预设：速度与文件大小的取舍
+        tk.Label(format_frame, text="编码:").pack(side="left", padx=(10, 0))
+        self.preset_var = tk.StringVar(value=DEFAULT_PRESET)
+        ttk.Combobox(
+            format_frame,
+            textvariable=self.preset_var,
+            values=list(ENCODER_PRESETS),
+            width=9,
+            state="readonly"
+        ).pack(side="left", padx=10)
+        
+        # 质量选择
+        quality_frame = tk.Frame(settings_frame)
+        quality_frame.pack(fill="x", pady=5)
+        
+        tk.Label(quality_frame, text="图片质量:", width=10, anchor="w").pack(side="left")
+        self.quality_var = tk.IntVar(value=95)
+        tk.Scale(
+            quality_frame,
+            from_=50,
+            to=100,
+            orient=tk.HORIZONTAL,
+            variable=self.quality_var,
+            length=200
+        ).pack(side="left", padx=10)
+        self.quality_label = tk.Label(quality_frame, text="95%")
+        self.quality_label.pack(side="left")
+        self.quality_var.trace_add("write", self.update_quality_label)
+        
+        # 颜色模式（自动：无彩色内容的页面输出灰度）
+        tk.Label(quality_frame, text="颜色:").pack(side="left", padx=(20, 0))
+        self.colorspace_var = tk.StringVar(value="彩色")
+        ttk.Combobox(
+            quality_frame,
+            textvariable=self.colorspace_var,
+            values=list(COLORSPACE_LABELS),
+            width=6,
+            state="readonly"
+        ).pack(side="left", padx=10)
+        
+        # 渲染档案：预览和文字识别不需要最高的抗锯齿质量
+        tk.Label(quality_frame, text="渲染:").pack(side="left", padx=(10, 0))
+        self.render_profile_var = tk.StringVar(value="高质量")
+        ttk.Combobox(
+            quality_frame,
+            textvariable=self.render_profile_var,
+            values=list(RENDER_PROFILE_LABELS),
+            width=6,
+            state="readonly"
+        ).pack(side="left", padx=10)
+        
+        # DPI 选择
+        dpi_frame = tk.Frame(settings_frame)
+        dpi_frame.pack(fill="x", pady=5)
+        
+        tk.Label(dpi_frame, text="分辨率 (DPI):", width=10, anchor="w").pack(side="left")
+        self.dpi_var = tk.IntVar(value=150)
+        dpi_options = [72, 96, 150, 200, 300]
+        dpi_combo = ttk.Combobox(
+            dpi_frame,
+            textvariable=self.dpi_var,
+            values=dpi_options,
+            width=10,
+            state="readonly"
+        )
+        dpi_combo.pack(side="left", padx=10)
+        
+        # 长边像素上限（超出的页面自动降低 DPI）
+        tk.Label(dpi_frame, text="长边上限:").pack(side="left", padx=(10, 0))
+        self.long_edge_var = tk.StringVar(value=LONG_EDGE_UNLIMITED)
+        ttk.Combobox(
+            dpi_frame,
+            textvariable=self.long_edge_var,
+            values=[LONG_EDGE_UNLIMITED, "1600", "2400", "4000", "8000"],
+            width=8,
+            state="readonly"
+        ).pack(side="left", padx=10)
+        
+        # 输出方式：每页一个文件，或每个 PDF 一个归档
+        tk.Label(dpi_frame, text="输出:").pack(side="left", padx=(10, 0))
+        self.sink_var = tk.StringVar(value="文件夹")
+        ttk.Combobox(
+            dpi_frame,
+            textvariable=self.sink_var,
+            values=list(SINK_LABELS),
+            width=9,
+            state="readonly"
+        ).pack(side="left", padx=10)
+        
+        # 并行进程数
+        workers_frame = tk.Frame(settings_frame)
+        workers_frame.pack(fill="x", pady=5)
+        
+        tk.Label(workers_frame, text="并行进程:", width=10, anchor="w").pack(side="left")
+        self.workers_var = tk.IntVar(value=default_worker_count())
+        tk.Spinbox(
+            workers_frame,
+            from_=1,
+            to=max(64, default_worker_count()),
+            textvariable=self.workers_var,
+            width=10
+        ).pack(side="left", padx=10)
+        
+        self.resume_var = tk.BooleanVar(value=True)
+        tk.Checkbutton(
+            workers_frame,
+            text="断点续转（跳过已完成的页面）",
+            variable=self.resume_var
+        ).pack(side="left", padx=10)
+        
+        self.passthrough_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(
+            workers_frame,
+            text="扫描件直通",
+            variable=self.passthrough_var
+        ).pack(side="left", padx=10)
+        
+        self.skip_blank_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(
+            workers_frame,
+            text="跳过空白页",
+            variable=self.skip_blank_var
+        ).pack(side="left", padx=10)
+        
+        self.prefetch_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(
+            workers_frame,
+            text="预读输入（网络盘）",
+            variable=self.prefetch_var
+        ).pack(side="left", padx=10)
+        
+        # 转换按钮和进度区域
+        action_frame = tk.Frame(self.root)
+        action_frame.pack(padx=20, pady=(5, 10), fill="x")
+        
+        # 按钮容器
+        button_container = tk.Frame(action_frame)
+        button_container.pack(pady=(0, 10))
+        
+        self.convert_btn = tk.Button(
+            button_container,
+            text="开始转换",
+            command=self.start_conversion,
+            bg="#4CAF50",
+            fg="white",
+            font=("Arial", 11, "bold"),
+            height=2,
+            width=12,
+            cursor="hand2"
+        )
+        self.convert_btn.pack(side="left", padx=5)
+        
+        self.pause_btn = tk.Button(
+            button_container,
+            text="暂停",
+            command=self.pause_conversion,
+            bg="#FF9800",
+            fg="white",
+            font=("Arial", 11, "bold"),
+            height=2,
+            width=12,
+            cursor="hand2",
+            state="disabled"
+        )
+        self.pause_btn.pack(side="left", padx=5)
+        
+        self.stop_btn = tk.Button(
+            button_container,
+            text="停止",
+            command=self.stop_conversion,
+            bg="#F44336",
+            fg="white",
+            font=("Arial", 11, "bold"),
+            height=2,
+            width=12,
+            cursor="hand2",
+            state="disabled"
+        )
+        self.stop_btn.pack(side="left", padx=5)
+        
+        # 整体进度标签
+        self.overall_progress_label = tk.Label(
+            action_frame,
+            text="总进度: 0/0 个文件",
+            font=("Arial", 9, "bold")
+        )
+        self.overall_progress_label.pack(pady=(0, 3))
+        
+        # 整体进度条
+        self.overall_progress = ttk.Progressbar(
+            action_frame,
+            orient="horizontal",
+            mode="determinate"
+        )
+        self.overall_progress.pack(fill="x", pady=(0, 10))
+        
+        # 当前文件进度标签
+        self.file_progress_label = tk.Label(
+            action_frame,
+            text="当前文件: --",
+            font=("Arial", 9)
+        )
+        self.file_progress_label.pack(pady=(0, 3))
+        
+        # 当前文件进度条
+        self.file_progress = ttk.Progressbar(
+            action_frame,
+            orient="horizontal",
+            mode="determinate"
+        )
+        self.file_progress.pack(fill="x", pady=(0, 5))
+        
+        # 速度与预计剩余时间
+        self.speed_label = tk.Label(
+            action_frame,
+            text="速度: -- 页/秒    预计剩余: --",
+            fg="#666",
+            font=("Arial", 9)
+        )
+        self.speed_label.pack(pady=(0, 3))
+        
+        # 状态标签
+        self.status_label = tk.Label(
+            action_frame,
+            text="准备就绪",
+            fg="green",
+            font=("Arial", 9)
+        )
+        self.status_label.pack(pady=(0, 10))
+    
+    def update_quality_label(self, *args):
+        """更新质量标签"""
+        self.quality_label.config(text=f"{self.quality_var.get()}%")
+    
+    def open_github(self):
+        """打开 GitHub 链接"""
+        import webbrowser
+        webbrowser.open(__github__)
+    
+    def check_progress_queue(self):
+        """定时检查进度队列"""
+        if self.progress_queue is not None:
+            # 取出当前积压的全部消息（单次最多占用 UI_DRAIN_BUDGET 秒，避免界面卡顿）
+            deadline = time.monotonic() + UI_DRAIN_BUDGET
+            while self.progress_queue is not None and time.monotonic() < deadline:
+                try:
+                    message = self.progress_queue.get_nowait()
+                except queue.Empty:
+                    break
+                self.handle_progress_message(message)
+            self.check_host_alive()
+        
+        # 继续定时检查（100ms）
+        self.root.after(100, self.check_progress_queue)
+    
+    def check_host_alive(self):
+        """转换进程意外退出（收不到 conversion_complete）时结束本次转换"""
+        host = self.conversion_host
+        if not self.is_converting or host is None or host.is_alive():
+            return
+        try:
+            message = self.progress_queue.get_nowait()
+        except queue.Empty:
+            self.handle_conversion_complete({
+                "type": "conversion_complete",
+                "crashed": True,
+                "exitcode": host.process.exitcode
+            })
+            return
+        self.handle_progress_message(message)
+    
+    def handle_progress_message(self, message):
+        """处理进度消息"""
+        msg_type = message.get("type")
+        
+        if msg_type == "overall_progress":
+            self.run_stats["finished_files"] = message["current_file"]
+            self.run_stats["total_files"] = message["total_files"]
+            self.update_overall_progress()
+            
+        elif msg_type == "file_start":
+            filename = message["filename"]
+            self.status_label.config(text=f"正在处理: {filename}", fg="blue")
+            self.file_progress["value"] = 0
+            
+        elif msg_type == "scan_complete":
+            # 之后总进度和剩余时间按预估代价（输出像素数）计算
+            self.run_stats["total_cost"] = message["estimated_pixels"]
+            self.run_stats["done_cost"] = message["done_pixels"]
+            self.update_overall_progress()
+            eta = format_duration(message["estimated_seconds"])
+            self.speed_label.config(text=f"速度: -- 页/秒    预计剩余: {eta}")
+            self.status_label.config(
+                text=f"共 {message['total_pages']} 页，预计输出约 {format_size(message['estimated_bytes'])}",
+                fg="blue")
+            
+        elif msg_type == "space_warning":
+            self.handle_space_warning(message)
+            
+        elif msg_type == "file_total_pages":
+            total_pages = message["total_pages"]
+            self.file_progress["maximum"] = total_pages
+            
+        elif msg_type == "page_stats":
+            self.record_pages_done(1, message.get("cost", 0))
+            
+        elif msg_type == "page_stats_batch":
+            self.record_pages_done(
+                len(message["pages"]), sum(page.get("cost", 0) for page in message["pages"]))
+            
+        elif msg_type == "file_progress":
+            filename = message["filename"]
+            current = message["current_page"]
+            total = message["total_pages"]
+            self.file_progress_label.config(text=f"当前文件: {filename} - {current}/{total} 页")
+            self.file_progress["maximum"] = total
+            self.file_progress["value"] = current
+            
+        elif msg_type == "file_complete":
+            filename = message["filename"]
+            self.status_label.config(text=f"完成: {filename}", fg="green")
+            self.mark_file(message.get("file_index"), "green")
+            
+        elif msg_type == "file_error":
+            filename = message["filename"]
+            error = message["error"]
+            suffix = "（已隔离，文件改变前不再转换）" if message.get("quarantined") else ""
+            print(f"转换 {filename} 失败: {error}{suffix}")
+            self.mark_file(message.get("file_index"), "red")
+            self.run_stats["total_cost"] -= message.get("unfinished_pixels", 0)
+            self.update_overall_progress()
+            
+        elif msg_type == "file_cancelled":
+            filename = message["filename"]
+            self.status_label.config(text=f"已取消: {filename}", fg="orange")
+            self.mark_file(message.get("file_index"), "gray")
+            self.run_stats["total_cost"] -= message.get("unfinished_pixels", 0)
+            self.update_overall_progress()
+            
+        elif msg_type == "timing_summary":
+            stages = message["stages"]
+            print("各阶段耗时: " + ", ".join(
+                f"{stage} {info['total']:.2f}s (p90 {info['p90'] * 1000:.0f}ms)"
+                for stage, info in stages.items()
+            ))
+            
+        elif msg_type == "conversion_complete":
+            self.handle_conversion_complete(message)
+    
+    def reset_run_stats(self, total_files=0):
+        """重置速度/剩余时间统计"""
+        self.run_stats = {
+            "total_files": total_files,
+            "finished_files": 0,
+            # 预估代价（输出像素数），扫描完成前为 0，此时总进度按文件数计算
+            "total_cost": 0,
+            "done_cost": 0,
+            "recent": collections.deque()
+        }
+        self.speed_label.config(text="速度: -- 页/秒    预计剩余: --")
+        self.update_overall_progress()
+    
+    def update_overall_progress(self):
+        """更新总进度：扫描完成后按预估代价加权，大文件和小文件按实际工作量计入"""
+        stats = self.run_stats
+        finished, total = stats["finished_files"], stats["total_files"]
+        text = f"总进度: {finished}/{total} 个文件"
+        if stats["total_cost"] > 0:
+            done = min(stats["done_cost"], stats["total_cost"])
+            self.overall_progress["maximum"] = stats["total_cost"]
+            self.overall_progress["value"] = done
+            text += f" ({done * 100 / stats['total_cost']:.0f}%)"
+        else:
+            self.overall_progress["maximum"] = max(1, total)
+            self.overall_progress["value"] = finished
+        self.overall_progress_label.config(text=text)
+    
+    def record_pages_done(self, count, cost):
+        """记录完成的页数和代价，更新总进度、实时速度和预计剩余时间"""
+        stats = self.run_stats
+        stats["done_cost"] += cost
+        self.update_overall_progress()
+        now = time.monotonic()
+        recent = stats["recent"]
+        recent.append((now, count, cost))
+        while len(recent) > 1 and now - recent[0][0] > SPEED_WINDOW:
+            recent.popleft()
+        
+        elapsed = now - recent[0][0]
+        if elapsed <= 0:
+            return
+        # 窗口内第一条记录之前完成的页数和代价不计入
+        rate = (sum(entry[1] for entry in recent) - recent[0][1]) / elapsed
+        cost_rate = (sum(entry[2] for entry in recent) - recent[0][2]) / elapsed
+        
+        # 剩余时间按剩余代价和单位时间完成的代价估算（页面大小、分辨率不同时比按页数准确）
+        remaining = max(0, stats["total_cost"] - stats["done_cost"])
+        eta = format_duration(remaining / cost_rate) if cost_rate > 0 else "--"
+        self.speed_label.config(text=f"速度: {rate:.1f} 页/秒    预计剩余: {eta}")
+    
+    def handle_space_warning(self, message):
+        """开始前或转换中预计输出超过剩余空间：询问是否继续（转换进程等待回复）"""
+        estimated = format_size(message["estimated_bytes"])
+        free = format_size(message["free_bytes"])
+        if message["action"] != "ask":
+            print(f"⚠ 预计输出约 {estimated}，输出目录所在磁盘只剩 {free}")
+            return
+        proceed = messagebox.askyesno(
+            "磁盘空间可能不足",
+            f"预计输出约 {estimated}，输出目录所在磁盘只剩 {free}。\n"
+            f"（估算值，实际大小可能不同）\n\n仍要继续转换吗？"
+        )
+        if self.control_queue is not None:
+            self.control_queue.put({"type": "space_confirm", "proceed": proceed})
+        if not proceed:
+            self.status_label.config(text="正在停止...", fg="red")
+    
+    def mark_file(self, file_index, color):
+        """在文件列表中用颜色标记文件状态"""
+        if file_index is not None and file_index < len(self.pdf_files):
+            self.file_colors[file_index] = color
+            self.file_list.refresh_index(file_index)
+    
+    def send_file_command(self, command_type):
+        """对列表中选中的文件发送调度请求"""
+        if not self.is_converting or self.control_queue is None:
+            return
+        selection = self.file_list.selected_indices()
+        if not selection:
+            messagebox.showinfo("提示", "请先在列表中选择文件")
+            return
+        for file_index in selection:
+            self.control_queue.put({"type": command_type, "file_index": file_index})
+        self.file_list.clear_selection()
+    
+    def prioritize_selected(self):
+        """优先处理选中的文件"""
+        self.send_file_command("prioritize_file")
+    
+    def cancel_selected(self):
+        """取消选中文件中尚未开始的页面"""
+        self.send_file_command("cancel_file")
+    
+    def add_files(self):
+        """添加 PDF 文件"""
+        files = filedialog.askopenfilenames(
+            title="选择 PDF 文件",
+            filetypes=[("PDF 文件", "*.pdf"), ("所有文件", "*.*")]
+        )
+        
+        self.append_files(files)
+    
+    def add_folder(self):
+        """添加文件夹中（含子文件夹）的全部 PDF 文件，在后台线程中扫描"""
+        folder = filedialog.askdirectory(title="选择包含 PDF 文件的文件夹")
+        if folder:
+            self.start_scan([folder])
+    
+    def add_pattern(self):
+        """按通配符添加（如 D:/扫描件/**/*.pdf），在后台线程中展开"""
+        pattern = simpledialog.askstring(
+            "按通配符添加",
+            "输入通配符，** 匹配任意层子文件夹：",
+            parent=self.root
+        )
+        if pattern and pattern.strip():
+            self.start_scan([pattern.strip()])
+    
+    def start_scan(self, inputs):
+        """启动后台扫描线程，结果分批放入 scan_queue"""
+        stop_event = self.scan_stop
+        
+        def scan():
+            batch = []
+            try:
+                for path in iter_pdf_files(inputs, recursive=True, stop_event=stop_event):
+                    batch.append(path)
+                    if len(batch) >= SCAN_BATCH:
+                        self.scan_queue.put((stop_event, batch))
+                        batch = []
+            finally:
+                self.scan_queue.put((stop_event, batch))
+                self.scan_queue.put((stop_event, None))
+        
+        self.scan_threads += 1
+        self.status_label.config(text="正在扫描文件...", fg="blue")
+        threading.Thread(target=scan, daemon=True).start()
+    
+    def append_files(self, files):
+        """把文件加入列表（按规范化路径去重），只重绘可见行"""
+        added = 0
+        for file in files:
+            key = path_key(file)
+            if key not in self.file_index:
+                self.file_index[key] = len(self.pdf_files)
+                self.pdf_files.append(file)
+                added += 1
+        if added:
+            self.file_list.set_count(len(self.pdf_files))
+            self.file_count_label.config(text=f"共 {len(self.pdf_files)} 个文件")
+        return added
+    
+    def check_input_queues(self):
+        """定时取回后台扫描的文件和读取到的页数"""
+        deadline = time.monotonic() + UI_DRAIN_BUDGET
+        while time.monotonic() < deadline:
+            try:
+                stop_event, batch = self.scan_queue.get_nowait()
+            except queue.Empty:
+                break
+            # 清空列表前启动的扫描结果直接丢弃
+            if stop_event is not self.scan_stop:
+                continue
+            if batch is None:
+                self.scan_threads -= 1
+                if not self.scan_threads and not self.is_converting:
+                    self.status_label.config(
+                        text=f"扫描完成，共 {len(self.pdf_files)} 个文件", fg="green")
+            else:
+                self.append_files(batch)
+        
+        received = False
+        while True:
+            try:
+                key, pages = self.info_queue.get_nowait()
+            except queue.Empty:
+                break
+            received = True
+            self.info_pending.discard(key)
+            file_index = self.file_index.get(key)
+            if file_index is not None:
+                self.file_info.setdefault(file_index, {})["pages"] = pages
+        if received:
+            # 重绘可见行，同时为还没有页数的可见文件继续读取
+            self.file_list.refresh()
+        
+        self.root.after(100, self.check_input_queues)
+    
+    def file_row(self, file_index):
+        """文件列表中一行的内容和颜色"""
+        path = self.pdf_files[file_index]
+        info = self.file_info.get(file_index, {})
+        pages = info.get("pages", "…")
+        size = info.get("size")
+        return (
+            (os.path.basename(path),
+             "?" if pages is None else pages,
+             "?" if size is None else format_size(size),
+             os.path.dirname(path)),
+            self.file_colors.get(file_index)
+        )
+    
+    def request_file_info(self, indices):
+        """为可见的文件读取大小（os.stat），并在后台进程中读取页数"""
+        for file_index in indices:
+            info = self.file_info.setdefault(file_index, {})
+            path = self.pdf_files[file_index]
+            if "size" not in info:
+                try:
+                    info["size"] = os.path.getsize(path)
+                except OSError:
+                    info["size"] = None
+            key = path_key(path)
+            if "pages" in info or key in self.info_pending:
+                continue
+            if len(self.info_pending) >= INFO_MAX_PENDING:
+                break
+            if self.info_executor is None:
+                self.info_executor = ProcessPoolExecutor(max_workers=1)
+            self.info_pending.add(key)
+            future = self.info_executor.submit(read_page_count, path)
+            future.add_done_callback(
+                lambda f, key=key: self.info_queue.put(
+                    (key, None if f.cancelled() or f.exception() else f.result())))
+    
+    def close_info_executor(self):
+        """退出前结束读取页数的进程"""
+        if self.info_executor is not None:
+            self.info_executor.shutdown(wait=False)
+            self.info_executor = None
+    
+    def clear_files(self):
+        """清空文件列表"""
+        if self.is_converting:
+            messagebox.showwarning("警告", "转换进行中，无法清空列表！")
+            return
+        
+        # 停止正在进行的扫描，之后收到的旧结果会被丢弃
+        self.scan_stop.set()
+        self.scan_stop = threading.Event()
+        self.scan_threads = 0
+        self.pdf_files = []
+        self.file_index = {}
+        self.file_info = {}
+        self.file_colors = {}
+        self.file_list.set_count(0)
+        self.file_count_label.config(text="共 0 个文件")
+        self.overall_progress["value"] = 0
+        self.file_progress["value"] = 0
+        self.overall_progress_label.config(text="总进度: 0/0 个文件")
+        self.file_progress_label.config(text="当前文件: --")
+        self.status_label.config(text="准备就绪", fg="green")
+    
+    def start_conversion(self):
+        """开始转换"""
+        if not self.pdf_files:
+            messagebox.showwarning("警告", "请先添加 PDF 文件！")
+            return
+        
+        if self.is_converting:
+            messagebox.showinfo("提示", "正在转换中，请稍候...")
+            return
+        
+        if self.scan_threads:
+            messagebox.showinfo("提示", "正在扫描文件夹，请等待扫描完成")
+            return
+        
+        # 选择输出目录
+        output_dir = filedialog.askdirectory(title="选择输出目录")
+        if not output_dir:
+            return
+        
+        # 重置状态
+        self.is_converting = True
+        self.is_paused = False
+        
+        # 更新按钮状态
+        self.convert_btn.config(state="disabled")
+        self.pause_btn.config(state="normal", text="暂停", bg="#FF9800")
+        self.stop_btn.config(state="normal")
+        self.prioritize_btn.config(state="normal")
+        self.cancel_file_btn.config(state="normal")
+        
+        self.reset_run_stats(len(self.pdf_files))
+        
+        # 使用预启动的转换进程，没有时现在启动
+        host = self.spare_host
+        self.spare_host = None
+        if host is None or not host.is_alive():
+            host = ConversionHost().start()
+        self.conversion_host = host
+        self.progress_queue = host.progress_queue
+        self.control_queue = host.control_queue
+        self.pause_event = host.pause_event
+        self.stop_event = host.stop_event
+        self.file_colors = {}
+        self.file_list.refresh()
+        
+        # 获取转换参数
+        sink = SINK_LABELS[self.sink_var.get()]
+        output_format = "tiff" if sink == "tiff" else self.format_var.get()
+        quality = self.quality_var.get()
+        dpi = self.dpi_var.get()
+        try:
+            worker_count = max(1, self.workers_var.get())
+        except tk.TclError:
+            worker_count = default_worker_count()
+        long_edge = self.long_edge_var.get()
+        options = {
+            "resume": self.resume_var.get(),
+            "max_long_edge": 0 if long_edge == LONG_EDGE_UNLIMITED else int(long_edge),
+            "passthrough": self.passthrough_var.get(),
+            "blank_pages": "skip" if self.skip_blank_var.get() else "render",
+            "prefetch_files": GUI_PREFETCH_FILES if self.prefetch_var.get() else 0,
+            "encoder_preset": self.preset_var.get(),
+            "colorspace": COLORSPACE_LABELS[self.colorspace_var.get()],
+            "render_profile": RENDER_PROFILE_LABELS[self.render_profile_var.get()],
+            "sink": sink,
+            # 预计输出超过剩余空间时由界面询问是否继续
+            "space_check": "ask"
+        }
+        
+        # 交给转换进程
+        host.run(self.pdf_files, output_dir, output_format, quality, dpi,
+                 worker_count, options)
+    
+    def prestart_host(self):
+        """后台预启动一个转换进程，下次开始转换时直接使用"""
+        if self.spare_host is None and not self.is_converting:
+            self.spare_host = ConversionHost().start()
+    
+    def close_spare_host(self):
+        """退出前结束未使用的预启动进程"""
+        if self.spare_host is not None:
+            self.spare_host.close()
+            self.spare_host = None
+    
+    def pause_conversion(self):
+        """暂停/继续转换"""
+        if not self.is_converting or self.pause_event is None:
+            return
+        
+        if self.is_paused:
+            # 继续
+            self.is_paused = False
+            self.pause_event.clear()
+            self.pause_btn.config(text="暂停", bg="#FF9800")
+            self.status_label.config(text="转换继续...", fg="blue")
+        else:
+            # 暂停
+            self.is_paused = True
+            self.pause_event.set()
+            self.pause_btn.config(text="继续", bg="#2196F3")
+            self.status_label.config(text="已暂停", fg="orange")
+    
+    def stop_conversion(self):
+        """停止转换"""
+        if not self.is_converting or self.stop_event is None:
+            return
+        
+        result = messagebox.askyesno(
+            "确认停止",
+            "确定要停止转换吗？\n已完成的页面会保留，下次转换到同一目录时将自动跳过。"
+        )
+        
+        if result:
+            self.stop_event.set()
+            if self.is_paused:
+                self.pause_event.clear()  # 如果暂停，先恢复
+            self.status_label.config(text="正在停止...", fg="red")
+    
+    def handle_conversion_complete(self, message):
+        """处理转换完成"""
+        self.is_converting = False
+        self.is_paused = False
+        
+        # 清理进程资源
+        if self.conversion_host is not None:
+            self.conversion_host.close()
+        
+        self.conversion_host = None
+        self.progress_queue = None
+        self.control_queue = None
+        self.pause_event = None
+        self.stop_event = None
+        
+        # 为下一次转换预启动转换进程
+        self.root.after(PRESTART_DELAY_MS, self.prestart_host)
+        
+        # 恢复按钮状态
+        self.convert_btn.config(state="normal")
+        self.pause_btn.config(state="disabled", text="暂停", bg="#FF9800")
+        self.stop_btn.config(state="disabled")
+        self.prioritize_btn.config(state="disabled")
+        self.cancel_file_btn.config(state="disabled")
+        
+        # 显示完成消息
+        stopped = message.get("stopped", False)
+        success_count = message.get("success_count", 0)
+        error_count = message.get("error_count", 0)
+        cancelled_count = message.get("cancelled_count", 0)
+        if cancelled_count:
+            print(f"已取消 {cancelled_count} 个文件")
+        if message.get("blank_pages"):
+            print(f"跳过空白页 {message['blank_pages']} 页")
+        if message.get("worker_restarts"):
+            print(f"渲染进程崩溃或卡死后重启 {message['worker_restarts']} 次，"
+                  f"隔离 {message.get('quarantined_count', 0)} 个文件")
+        
+        if message.get("crashed"):
+            self.file_progress_label.config(text="当前文件: 已中断")
+            self.status_label.config(
+                text=f"✗ 转换进程意外退出（退出码 {message.get('exitcode')}）", fg="red")
+            messagebox.showerror(
+                "转换中断",
+                "转换进程意外退出，已完成的页面会保留，下次转换到同一目录时将自动跳过。")
+        elif stopped:
+            self.file_progress_label.config(text="当前文件: 已停止")
+            self.status_label.config(text=f"⊗ 已停止！已完成: {success_count} 个文件", fg="red")
+            messagebox.showinfo("已停止", f"转换已停止\n已完成: {success_count} 个文件")
+        elif error_count == 0:
+            self.file_progress_label.config(text="当前文件: 已完成")
+            self.status_label.config(text=f"✓ 转换完成！成功: {success_count} 个文件", fg="green")
+            messagebox.showinfo("完成", f"所有 PDF 文件已成功转换！\n共 {success_count} 个文件")
+        else:
+            self.file_progress_label.config(text="当前文件: 已完成")
+            self.status_label.config(text=f"⚠ 转换完成！成功: {success_count}, 失败: {error_count}", fg="orange")
+            messagebox.showwarning("完成", f"转换完成，但有部分失败\n成功: {success_count}\n失败: {error_count}")
+
+
+def report_startup_time(root, app, start_time):
+    """
+    --startup-time: 窗口显示后记录启动耗时，等预启动的转换进程加载完渲染引擎后
+    以 JSON 输出到标准输出并退出
+    """
+    window_time = time.perf_counter() - start_time
+    fitz_loaded = "fitz" in sys.modules
+    app.prestart_host()
+    host = app.spare_host
+
+    def wait_ready():
+        try:
+            message = host.progress_queue.get_nowait()
+        except queue.Empty:
+            root.after(10, wait_ready)
+            return
+        print(json.dumps({
+            "window_time": round(window_time, 3),
+            "worker_ready_time": round(time.perf_counter() - start_time, 3),
+            "engine_import_time": round(message["import_time"], 3),
+            "gui_loaded_fitz": fitz_loaded
+        }), flush=True)
+        root.destroy()
+
+    wait_ready()
+
+
+def run_gui(start_time, startup_time=False):
+    """
+    创建主窗口并进入事件循环
+
+    Args:
+        start_time: 进程开始时的 time.perf_counter()，用于统计启动耗时
+        startup_time: 只测量启动耗时，测完后退出
+    """
+    root = tk.Tk()
+    app = PDF2ImageConverter(root)
+    if startup_time:
+        root.after_idle(report_startup_time, root, app, start_time)
+    else:
+        # 窗口显示后再在后台预启动转换进程
+        root.after(PRESTART_DELAY_MS, app.prestart_host)
+    try:
+        root.mainloop()
+    finally:
+        app.close_spare_host()
+        app.close_info_executor()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PDF 转图片工具 - 输入文件发现
+将文件、目录（可递归）和通配符展开为 PDF 文件列表，按规范化路径去重。
+
+只依赖标准库（不加载 tkinter 和 PyMuPDF），命令行直接调用，
+图形界面在后台线程中调用并分批取回结果。
+
+作者: zhifouli
+GitHub: https://github.com/zhifouli?tab=repositories
+"""
+
+import os
+import glob
+
+
+def path_key(path):
+    """去重用的规范化路径：绝对路径，Windows 下不区分大小写和分隔符"""
+    return os.path.normcase(os.path.abspath(path))
+
+
+def is_pdf_name(name):
+    """按扩展名判断是否为 PDF 文件"""
+    return name.lower().endswith(".pdf")
+
+
+def walk_pdf_files(directory, recursive=False, stop_event=None):
+    """
+    按名称顺序逐个产生目录中的 PDF 文件
+
+    使用 os.scandir（目录项自带类型信息，不必逐个 stat），子目录在遇到时立即展开；
+    与 glob 一致，跳过以 . 开头的文件和目录，不进入目录的符号链接（避免循环）。
+
+    Args:
+        directory: 目录路径
+        recursive: 是否递归子目录
+        stop_event: 设置后尽快停止遍历（threading.Event，可选）
+    """
+    try:
+        with os.scandir(directory) as iterator:
+            entries = sorted(iterator, key=lambda entry: entry.name)
+    except OSError:
+        return
+    for entry in entries:
+        if stop_event is not None and stop_event.is_set():
+            return
+        if entry.name.startswith("."):
+            continue
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                if recursive:
+                    yield from walk_pdf_files(entry.path, True, stop_event)
+            elif is_pdf_name(entry.name) and entry.is_file():
+                yield entry.path
+        except OSError:
+            continue
+
+
+def iter_pdf_files(inputs, recursive=False, stop_event=None, on_missing=None):
+    """
+    逐个产生 inputs 展开后的 PDF 文件（去重并保持顺序）
+
+    Args:
+        inputs: 文件、目录或通配符（支持 **）列表
+        recursive: 目录是否递归子目录
+        stop_event: 设置后尽快停止（threading.Event，可选）
+        on_missing: 通配符没有匹配时调用 on_missing(item)（可选）
+    """
+    seen = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            paths = walk_pdf_files(item, recursive, stop_event)
+        elif os.path.isfile(item):
+            paths = [item]
+        else:
+            matches = sorted(glob.glob(item, recursive=True))
+            if not matches and on_missing is not None:
+                on_missing(item)
+            paths = (path for path in matches if os.path.isfile(path))
+        for path in paths:
+            if stop_event is not None and stop_event.is_set():
+                return
+            key = path_key(path)
+            if key not in seen:
+                seen.add(key)
+                yield path
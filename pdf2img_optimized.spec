@@ -51,10 +51,16 @@ a = Analysis(
     datas=[
         ('icon.ico', '.'),  # 将图标文件打包到根目录
     ],
+    # 界面、转换进程入口和渲染引擎均在函数内按需导入，显式列出以确保打包
     hiddenimports=[
+        'pdf2img_gui',
+        'pdf2img_worker',
+        'pdf2img_engine',
+        'pdf2img_inputs',
         'tkinter',
         'tkinter.filedialog',
         'tkinter.messagebox',
+        'tkinter.simpledialog',
         'tkinter.ttk',
     ],
     hookspath=[],
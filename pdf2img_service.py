@@ -0,0 +1,975 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PDF 转图片工具 - 本地转换服务
+常驻运行，启动时预先创建渲染进程池并一直复用：每个转换请求不再重新启动进程、
+重新导入 fitz，大量小任务可以连续提交而没有进程启动开销。
+
+多个任务共用同一个进程池，调度线程按提交顺序轮流为各任务派发页码区间，
+大任务不会让后提交的小任务一直等待。
+
+HTTP 接口（请求和响应均为 JSON，图片接口除外）:
+    POST   /jobs                                提交任务
+    GET    /jobs                                任务列表
+    GET    /jobs/<id>                           任务状态
+    GET    /jobs/<id>/events?since=N&wait=S     从第 N 条起的事件，没有新事件时最多等待 S 秒
+    GET    /jobs/<id>/stream                    以 JSON Lines 持续推送事件，任务结束后关闭连接
+    GET    /jobs/<id>/pages/<文件序号>/<页码>     取回页面图片（仅 dir 输出方式，分块页面加 ?part=K，
+                                                多输出时加 ?output=150dpi_png）
+    POST   /jobs/<id>/cancel                    取消任务（已派发给渲染进程的页面会做完）
+    DELETE /jobs/<id>                           删除任务记录，服务创建的上传文件和输出目录一并删除
+    GET    /stats                               进程数、队列深度、吞吐量
+
+提交任务有两种方式:
+    - JSON：{"files": ["a.pdf", ...], "output_dir": "可选", "format": "png",
+             "quality": 95, "dpi": 150, "options": {"colorspace": "gray", ...}}
+    - 直接上传 PDF：Content-Type: application/pdf，参数放在查询字符串中
+      （name、format、quality、dpi，options 为 JSON 字符串）
+
+用法示例:
+    python pdf2img_service.py --port 8765 --workers 4 --root service_data
+    curl -X POST localhost:8765/jobs -d '{"files": ["/data/a.pdf"], "dpi": 150}'
+    curl --data-binary @a.pdf -H "Content-Type: application/pdf" "localhost:8765/jobs?name=a.pdf&format=jpg"
+
+服务没有身份验证，默认只监听 127.0.0.1。
+
+作者: zhifouli
+GitHub: https://github.com/zhifouli?tab=repositories
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import queue
+import shutil
+import signal
+import argparse
+import threading
+import collections
+import multiprocessing
+from multiprocessing import Event
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from pdf2img_converter import __version__
+from pdf2img_engine import (
+    BLANK_PAGE_MODES,
+    COLORSPACES,
+    DEFAULT_OPTIONS,
+    RENDER_PROFILES,
+    SPACE_CHECKS,
+    ConversionCoordinator,
+    RenderPool,
+    default_worker_count,
+    get_pdf_output_dir,
+    parse_outputs,
+)
+from pdf2img_encoders import available_formats
+from pdf2img_sinks import SINKS
+
+# 吞吐量统计窗口（秒）
+THROUGHPUT_WINDOW = 60.0
+
+# 长轮询最长等待时间（秒）
+MAX_WAIT = 60.0
+
+# 内存中保留的已结束任务数，超出时丢弃最早的记录（输出文件不受影响）
+KEEP_FINISHED_JOBS = 1000
+
+# 各输出格式的 MIME 类型
+CONTENT_TYPES = {
+    "png": "image/png",
+    "jpg": "image/jpeg",
+    "tiff": "image/tiff",
+    "webp": "image/webp"
+}
+
+# 已结束的任务状态
+FINISHED_STATES = ("done", "cancelled", "error")
+
+
+class JobError(Exception):
+    """请求无效，对应 HTTP 4xx 响应"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_job_settings(params):
+    """
+    校验并整理任务参数（规则与命令行一致）
+
+    Args:
+        params: 请求参数字典，可含 format / quality / dpi / options
+
+    Returns:
+        (output_format, quality, dpi, options)
+    """
+    options = params.get("options") or {}
+    if not isinstance(options, dict):
+        raise JobError("options 必须是对象")
+    unknown = sorted(set(options) - set(DEFAULT_OPTIONS))
+    if unknown:
+        raise JobError(f"不支持的选项: {', '.join(unknown)}")
+    options = dict(options)
+
+    sink = options.get("sink", DEFAULT_OPTIONS["sink"])
+    if sink not in SINKS:
+        raise JobError(f"不支持的输出方式: {sink}")
+    if options.get("colorspace", DEFAULT_OPTIONS["colorspace"]) not in COLORSPACES:
+        raise JobError(f"不支持的颜色模式: {options['colorspace']}")
+    if options.get("render_profile", DEFAULT_OPTIONS["render_profile"]) not in RENDER_PROFILES:
+        raise JobError(f"不支持的渲染档案: {options['render_profile']}")
+    if options.get("blank_pages", DEFAULT_OPTIONS["blank_pages"]) not in BLANK_PAGE_MODES:
+        raise JobError(f"不支持的空白页处理方式: {options['blank_pages']}")
+    # 服务没有交互确认，不支持 ask
+    space_check = options.get("space_check", DEFAULT_OPTIONS["space_check"])
+    if space_check not in SPACE_CHECKS or space_check == "ask":
+        raise JobError(f"不支持的空间检查方式: {options['space_check']}")
+
+    output_format = params.get("format") or ("tiff" if sink == "tiff" else "png")
+    try:
+        quality = int(params.get("quality", 95))
+        dpi = int(params.get("dpi", 150))
+    except (TypeError, ValueError):
+        raise JobError("quality 和 dpi 必须是整数")
+
+    # 多输出时第一个输出作为主输出
+    if options.get("outputs"):
+        try:
+            options["outputs"] = parse_outputs(options["outputs"], output_format)
+        except ValueError as e:
+            raise JobError(str(e))
+        dpi, output_format = options["outputs"][0]["dpi"], options["outputs"][0]["format"]
+    for spec in options.get("outputs") or [{"format": output_format}]:
+        if sink == "tiff" and spec["format"] != "tiff":
+            raise JobError("sink 为 tiff 时只能输出 tiff 格式")
+        if spec["format"] not in available_formats():
+            raise JobError(f"不支持的输出格式: {spec['format']}")
+    if not 1 <= quality <= 100:
+        raise JobError("quality 应在 1-100 之间")
+    if dpi <= 0:
+        raise JobError("dpi 必须大于 0")
+    return output_format, quality, dpi, options
+
+
+class ServiceJob:
+    """
+    服务中的一个转换任务
+
+    作为 ConversionCoordinator 的进度通道（实现 put），把进度消息整理为任务状态和
+    事件列表；HTTP 线程通过 snapshot / events_since 读取，由 condition 保护。
+    """
+
+    def __init__(self, job_id, pdf_files, output_dir, output_format, quality, dpi,
+                 options, managed_dir=None):
+        self.job_id = job_id
+        self.pdf_files = pdf_files
+        self.output_dir = output_dir
+        self.output_format = output_format
+        self.quality = quality
+        self.dpi = dpi
+        self.options = options
+        # 服务创建的目录（上传文件和默认输出），删除任务时一并删除
+        self.managed_dir = managed_dir
+        self.delete_when_finished = False
+        self.created = time.time()
+        self.start_time = time.monotonic()
+        self.end_time = None
+        self.state = "scanning"
+        self.error = None
+        self.total_pages = 0
+        self.done_pages = 0
+        self.bytes_written = 0
+        # 扫描后的预估（输出像素数、输出字节数、耗时、剩余空间）和已完成的代价
+        self.estimate = None
+        self.total_cost = 0
+        self.done_cost = 0
+        self.result = None
+        self.timing = None
+        self.events = []
+        # {(文件序号, 页码): page 事件}，用于取回页面图片
+        self.pages = {}
+        self.files = [
+            {
+                "file_index": file_index,
+                "filename": os.path.basename(pdf_path),
+                "output_dir": get_pdf_output_dir(output_dir, pdf_path),
+                "status": "pending",
+                "total_pages": 0,
+                "done_pages": 0
+            }
+            for file_index, pdf_path in enumerate(pdf_files)
+        ]
+        self.condition = threading.Condition()
+        self.control_queue = queue.Queue()
+        self.stop_event = threading.Event()
+        self.coordinator = None
+
+    @property
+    def finished(self):
+        return self.state in FINISHED_STATES
+
+    # ---------- 进度通道（调度线程调用） ----------
+
+    def put(self, message):
+        with self.condition:
+            self._handle(message)
+            self.condition.notify_all()
+
+    def _add_event(self, event):
+        event["seq"] = len(self.events)
+        self.events.append(event)
+
+    def _handle(self, message):
+        msg_type = message["type"]
+        if msg_type == "page_stats_batch":
+            for page_message in message["pages"]:
+                self._handle(page_message)
+        elif msg_type == "page_stats":
+            file_index = message["file_index"]
+            event = {
+                "type": "page",
+                "file_index": file_index,
+                "filename": message["filename"],
+                "page": message["page"],
+                "file": message["file"],
+                "dpi": message["dpi"],
+                "colorspace": message["colorspace"],
+                "bytes": message["bytes"],
+                "url": f"/jobs/{self.job_id}/pages/{file_index}/{message['page']}"
+            }
+            for key in ("parts", "outputs"):
+                if key in message:
+                    event[key] = message[key]
+            if message.get("blank"):
+                event["blank"] = True
+            self.pages[(file_index, message["page"])] = event
+            self.done_pages += 1
+            self.done_cost += message.get("cost", 0)
+            self.bytes_written += message["bytes"]
+            self._add_event(event)
+        elif msg_type == "file_start":
+            self.files[message["file_index"]]["status"] = "running"
+        elif msg_type == "file_total_pages":
+            info = self.files[message["file_index"]]
+            info["total_pages"] = message["total_pages"]
+            info["done_pages"] = message["skipped_pages"]
+        elif msg_type == "file_progress":
+            self.files[message["file_index"]]["done_pages"] = message["current_page"]
+        elif msg_type in ("file_complete", "file_error", "file_cancelled"):
+            info = self.files[message["file_index"]]
+            info["status"] = {"file_complete": "done", "file_error": "error",
+                              "file_cancelled": "cancelled"}[msg_type]
+            event = {"type": msg_type, "file_index": message["file_index"],
+                     "filename": message["filename"]}
+            if "error" in message:
+                info["error"] = message["error"]
+                event["error"] = message["error"]
+            self.total_cost -= message.get("unfinished_pixels", 0)
+            self._add_event(event)
+        elif msg_type == "scan_complete":
+            if self.state == "scanning":
+                self.state = "running"
+            self.total_pages = message["total_pages"]
+            self.total_cost = message["estimated_pixels"]
+            self.done_cost = message["done_pixels"]
+            self.estimate = {key: message[key] for key in (
+                "estimated_pixels", "estimated_bytes", "estimated_seconds", "free_bytes")}
+        elif msg_type == "space_warning":
+            self._add_event({key: value for key, value in message.items() if key != "output_dir"})
+        elif msg_type == "timing_summary":
+            self.timing = {k: v for k, v in message.items() if k != "type"}
+        elif msg_type == "conversion_complete":
+            self.result = {k: v for k, v in message.items() if k != "type"}
+            self._finish("cancelled" if self.stop_event.is_set() else "done")
+
+    def _finish(self, state, error=None):
+        self.state = state
+        self.error = error
+        self.end_time = time.monotonic()
+        event = {"type": "job_complete", "state": state}
+        if error is not None:
+            event["error"] = error
+        if self.result is not None:
+            event["result"] = self.result
+        self._add_event(event)
+
+    def fail(self, error):
+        """协调器出现异常，任务以 error 结束"""
+        with self.condition:
+            if not self.finished:
+                self._finish("error", error)
+            self.condition.notify_all()
+
+    # ---------- 查询（HTTP 线程调用） ----------
+
+    def snapshot(self, detail=True):
+        """任务状态"""
+        with self.condition:
+            end = self.end_time if self.end_time is not None else time.monotonic()
+            status = {
+                "job_id": self.job_id,
+                "state": self.state,
+                "created": self.created,
+                "elapsed": round(end - self.start_time, 3),
+                "format": self.output_format,
+                "dpi": self.dpi,
+                "output_dir": self.output_dir,
+                "total_files": len(self.files),
+                "total_pages": self.total_pages,
+                "done_pages": self.done_pages,
+                "bytes_written": self.bytes_written,
+                "events": len(self.events)
+            }
+            if self.estimate is not None:
+                # 按预估代价加权的进度（0-1）
+                status["progress"] = round(
+                    min(1.0, self.done_cost / self.total_cost) if self.total_cost > 0 else 1.0, 4)
+                status["estimate"] = self.estimate
+            if self.error is not None:
+                status["error"] = self.error
+            if detail:
+                status["files"] = [dict(info) for info in self.files]
+                if self.result is not None:
+                    status["result"] = self.result
+                if self.timing is not None:
+                    status["timing"] = self.timing
+            return status
+
+    def events_since(self, since, wait=0.0):
+        """
+        第 since 条之后的事件，没有新事件且任务未结束时最多等待 wait 秒
+
+        Returns:
+            (事件列表, 下一次查询的 since, 任务是否已结束)
+        """
+        deadline = time.monotonic() + wait
+        with self.condition:
+            while len(self.events) <= since and not self.finished:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+            events = self.events[since:]
+            return events, since + len(events), self.finished
+
+    def page_path(self, file_index, page, part=None, output=None):
+        """
+        页面图片的路径，未完成时返回 None
+
+        多输出时 output 为输出子目录名（如 150dpi_png），省略时取第一个输出。
+        """
+        if self.options.get("sink", DEFAULT_OPTIONS["sink"]) != "dir":
+            raise JobError("归档输出请直接读取输出目录中的归档文件", status=409)
+        with self.condition:
+            event = self.pages.get((file_index, page))
+        # 跳过的空白页没有图片
+        if event is None or event["file"] is None:
+            return None
+        name = event["file"]
+        parts = event.get("parts")
+        if event.get("outputs"):
+            output = output or event["outputs"][0]["dir"]
+            matches = [item for item in event["outputs"] if item["dir"] == output]
+            if not matches:
+                return None
+            name = os.path.join(output, matches[0]["file"])
+            parts = [os.path.join(output, p) for p in matches[0].get("parts", [])] or None
+        if part is not None:
+            parts = parts or [name]
+            if not 0 <= part < len(parts):
+                return None
+            name = parts[part]
+        return os.path.join(self.files[file_index]["output_dir"], name)
+
+
+class _JobPool:
+    """
+    交给协调器的进程池视图
+
+    任务编号改为服务内全局唯一，并登记任务所属的 ServiceJob，结果按编号分发回对应任务；
+    查询和放弃运行中的渲染任务时只涉及本任务的（不同任务的文件序号会重复）。
+    """
+
+    def __init__(self, service, job):
+        self.service = service
+        self.job = job
+
+    def submit(self, task):
+        task_id = next(self.service.task_ids)
+        task["task_id"] = task_id
+        self.service.task_jobs[task_id] = self.job
+        self.service.pool.submit(task)
+
+    def running_tasks(self):
+        task_jobs = self.service.task_jobs
+        return [task for task in self.service.pool.running_tasks()
+                if task_jobs.get(task["task_id"]) is self.job]
+
+    def abort_tasks(self, predicate, error):
+        task_jobs = self.service.task_jobs
+        return self.service.pool.abort_tasks(
+            lambda task: task_jobs.get(task["task_id"]) is self.job and predicate(task), error)
+
+
+class ConversionService:
+    """
+    常驻的转换服务
+
+    渲染进程池在启动时创建并一直保留；提交的任务由一个扫描线程依次检查文件指纹和隔离名单，
+    再交给调度线程，由调度线程为所有进行中的任务派发读取页数的任务和渲染任务、分发结果。
+    PDF 只在渲染进程中打开（PyMuPDF 不是线程安全的，apply_render_profile 也会修改
+    进程全局的抗锯齿设置），服务进程的各线程都不调用 MuPDF。
+    """
+
+    def __init__(self, root, worker_count=None, keep_jobs=KEEP_FINISHED_JOBS):
+        self.root = os.path.abspath(root)
+        self.worker_count = max(1, worker_count or default_worker_count())
+        self.keep_jobs = keep_jobs
+        self.pause_event = Event()
+        self.stop_event = Event()
+        self.pool = RenderPool(self.worker_count, self.pause_event, self.stop_event)
+        # 同时派发给进程池的任务数上限
+        self.capacity = self.worker_count * 2
+
+        self.lock = threading.Lock()
+        self.jobs = collections.OrderedDict()
+        # 等待扫描线程处理的任务、扫描完交给调度线程的任务
+        self.scan_jobs = queue.Queue()
+        self.ready_jobs = queue.Queue()
+        # 以下只由调度线程访问
+        self.active = []
+        self.task_ids = iter(range(1 << 62))
+        self.task_jobs = {}
+
+        self.start_time = time.monotonic()
+        self.completed_jobs = 0
+        self.pages_done = 0
+        self.bytes_written = 0
+        # (时间, 页数, 字节数)，用于计算最近 THROUGHPUT_WINDOW 秒的吞吐量
+        self.recent = collections.deque()
+        self.thread = None
+        self.scan_thread = None
+
+    # ---------- 生命周期 ----------
+
+    def start(self):
+        """启动渲染进程池和调度线程"""
+        os.makedirs(self.root, exist_ok=True)
+        self.pool.start()
+        self.scan_thread = threading.Thread(target=self._scan_loop, daemon=True)
+        self.scan_thread.start()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def shutdown(self):
+        """取消全部任务，停止调度线程和渲染进程"""
+        with self.lock:
+            jobs = list(self.jobs.values())
+        for job in jobs:
+            job.stop_event.set()
+        self.stop_event.set()
+        if self.scan_thread is not None:
+            self.scan_thread.join(timeout=10)
+        if self.thread is not None:
+            self.thread.join(timeout=10)
+        self.pool.shutdown()
+
+    # ---------- 任务 ----------
+
+    def submit(self, pdf_files, output_dir=None, output_format="png", quality=95,
+               dpi=150, options=None, job_id=None, managed_dir=None):
+        """
+        提交转换任务
+
+        Args:
+            pdf_files: PDF 文件路径列表
+            output_dir: 输出目录，None 时使用 <root>/<任务编号>/output
+            job_id: 任务编号，None 时自动生成
+            managed_dir: 由服务创建、删除任务时一并删除的目录
+
+        Returns:
+            ServiceJob
+        """
+        if self.stop_event.is_set():
+            raise JobError("服务正在停止", status=503)
+        job_id = job_id or uuid.uuid4().hex[:12]
+        if output_dir is None:
+            managed_dir = managed_dir or os.path.join(self.root, job_id)
+            output_dir = os.path.join(managed_dir, "output")
+        os.makedirs(output_dir, exist_ok=True)
+
+        job = ServiceJob(job_id, list(pdf_files), os.path.abspath(output_dir),
+                         output_format, quality, dpi, dict(options or {}), managed_dir)
+        job.coordinator = ConversionCoordinator(
+            job.pdf_files, job.output_dir, output_format, quality, dpi,
+            job, self.pause_event, job.stop_event,
+            self.worker_count, job.options, job.control_queue
+        )
+        with self.lock:
+            self.jobs[job_id] = job
+        self.scan_jobs.put(job)
+        return job
+
+    def _scan_loop(self):
+        """
+        扫描线程：按提交顺序检查各任务的文件后交给调度线程
+
+        只有这一个线程处理提交的任务，大量并发提交不会各自起线程；
+        这里只读取文件指纹和隔离名单，页数和页面尺寸由渲染进程读取。
+        """
+        while not self.stop_event.is_set():
+            try:
+                job = self.scan_jobs.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            try:
+                job.coordinator.scan_files()
+            except Exception as e:
+                job.fail(str(e))
+                continue
+            self.ready_jobs.put(job)
+
+    def get(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+        if job is None:
+            raise JobError(f"任务不存在: {job_id}", status=404)
+        return job
+
+    def list_jobs(self):
+        with self.lock:
+            jobs = list(self.jobs.values())
+        return [job.snapshot(detail=False) for job in jobs]
+
+    def cancel(self, job_id):
+        """取消任务：未派发的页面全部取消，已派发的页面做完后任务结束"""
+        job = self.get(job_id)
+        job.stop_event.set()
+        for file_index in range(len(job.pdf_files)):
+            job.control_queue.put({"type": "cancel_file", "file_index": file_index})
+        return job
+
+    def delete(self, job_id):
+        """删除任务记录；进行中的任务先取消"""
+        job = self.cancel(job_id)
+        with self.lock:
+            self.jobs.pop(job_id, None)
+        if job.managed_dir:
+            # 进行中的任务由调度线程在结束后删除目录
+            if job.finished:
+                shutil.rmtree(job.managed_dir, ignore_errors=True)
+            else:
+                job.delete_when_finished = True
+
+    def stats(self):
+        """服务状态：进程数、队列深度、吞吐量"""
+        now = time.monotonic()
+        with self.lock:
+            jobs = list(self.jobs.values())
+            recent = list(self.recent)
+        states = collections.Counter(job.state for job in jobs)
+        pending_pages = 0
+        outstanding_tasks = 0
+        for job in jobs:
+            if job.state == "running":
+                pending_pages += job.coordinator.scheduler.remaining_pages
+                outstanding_tasks += job.coordinator.outstanding
+
+        window = min(THROUGHPUT_WINDOW, now - self.start_time) or 1e-9
+        recent = [item for item in recent if now - item[0] <= THROUGHPUT_WINDOW]
+        recent_pages = sum(item[1] for item in recent)
+        recent_bytes = sum(item[2] for item in recent)
+        return {
+            "version": __version__,
+            "workers": self.worker_count,
+            "workers_alive": sum(1 for w in self.pool.workers if w.is_alive()),
+            "worker_restarts": self.pool.restarts,
+            "uptime": round(now - self.start_time, 3),
+            "jobs_scanning": states.get("scanning", 0),
+            "jobs_running": states.get("running", 0),
+            "jobs_completed": self.completed_jobs,
+            "queue_depth_pages": pending_pages,
+            "tasks_in_flight": outstanding_tasks,
+            "pages_done": self.pages_done,
+            "mb_written": round(self.bytes_written / (1024 * 1024), 2),
+            "pages_per_sec": round(recent_pages / window, 2),
+            "mb_per_sec": round(recent_bytes / (1024 * 1024) / window, 2),
+            "throughput_window": round(window, 3)
+        }
+
+    # ---------- 调度线程 ----------
+
+    def _record_throughput(self, results):
+        pages = len(results)
+        written = sum(result["bytes"] for result in results)
+        now = time.monotonic()
+        with self.lock:
+            self.pages_done += pages
+            self.bytes_written += written
+            self.recent.append((now, pages, written))
+            while self.recent and now - self.recent[0][0] > THROUGHPUT_WINDOW:
+                self.recent.popleft()
+
+    def _admit_jobs(self):
+        """接收已读取完文件的任务"""
+        while True:
+            try:
+                job = self.ready_jobs.get_nowait()
+            except queue.Empty:
+                return
+            self.active.append(job)
+
+    def _dispatch(self):
+        """在进行中的任务之间轮流派发，总数不超过 capacity"""
+        budget = self.capacity - len(self.task_jobs)
+        while budget > 0:
+            dispatched = 0
+            for job in self.active:
+                if budget <= 0:
+                    break
+                if job.coordinator.dispatch(_JobPool(self, job), limit=1):
+                    budget -= 1
+                    dispatched += 1
+            if not dispatched:
+                return
+
+    def _finish_job(self, job, error=None):
+        """任务结束：发送完成消息并从进行中的任务中移除"""
+        self.active.remove(job)
+        job.coordinator.close_prefetcher()
+        if error is None:
+            try:
+                job.coordinator.complete()
+            except Exception as e:
+                error = str(e)
+        if error is not None:
+            job.fail(error)
+        with self.lock:
+            self.completed_jobs += 1
+            finished = [job_id for job_id, item in self.jobs.items() if item.finished]
+            for job_id in finished[:max(0, len(finished) - self.keep_jobs)]:
+                del self.jobs[job_id]
+        if job.delete_when_finished:
+            shutil.rmtree(job.managed_dir, ignore_errors=True)
+
+    def _handle_result(self, message):
+        """把渲染进程的结果分发给所属任务"""
+        if message["type"] == "pages_done":
+            job = self.task_jobs.get(message["task_id"])
+            self._record_throughput(message["results"])
+        else:
+            job = self.task_jobs.pop(message["task_id"], None)
+        if job is None or job not in self.active:
+            return
+        try:
+            job.coordinator.handle_result(message, _JobPool(self, job))
+        except Exception as e:
+            self._finish_job(job, str(e))
+
+    def _run(self):
+        """调度线程主循环"""
+        while not self.stop_event.is_set():
+            self._admit_jobs()
+            for job in list(self.active):
+                try:
+                    job.coordinator.handle_control()
+                    job.coordinator.check_file_timeouts(_JobPool(self, job))
+                    job.coordinator.flush_manifests()
+                    job.coordinator.progress.poll()
+                except Exception as e:
+                    self._finish_job(job, str(e))
+                    continue
+                if job.coordinator.is_done():
+                    self._finish_job(job)
+            self._dispatch()
+
+            if not self.active:
+                # 空闲时等待新任务
+                try:
+                    job = self.ready_jobs.get(timeout=0.2)
+                except queue.Empty:
+                    continue
+                self.active.append(job)
+                continue
+
+            message = self.pool.get_result(timeout=0.05)
+            if message is not None:
+                self._handle_result(message)
+
+        # 停止服务：写出进行中任务的清单
+        for job in list(self.active):
+            self._finish_job(job)
+
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    """转换服务的 HTTP 接口"""
+
+    protocol_version = "HTTP/1.1"
+    server_version = f"pdf2img/{__version__}"
+
+    ROUTES = [
+        ("GET", re.compile(r"^/stats$"), "get_stats"),
+        ("GET", re.compile(r"^/jobs$"), "get_jobs"),
+        ("POST", re.compile(r"^/jobs$"), "post_job"),
+        ("GET", re.compile(r"^/jobs/(\w+)$"), "get_job"),
+        ("DELETE", re.compile(r"^/jobs/(\w+)$"), "delete_job"),
+        ("POST", re.compile(r"^/jobs/(\w+)/cancel$"), "cancel_job"),
+        ("GET", re.compile(r"^/jobs/(\w+)/events$"), "get_events"),
+        ("GET", re.compile(r"^/jobs/(\w+)/stream$"), "get_stream"),
+        ("GET", re.compile(r"^/jobs/(\w+)/pages/(\d+)/(\d+)$"), "get_page"),
+    ]
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    # ---------- 请求分发 ----------
+
+    def do_GET(self):
+        self._route("GET")
+
+    def do_POST(self):
+        self._route("POST")
+
+    def do_DELETE(self):
+        self._route("DELETE")
+
+    def _route(self, method):
+        url = urlsplit(self.path)
+        self.query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            for route_method, pattern, handler in self.ROUTES:
+                match = pattern.match(url.path)
+                if match and route_method == method:
+                    getattr(self, handler)(*match.groups())
+                    return
+            raise JobError(f"未知的接口: {method} {url.path}", status=404)
+        except JobError as e:
+            self._send_json({"error": str(e)}, e.status)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+        except Exception as e:
+            self._send_json({"error": str(e)}, 500)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > self.server.max_upload_bytes:
+            self.close_connection = True
+            raise JobError("请求体过大", status=413)
+        return self.rfile.read(length) if length else b""
+
+    def _send_json(self, obj, status=200):
+        body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _query_number(self, name, default, cast=int):
+        try:
+            return cast(self.query.get(name, default))
+        except ValueError:
+            raise JobError(f"{name} 必须是数字")
+
+    # ---------- 接口 ----------
+
+    def get_stats(self):
+        self._send_json(self.service.stats())
+
+    def get_jobs(self):
+        self._send_json({"jobs": self.service.list_jobs()})
+
+    def get_job(self, job_id):
+        self._send_json(self.service.get(job_id).snapshot())
+
+    def post_job(self):
+        content_type = (self.headers.get("Content-Type") or "").split(";")[0].strip()
+        body = self._read_body()
+        if content_type == "application/pdf":
+            self._post_upload(body)
+            return
+
+        try:
+            params = json.loads(body or b"{}")
+        except ValueError:
+            raise JobError("请求体不是有效的 JSON")
+        if not isinstance(params, dict):
+            raise JobError("请求体必须是 JSON 对象")
+        files = params.get("files")
+        if not files or not isinstance(files, list):
+            raise JobError("files 必须是非空的文件路径列表")
+        missing = [path for path in files if not os.path.isfile(path)]
+        if missing:
+            raise JobError(f"文件不存在: {', '.join(map(str, missing))}")
+        output_format, quality, dpi, options = parse_job_settings(params)
+        job = self.service.submit(
+            [os.path.abspath(path) for path in files], params.get("output_dir"),
+            output_format, quality, dpi, options
+        )
+        self._send_json(job.snapshot(), 202)
+
+    def _post_upload(self, body):
+        """上传的 PDF 保存到 <root>/<任务编号>/input 后提交"""
+        if not body.startswith(b"%PDF"):
+            raise JobError("上传的内容不是 PDF")
+        params = dict(self.query)
+        if "options" in params:
+            try:
+                params["options"] = json.loads(params["options"])
+            except ValueError:
+                raise JobError("options 不是有效的 JSON")
+        output_format, quality, dpi, options = parse_job_settings(params)
+
+        name = os.path.basename(params.get("name") or "upload.pdf") or "upload.pdf"
+        if not name.lower().endswith(".pdf"):
+            name += ".pdf"
+        job_id = uuid.uuid4().hex[:12]
+        managed_dir = os.path.join(self.service.root, job_id)
+        input_dir = os.path.join(managed_dir, "input")
+        os.makedirs(input_dir, exist_ok=True)
+        pdf_path = os.path.join(input_dir, name)
+        with open(pdf_path, "wb") as f:
+            f.write(body)
+        job = self.service.submit(
+            [pdf_path], None, output_format, quality, dpi, options,
+            job_id=job_id, managed_dir=managed_dir
+        )
+        self._send_json(job.snapshot(), 202)
+
+    def cancel_job(self, job_id):
+        self._send_json(self.service.cancel(job_id).snapshot())
+
+    def delete_job(self, job_id):
+        self.service.delete(job_id)
+        self._send_json({"job_id": job_id, "deleted": True})
+
+    def get_events(self, job_id):
+        job = self.service.get(job_id)
+        since = max(0, self._query_number("since", 0))
+        wait = min(MAX_WAIT, max(0.0, self._query_number("wait", 0, float)))
+        events, next_since, finished = job.events_since(since, wait)
+        self._send_json({"events": events, "next": next_since, "finished": finished})
+
+    def get_stream(self, job_id):
+        """逐行推送事件，直到任务结束（连接关闭表示结束）"""
+        job = self.service.get(job_id)
+        since = max(0, self._query_number("since", 0))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        while True:
+            events, since, finished = job.events_since(since, wait=1.0)
+            for event in events:
+                self.wfile.write((json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8"))
+            self.wfile.flush()
+            if finished and not events:
+                return
+
+    def get_page(self, job_id, file_index, page):
+        job = self.service.get(job_id)
+        file_index = int(file_index)
+        if file_index >= len(job.files):
+            raise JobError(f"文件序号超出范围: {file_index}", status=404)
+        part = self.query.get("part")
+        path = job.page_path(file_index, int(page),
+                             None if part is None else self._query_number("part", 0),
+                             self.query.get("output"))
+        if path is None:
+            raise JobError("页面尚未完成", status=404)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            raise JobError("页面文件已不存在", status=410)
+        extension = os.path.splitext(path)[1].lstrip(".").lower()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPES.get(extension, "application/octet-stream"))
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class ServiceHTTPServer(ThreadingHTTPServer):
+    """每个连接一个线程的 HTTP 服务器，持有转换服务"""
+
+    daemon_threads = True
+
+    def __init__(self, address, service, max_upload_bytes, verbose=False):
+        super().__init__(address, ServiceRequestHandler)
+        self.service = service
+        self.max_upload_bytes = max_upload_bytes
+        self.verbose = verbose
+
+
+def build_parser():
+    """构建命令行参数解析器"""
+    parser = argparse.ArgumentParser(
+        description="本地 PDF 转图片服务：常驻渲染进程池，通过 HTTP 提交任务"
+    )
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="监听地址（默认 127.0.0.1；服务没有身份验证，请勿暴露到公网）")
+    parser.add_argument("--port", type=int, default=8765, help="监听端口（默认 8765）")
+    parser.add_argument("--workers", type=int, default=default_worker_count(),
+                        help="渲染进程数（默认 CPU 核心数）")
+    parser.add_argument("--root", default="pdf2img_service_data",
+                        help="上传文件和默认输出的存放目录")
+    parser.add_argument("--max-upload-mb", type=int, default=512,
+                        help="单个请求体的大小上限（MB，默认 512）")
+    parser.add_argument("--keep-jobs", type=int, default=KEEP_FINISHED_JOBS,
+                        help=f"内存中保留的已结束任务数（默认 {KEEP_FINISHED_JOBS}）")
+    parser.add_argument("-v", "--verbose", action="store_true", help="输出每个 HTTP 请求的日志")
+    parser.add_argument("--version", action="version",
+                        version=f"%(prog)s {__version__}")
+    return parser
+
+
+def main(argv=None):
+    """命令行入口"""
+    multiprocessing.freeze_support()
+    args = build_parser().parse_args(argv)
+
+    service = ConversionService(args.root, max(1, args.workers), max(0, args.keep_jobs))
+    service.start()
+    try:
+        server = ServiceHTTPServer((args.host, args.port), service,
+                                   args.max_upload_mb * 1024 * 1024, args.verbose)
+    except OSError as e:
+        service.shutdown()
+        print(f"✗ 无法监听 {args.host}:{args.port}: {e}", file=sys.stderr)
+        return 2
+
+    # Ctrl+C / SIGTERM 时停止接收请求，取消进行中的任务后退出
+    def stop(signum, frame):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGINT, stop)
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, stop)
+
+    print(f"✓ 转换服务已启动: http://{args.host}:{server.server_address[1]} "
+          f"（{service.worker_count} 个渲染进程）", file=sys.stderr)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        service.shutdown()
+    print("✓ 转换服务已停止", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
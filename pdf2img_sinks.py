@@ -0,0 +1,359 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PDF 转图片工具 - 输出方式
+决定页面图片写到哪里：
+
+- dir: 每页一个文件（默认）
+- zip: 每个 PDF 一个不压缩（stored）的 ZIP 包
+- tar: 每个 PDF 一个 tar 包
+- tiff: 每个 PDF 一个多页 TIFF
+
+归档输出只顺序追加、使用大缓冲区写盘，避免在网络共享上为每页创建文件的开销；
+全部页面写完后在旁边写出 <归档名>.index.json，记录每页数据在归档中的偏移和大小，便于随机读取；
+中途停止或出错的归档不写索引并删除。
+
+作者: zhifouli
+GitHub: https://github.com/zhifouli?tab=repositories
+"""
+
+import io
+import os
+import json
+import time
+import uuid
+import shutil
+import tarfile
+import zipfile
+import threading
+
+from pdf2img_encoders import TiffWriter, join_tiff_pages
+
+# 支持的输出方式
+SINKS = ("dir", "zip", "tar", "tiff")
+
+# 归档文件的写缓冲区大小
+SINK_BUFFER_BYTES = 8 * 1024 * 1024
+
+# 归档索引文件后缀
+INDEX_SUFFIX = ".index.json"
+
+
+def archive_name(pdf_name, sink):
+    """归档输出的文件名"""
+    return f"{pdf_name}.{'tif' if sink == 'tiff' else sink}"
+
+
+def load_index(index_path):
+    """读取归档索引，不存在或已损坏时返回 None"""
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return index if isinstance(index, dict) else None
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class DirectorySink:
+    """每页写成输出目录中的一个文件"""
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+
+    def wrap_encoder(self, encoder):
+        return encoder
+
+    def stream_path(self, name):
+        """流式写出的文件直接写到最终位置"""
+        return os.path.join(self.output_dir, name)
+
+    def write(self, page, name, data):
+        """写出一个文件，返回写入的字节数"""
+        with open(os.path.join(self.output_dir, name), "wb") as f:
+            f.write(data)
+        return len(data)
+
+    def write_file(self, page, name, path):
+        """登记已流式写好的文件，返回其字节数"""
+        return os.path.getsize(path)
+
+    def page_done(self, page):
+        pass
+
+    def close(self):
+        pass
+
+
+class ArchiveSink:
+    """
+    归档输出的基类
+
+    写入来自写盘线程和渲染线程（分块渲染的页面），由锁串行化；
+    页面按 pages 给出的顺序写入归档，先完成的后续页面暂存，等前面的页面完成后再写。
+    归档先写到每个实例独有的临时文件，完成后才原子地替换为最终文件名，
+    即使两个进程（如租约过期的集群节点和接手的节点）同时写同一归档也不会互相破坏。
+    """
+
+    kind = None
+
+    def __init__(self, output_dir, pdf_name, pages):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, archive_name(pdf_name, self.kind))
+        self.index_path = self.path + INDEX_SUFFIX
+        # 旧索引表示归档已完成，重写前先删除
+        _remove_quietly(self.index_path)
+        self.temp_path = os.path.join(
+            output_dir, f".{os.path.basename(self.path)}.{uuid.uuid4().hex[:12]}.partial")
+        self.file = open(self.temp_path, "wb", buffering=SINK_BUFFER_BYTES)
+        self.lock = threading.Lock()
+        self.expected = list(pages)
+        self.next_position = 0
+        self.pending = {}
+        self.ready = set()
+        self.entries = []
+
+    def wrap_encoder(self, encoder):
+        return encoder
+
+    def stream_path(self, name):
+        """流式写出的文件先写到临时文件，完成后再加入归档"""
+        return os.path.join(self.output_dir, f".{name}.tmp")
+
+    def write(self, page, name, data):
+        with self.lock:
+            self.pending.setdefault(page, []).append((name, data, False))
+            self._flush()
+        return len(data)
+
+    def write_file(self, page, name, path):
+        size = os.path.getsize(path)
+        with self.lock:
+            self.pending.setdefault(page, []).append((name, path, True))
+            self._flush()
+        return size
+
+    def page_done(self, page):
+        with self.lock:
+            self.ready.add(page)
+            self._flush()
+
+    def _flush(self):
+        """按顺序写出已完成的页面"""
+        while self.next_position < len(self.expected):
+            page = self.expected[self.next_position]
+            if page not in self.ready:
+                break
+            self._write_page(page)
+            self.next_position += 1
+
+    def _write_page(self, page):
+        for name, source, is_path in self.pending.pop(page, []):
+            if is_path:
+                entry = self._add_file(name, source)
+                os.remove(source)
+            else:
+                entry = self._add_bytes(name, source)
+            entry.update({"page": page, "name": name})
+            self.entries.append(entry)
+
+    def _add_bytes(self, name, data):
+        raise NotImplementedError
+
+    def _add_file(self, name, path):
+        raise NotImplementedError
+
+    def _finish(self):
+        self.file.close()
+
+    def close(self):
+        """
+        结束归档
+
+        全部页面都已写入时把临时文件替换为归档并写出索引；停止或出错时归档不完整，
+        丢弃暂存的页面并删除临时文件（之前完成的归档保持不变），续转时整体重写。
+        """
+        with self.lock:
+            self._flush()
+            complete = self.next_position == len(self.expected)
+            if not complete:
+                for items in self.pending.values():
+                    for _, source, is_path in items:
+                        if is_path:
+                            _remove_quietly(source)
+                self.pending.clear()
+            self._finish()
+        if not complete:
+            _remove_quietly(self.temp_path)
+            return
+        os.replace(self.temp_path, self.path)
+        index = {
+            "archive": os.path.basename(self.path),
+            "format": self.kind,
+            "archive_bytes": os.path.getsize(self.path),
+            "entries": sorted(self.entries, key=lambda e: (e["page"], e["name"]))
+        }
+        temp_path = self.index_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(temp_path, self.index_path)
+
+
+class ZipSink(ArchiveSink):
+    """不压缩的 ZIP 包（图片本身已压缩，再压缩只浪费 CPU）"""
+
+    kind = "zip"
+
+    def __init__(self, output_dir, pdf_name, pages):
+        super().__init__(output_dir, pdf_name, pages)
+        self.zip = zipfile.ZipFile(self.file, "w", zipfile.ZIP_STORED, allowZip64=True)
+
+    def _add_bytes(self, name, data):
+        info = zipfile.ZipInfo(name, time.localtime()[:6])
+        info.compress_type = zipfile.ZIP_STORED
+        self.zip.writestr(info, data)
+        return {"offset": self.file.tell() - len(data), "size": len(data)}
+
+    def _add_file(self, name, path):
+        info = zipfile.ZipInfo(name, time.localtime()[:6])
+        info.compress_type = zipfile.ZIP_STORED
+        # 预先给出大小，超过 4 GB 时自动使用 ZIP64
+        info.file_size = os.path.getsize(path)
+        with open(path, "rb") as source, self.zip.open(info, "w") as target:
+            shutil.copyfileobj(source, target, SINK_BUFFER_BYTES)
+        return {"offset": self.file.tell() - info.file_size, "size": info.file_size}
+
+    def _finish(self):
+        self.zip.close()
+        self.file.close()
+
+
+class TarSink(ArchiveSink):
+    """tar 包"""
+
+    kind = "tar"
+
+    def __init__(self, output_dir, pdf_name, pages):
+        super().__init__(output_dir, pdf_name, pages)
+        self.tar = tarfile.open(fileobj=self.file, mode="w", format=tarfile.PAX_FORMAT)
+
+    def _add(self, name, size, fileobj):
+        info = tarfile.TarInfo(name)
+        info.size = size
+        info.mtime = int(time.time())
+        self.tar.addfile(info, fileobj)
+        # addfile 写的是 info 的副本，数据偏移由写完后的位置减去补齐到块大小的数据长度得到
+        padded = -(-size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+        return {"offset": self.tar.offset - padded, "size": size}
+
+    def _add_bytes(self, name, data):
+        return self._add(name, len(data), io.BytesIO(data))
+
+    def _add_file(self, name, path):
+        with open(path, "rb") as source:
+            return self._add(name, os.path.getsize(path), source)
+
+    def _finish(self):
+        self.tar.close()
+        self.file.close()
+
+
+class _TiffPageEncoder:
+    """包装 TIFF 编码器：只压缩条带，由 TiffSink 按顺序写入多页 TIFF"""
+
+    extension = "tiff"
+    thread_safe = True
+
+    def __init__(self, encoder):
+        self.encoder = encoder
+
+    def encode(self, samples, width, height, n, dpi):
+        return self.encoder.encode_page(samples, width, height, n, dpi)
+
+    def join_strips(self, pages):
+        """分块渲染的各条带合并为一页（TIFF 本身按条带存储像素）"""
+        return join_tiff_pages(pages)
+
+
+class TiffSink(ArchiveSink):
+    """
+    多页 TIFF（要求输出格式为 tiff）
+
+    每个 PDF 页面对应一帧；分块渲染的超大页面各条带合并为同一帧的多个 TIFF 条带。
+    """
+
+    kind = "tiff"
+
+    def __init__(self, output_dir, pdf_name, pages):
+        super().__init__(output_dir, pdf_name, pages)
+        self.tiff = TiffWriter(self.file)
+
+    def wrap_encoder(self, encoder):
+        if not hasattr(encoder, "encode_page"):
+            raise ValueError("多页 TIFF 输出要求输出格式为 tiff")
+        return _TiffPageEncoder(encoder)
+
+    def write(self, page, name, data):
+        super().write(page, name, data)
+        return data["bytes"]
+
+    def _add_bytes(self, name, data):
+        offset = self.tiff.write_page(data)
+        return {"offset": offset, "size": data["bytes"], "frame": len(self.entries)}
+
+    def _finish(self):
+        self.tiff.close()
+        self.file.close()
+
+
+ARCHIVE_SINKS = {"zip": ZipSink, "tar": TarSink, "tiff": TiffSink}
+
+
+def make_sink(sink, output_dir, pdf_name, pages):
+    """
+    创建输出方式
+
+    Args:
+        sink: 输出方式，见 SINKS
+        output_dir: 该 PDF 的输出目录
+        pdf_name: PDF 文件名（不含扩展名）
+        pages: 将要写入的页码，归档按此顺序写入
+    """
+    if sink == "dir":
+        return DirectorySink(output_dir)
+    if sink not in ARCHIVE_SINKS:
+        raise ValueError(f"不支持的输出方式: {sink}")
+    return ARCHIVE_SINKS[sink](output_dir, pdf_name, pages)
+
+
+def completed_archive_pages(output_dir, pdf_name, sink, total_pages):
+    """
+    已完成的归档包含的页面
+
+    只有索引存在、归档大小与索引一致且包含全部页面时才算完成；
+    归档不支持追加，未完成的归档在续转时整体重写。
+
+    Returns:
+        {页码(从 1 开始): 该页的条目名列表}，归档未完成时返回 {}
+    """
+    path = os.path.join(output_dir, archive_name(pdf_name, sink))
+    index = load_index(path + INDEX_SUFFIX)
+    if index is None or index.get("format") != sink:
+        return {}
+    try:
+        if os.path.getsize(path) != index.get("archive_bytes"):
+            return {}
+    except OSError:
+        return {}
+    pages = {}
+    for entry in index.get("entries", []):
+        pages.setdefault(entry["page"], []).append(entry["name"])
+    if set(pages) != set(range(1, total_pages + 1)):
+        return {}
+    return pages
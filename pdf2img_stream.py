@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PDF 转图片工具 - 流式 Python 接口
+在调用方进程中逐页渲染，以生成器交出编码后的图片数据或原始像素，不写临时文件，
+适合把页面直接送往对象存储或模型。
+
+用法示例:
+    from pdf2img_stream import iter_pages
+
+    for page_number, width, height, data in iter_pages("a.pdf", dpi=200, output_format="jpg"):
+        bucket.put(f"a_{page_number:04d}.jpg", data)
+
+    # 原始像素（不编码、不复制）：交出 fitz.Pixmap，持有它期间 samples_mv 一直有效
+    for page_number, width, height, pix in iter_pages(pdf_bytes, colorspace="gray", raw=True):
+        model.feed(numpy.frombuffer(pix.samples_mv, numpy.uint8).reshape(height, width))
+
+作者: zhifouli
+GitHub: https://github.com/zhifouli?tab=repositories
+"""
+
+import os
+
+import fitz  # PyMuPDF
+
+from pdf2img_encoders import make_encoder
+from pdf2img_engine import (
+    COLORSPACES,
+    RENDER_PROFILES,
+    apply_render_profile,
+    page_colorspace,
+    page_zoom,
+    resolve_options,
+)
+
+
+def open_document(source):
+    """
+    打开 PDF 来源
+
+    Args:
+        source: 文件路径（str / PathLike）、PDF 数据（bytes / bytearray / memoryview）、
+            有 read() 方法的文件对象，或已打开的 fitz.Document
+
+    Returns:
+        (fitz.Document, 是否由本函数打开)：由本函数打开的文档由调用方负责关闭
+    """
+    if isinstance(source, fitz.Document):
+        return source, False
+    if isinstance(source, (str, os.PathLike)):
+        return fitz.open(source), True
+    if isinstance(source, memoryview):
+        source = source.tobytes()
+    elif hasattr(source, "read"):
+        source = source.read()
+    if isinstance(source, (bytes, bytearray)):
+        return fitz.open(stream=source, filetype="pdf"), True
+    raise TypeError(f"不支持的 PDF 来源类型: {type(source).__name__}")
+
+
+def parse_page_ranges(spec, page_count):
+    """
+    解析页码范围
+
+    Args:
+        spec: None（全部页面）、页码（从 1 开始）的可迭代对象，或 "1-3,8,10-" 形式的字符串
+        page_count: 文档页数
+
+    Returns:
+        从 0 开始的页码列表，超出文档范围的页码被忽略
+
+    Raises:
+        ValueError: 字符串格式无效
+    """
+    if spec is None:
+        return list(range(page_count))
+    if isinstance(spec, str):
+        numbers = []
+        for item in spec.replace(" ", "").split(","):
+            if not item:
+                continue
+            first, sep, last = item.partition("-")
+            try:
+                start = int(first) if first else 1
+                end = (int(last) if last else page_count) if sep else start
+            except ValueError:
+                raise ValueError(f"无效的页码范围: {item}") from None
+            numbers.extend(range(start, end + 1))
+        spec = numbers
+    return [number - 1 for number in spec if 1 <= number <= page_count]
+
+
+def iter_pages(source, dpi=150, output_format="png", quality=95, colorspace="rgb",
+               pages=None, raw=False, options=None):
+    """
+    逐页渲染 PDF，按需产生每页的图片
+
+    生成器每次只渲染一页，前一页的像素在产生下一页前释放（raw 模式下由调用方是否保留决定），
+    内存占用为单页像素加编码结果；
+    页面很大时可用 options 中的 max_pixels / max_long_edge 限制单页像素数。
+    提前结束迭代（break 或 close()）时，由本函数打开的文档随即关闭。
+
+    Args:
+        source: PDF 来源，见 open_document
+        dpi: DPI
+        output_format: 输出格式 (png/jpg/tiff/webp)，raw 为 True 时忽略
+        quality: 图片质量
+        colorspace: rgb / gray / bilevel / auto，见 COLORSPACES；
+            raw 模式下 bilevel 交出二值化前的灰度像素
+        pages: 页码范围，见 parse_page_ranges
+        raw: 为 True 时交出渲染得到的 fitz.Pixmap（不编码，无 alpha 通道），
+            通过 pix.samples_mv 不复制地读取像素，通道数为 pix.n；
+            像素内存随 Pixmap 一起释放，调用方可以按需保留
+        options: 扩展选项，见 DEFAULT_OPTIONS；其中 render_profile、max_pixels、max_long_edge、
+            bilevel_threshold 和编码参数生效
+
+    Yields:
+        (页码（从 1 开始）, 宽度, 高度, 编码后的图片数据 bytes 或 fitz.Pixmap)
+    """
+    if colorspace not in COLORSPACES:
+        raise ValueError(f"不支持的颜色模式: {colorspace}")
+    options = resolve_options(options)
+    options["colorspace"] = colorspace
+    if options["render_profile"] not in RENDER_PROFILES:
+        raise ValueError(f"不支持的渲染档案: {options['render_profile']}")
+    encoder = None if raw else make_encoder(output_format, quality, options)
+
+    pdf_document, owned = open_document(source)
+    try:
+        apply_render_profile(options)
+        annots = RENDER_PROFILES[options["render_profile"]]["annots"]
+        for page_num in parse_page_ranges(pages, len(pdf_document)):
+            page = pdf_document[page_num]
+            zoom = page_zoom(page.rect, dpi, options)
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom),
+                                  colorspace=page_colorspace(page, options),
+                                  alpha=False, annots=annots)
+            if raw:
+                yield page_num + 1, pix.width, pix.height, pix
+            else:
+                page_dpi = round(zoom * 72, 2)
+                if encoder.thread_safe:
+                    data = encoder.encode(pix.samples, pix.width, pix.height, pix.n, page_dpi)
+                else:
+                    data = encoder.encode_pixmap(pix, page_dpi)
+                yield page_num + 1, pix.width, pix.height, data
+            pix = None
+    finally:
+        if owned:
+            pdf_document.close()
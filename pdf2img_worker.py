@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PDF 转图片工具 - 转换进程入口
+图形界面启动转换进程时只导入本模块：导入时不加载 tkinter，也不加载 PyMuPDF，
+渲染引擎在子进程中导入。
+
+界面显示后预先启动一个转换进程（ConversionHost），子进程先导入渲染引擎再等待任务，
+开始转换时不必再等待进程启动和 PyMuPDF 加载。
+
+作者: zhifouli
+GitHub: https://github.com/zhifouli?tab=repositories
+"""
+
+import os
+import time
+from multiprocessing import Process, Queue, Event
+
+
+def default_worker_count():
+    """默认并行进程数：CPU 核心数"""
+    return os.cpu_count() or 1
+
+
+def read_page_count(pdf_path):
+    """
+    读取 PDF 页数，打不开时返回 None
+
+    在界面的文件信息进程中执行（界面进程不加载 PyMuPDF）。
+    """
+    import fitz
+    try:
+        with fitz.open(pdf_path) as doc:
+            return doc.page_count
+    except Exception:
+        return None
+
+
+def conversion_host_main(job_queue, progress_queue, pause_event, stop_event, control_queue):
+    """
+    预启动的转换进程主函数
+
+    先导入渲染引擎并发送 worker_ready 消息，然后等待一个批次并执行；收到 None 时直接退出。
+    """
+    start = time.perf_counter()
+    from pdf2img_engine import conversion_process_main
+    progress_queue.put({
+        "type": "worker_ready",
+        "import_time": time.perf_counter() - start
+    })
+
+    job = job_queue.get()
+    if job is None:
+        return
+    conversion_process_main(
+        job["pdf_files"], job["output_dir"], job["output_format"], job["quality"],
+        job["dpi"], progress_queue, pause_event, stop_event,
+        job["worker_count"], job["options"], control_queue
+    )
+
+
+class ConversionHost:
+    """
+    预启动的转换进程
+
+    进度队列、控制队列和暂停/停止事件在进程启动前创建并随参数传给子进程
+    （多进程队列只能通过继承传递），每个 ConversionHost 只执行一个批次。
+    转换进程还要再创建渲染进程，因此不能是守护进程，不用时需调用 close()。
+    """
+
+    def __init__(self):
+        self.job_queue = Queue()
+        self.progress_queue = Queue()
+        self.control_queue = Queue()
+        self.pause_event = Event()
+        self.stop_event = Event()
+        self.process = Process(
+            target=conversion_host_main,
+            args=(self.job_queue, self.progress_queue, self.pause_event,
+                  self.stop_event, self.control_queue)
+        )
+        self.used = False
+
+    def start(self):
+        """启动子进程（在后台导入渲染引擎），返回自身"""
+        self.process.start()
+        return self
+
+    def is_alive(self):
+        return self.process.is_alive()
+
+    def run(self, pdf_files, output_dir, output_format, quality, dpi,
+            worker_count=None, options=None):
+        """
+        提交一个批次，参数与 conversion_process_main 相同
+
+        进度消息从 progress_queue 读取，最后一条为 conversion_complete。
+        """
+        self.used = True
+        self.job_queue.put({
+            "pdf_files": list(pdf_files),
+            "output_dir": output_dir,
+            "output_format": output_format,
+            "quality": quality,
+            "dpi": dpi,
+            "worker_count": worker_count,
+            "options": options
+        })
+
+    def close(self, timeout=1):
+        """等待进程退出（未使用的进程通知其直接退出），超时后强制结束"""
+        if not self.used and self.process.is_alive():
+            self.job_queue.put(None)
+        self.process.join(timeout=timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout=timeout)
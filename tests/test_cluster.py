@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+多机分布式转换的队列协议测试
+
+租约过期后放回、过期节点不能再续租或写入完成、多次领取后移入 failed/，
+以及节点（exit_when_idle）处理完批次后 wait 的最后状态与 summary 一致。
+"""
+
+import os
+import time
+
+import fitz
+import pytest
+
+from pdf2img_cluster import (
+    MAX_SHARD_ATTEMPTS,
+    ClusterNode,
+    claim_shard,
+    finish_shard,
+    list_shards,
+    queue_path,
+    read_json,
+    release_shard,
+    renew_lease,
+    requeue_expired,
+    submit_batch,
+    wait_batch,
+)
+
+# 租约时长（秒），requeue_expired 只检查修改时间超过 1 秒的分片
+LEASE_SECONDS = 1
+
+
+class ListReporter:
+    """收集 wait_batch 输出的消息"""
+
+    def __init__(self):
+        self.messages = []
+
+    def put(self, message):
+        self.messages.append(message)
+
+
+def make_pdf(path, page_count):
+    with fitz.open() as document:
+        for i in range(page_count):
+            document.new_page(width=100, height=100).insert_text((10, 50), f"page {i + 1}")
+        document.save(str(path))
+    return str(path)
+
+
+@pytest.fixture
+def queue(tmp_path):
+    """提交一个 1 页、只有一个分片的批次，返回 (队列目录, 分片编号)"""
+    queue_dir = str(tmp_path / "queue")
+    pdf_path = make_pdf(tmp_path / "doc.pdf", 1)
+    batch = submit_batch(queue_dir, [pdf_path], str(tmp_path / "out"), "png", 95, 72,
+                         lease_seconds=LEASE_SECONDS)
+    return queue_dir, batch["files"][0]["shards"][0]
+
+
+def test_expired_lease_is_requeued(queue):
+    queue_dir, shard_id = queue
+    stale = claim_shard(queue_dir, "node-a")
+    assert stale["shard_id"] == shard_id
+    assert renew_lease(queue_dir, stale)
+    assert requeue_expired(queue_dir) == []
+
+    time.sleep(LEASE_SECONDS + 1.2)
+    assert requeue_expired(queue_dir) == [shard_id]
+    assert list_shards(queue_dir, "pending") == [shard_id]
+    assert not renew_lease(queue_dir, stale)
+
+    current = claim_shard(queue_dir, "node-b")
+    assert current["attempts"] == 2
+    assert list_shards(queue_dir, "running") == [shard_id]
+
+
+def test_stale_owner_cannot_finish(queue):
+    queue_dir, shard_id = queue
+    stale = claim_shard(queue_dir, "node-a")
+    time.sleep(LEASE_SECONDS + 1.2)
+    requeue_expired(queue_dir)
+    current = claim_shard(queue_dir, "node-b")
+
+    # 原节点不能续租、不能写入完成、也不能把分片放回
+    assert not renew_lease(queue_dir, stale)
+    assert not finish_shard(queue_dir, stale)
+    release_shard(queue_dir, stale)
+    assert list_shards(queue_dir, "running") == [shard_id]
+    assert list_shards(queue_dir, "done") == []
+
+    assert renew_lease(queue_dir, current)
+    assert finish_shard(queue_dir, current)
+    assert list_shards(queue_dir, "running") == []
+    assert read_json(queue_path(queue_dir, "done", f"{shard_id}.json"))["node"] == "node-b"
+    # 完成之后原节点仍然不能覆盖结果
+    assert not finish_shard(queue_dir, stale)
+
+
+def test_too_many_attempts_fail_the_shard(queue):
+    queue_dir, shard_id = queue
+    for attempt in range(MAX_SHARD_ATTEMPTS):
+        shard = claim_shard(queue_dir, f"node-{attempt}")
+        assert shard["attempts"] == attempt + 1
+        release_shard(queue_dir, shard)
+
+    assert claim_shard(queue_dir, "node-last") is None
+    assert list_shards(queue_dir, "pending") == []
+    assert list_shards(queue_dir, "running") == []
+    assert list_shards(queue_dir, "failed") == [shard_id]
+    failed = read_json(queue_path(queue_dir, "failed", f"{shard_id}.json"))
+    assert failed["attempts"] == MAX_SHARD_ATTEMPTS + 1
+    assert failed["error"]
+
+    reporter = ListReporter()
+    summary = wait_batch(queue_dir, reporter=reporter, interval=0)
+    assert summary["error_count"] == 1
+    assert [m["type"] for m in reporter.messages if m["type"].startswith("file_")] == ["file_error"]
+
+
+def test_node_processes_batch(tmp_path):
+    queue_dir = str(tmp_path / "queue")
+    pdf_path = make_pdf(tmp_path / "doc.pdf", 7)
+    batch = submit_batch(queue_dir, [pdf_path], str(tmp_path / "out"), "png", 95, 72,
+                         shard_pages=3, lease_seconds=LEASE_SECONDS)
+    assert batch["total_shards"] == 3
+
+    ClusterNode(queue_dir, worker_count=1, node_id="node-a", exit_when_idle=True).run()
+    assert len(list_shards(queue_dir, "done")) == 3
+    images = [name for name in os.listdir(batch["files"][0]["output_dir"]) if name.endswith(".png")]
+    assert len(images) == 7
+
+    reporter = ListReporter()
+    summary = wait_batch(queue_dir, reporter=reporter, interval=0)
+    assert summary["pages"] == 7
+    assert summary["nodes"]["node-a"]["pages"] == 7
+
+    status = [m for m in reporter.messages if m["type"] == "cluster_status"][-1]
+    assert status["pages_done"] == 7
+    assert status["nodes"] == [{
+        "node": "node-a",
+        "alive": False,
+        "workers": 1,
+        "shards_lost": 0,
+        "pages_per_sec": status["nodes"][0]["pages_per_sec"],
+        "pages_done": 7,
+        "shards_done": 3,
+        "shards_failed": 0
+    }]
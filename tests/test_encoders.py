@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+PNG / TIFF 编码器的往返测试
+
+编码结果用 MuPDF（fitz.Pixmap）独立解码，逐像素与原始像素比较。
+"""
+
+import io
+import random
+
+import fitz
+import pytest
+
+import pdf2img_encoders as encoders
+from pdf2img_encoders import (
+    ENCODER_PRESETS,
+    PNG_FILTERS,
+    PNG_ROWS_PER_BLOCK,
+    TIFF_ROWS_PER_STRIP,
+    TiffWriter,
+    compress_tiff_page,
+    encode_png,
+    encode_tiff,
+    join_tiff_pages,
+    make_encoder,
+)
+
+# 宽度不是 8 的倍数（黑白按位打包时每行要补齐），高度跨越多个 PNG 块和 TIFF 条带
+WIDTH = 37
+HEIGHT = 2 * PNG_ROWS_PER_BLOCK + 2 * TIFF_ROWS_PER_STRIP + 5
+THRESHOLD = 128
+
+COLORSPACES = {"gray": 1, "rgb": 3, "bilevel": 1}
+
+
+def make_samples(n, seed=1):
+    """带渐变、噪声和纯色区域的测试像素，覆盖 0 和 255 附近的取值（检验过滤的回绕）"""
+    rng = random.Random(seed)
+    data = bytearray()
+    for y in range(HEIGHT):
+        for x in range(WIDTH):
+            for c in range(n):
+                if y < 8:
+                    value = 255 if (x + c) % 2 else 0
+                elif x < 5:
+                    value = 255
+                else:
+                    value = (x * 7 + y * 3 + c * 50 + rng.randrange(16)) % 256
+                data.append(value)
+    return bytes(data)
+
+
+def expected_samples(samples, colorspace):
+    """解码后应得到的像素：黑白输出为只含 0/255 的灰度"""
+    if colorspace == "bilevel":
+        return bytes(0 if v < THRESHOLD else 255 for v in samples)
+    return samples
+
+
+def decode(data):
+    """用 MuPDF 解码单张图片"""
+    pix = fitz.Pixmap(data)
+    return pix.width, pix.height, pix.n, pix.samples
+
+
+def decode_tiff_frames(data):
+    """用 MuPDF 逐帧解码多页 TIFF"""
+    frames = []
+    document = fitz.open(stream=data, filetype="tiff")
+    pdf = fitz.open("pdf", document.convert_to_pdf())
+    for page in pdf:
+        pix = fitz.Pixmap(pdf, page.get_images()[0][0])
+        frames.append((pix.width, pix.height, pix.n, pix.samples))
+    return frames
+
+
+def test_byte_difference():
+    rng = random.Random(2)
+    a = bytes(rng.randrange(256) for _ in range(1000)) + b"\x00\xff\x00\xff"
+    b = bytes(rng.randrange(256) for _ in range(1000)) + b"\xff\x00\x00\xff"
+    assert encoders._byte_difference(a, b) == bytes((x - y) % 256 for x, y in zip(a, b))
+
+
+@pytest.mark.parametrize("colorspace", COLORSPACES)
+@pytest.mark.parametrize("filter_mode", PNG_FILTERS)
+def test_png_round_trip(colorspace, filter_mode):
+    n = COLORSPACES[colorspace]
+    samples = make_samples(n)
+    threshold = THRESHOLD if colorspace == "bilevel" else None
+    data = encode_png(samples, WIDTH, HEIGHT, n, 150, 6, filter_mode, threshold)
+    assert decode(data) == (WIDTH, HEIGHT, n, expected_samples(samples, colorspace))
+
+
+@pytest.mark.parametrize("colorspace", COLORSPACES)
+@pytest.mark.parametrize("filter_mode", PNG_FILTERS)
+def test_png_round_trip_without_pillow(monkeypatch, colorspace, filter_mode):
+    """未安装 Pillow 时全部过滤方式（含自适应）都由本模块编码"""
+    monkeypatch.setattr(encoders, "_pil_image", lambda: None)
+    test_png_round_trip(colorspace, filter_mode)
+
+
+@pytest.mark.parametrize("colorspace", COLORSPACES)
+@pytest.mark.parametrize("filter_mode", PNG_FILTERS)
+def test_png_stream_writer(tmp_path, colorspace, filter_mode):
+    """分段写入（段边界与 PNG 块边界不对齐）与整张编码得到相同的图片"""
+    n = COLORSPACES[colorspace]
+    samples = make_samples(n)
+    threshold = THRESHOLD if colorspace == "bilevel" else None
+    path = tmp_path / "page.png"
+    writer = encoders.PngStreamWriter(str(path), WIDTH, HEIGHT, n, 150, 6, filter_mode,
+                                      threshold)
+    stride = WIDTH * n
+    y = 0
+    for rows in (1, 70, PNG_ROWS_PER_BLOCK, HEIGHT):
+        rows = min(rows, HEIGHT - y)
+        writer.write_rows(samples[y * stride:(y + rows) * stride], rows)
+        y += rows
+    writer.close()
+    assert y == HEIGHT
+    assert decode(path.read_bytes()) == (WIDTH, HEIGHT, n, expected_samples(samples, colorspace))
+
+
+@pytest.mark.parametrize("colorspace", COLORSPACES)
+@pytest.mark.parametrize("compress_level", (0, 1, 6, 9))
+def test_tiff_round_trip(colorspace, compress_level):
+    n = COLORSPACES[colorspace]
+    samples = make_samples(n)
+    threshold = THRESHOLD if colorspace == "bilevel" else None
+    data = encode_tiff(samples, WIDTH, HEIGHT, n, 150, compress_level, threshold)
+    assert decode(data) == (WIDTH, HEIGHT, n, expected_samples(samples, colorspace))
+
+
+def test_multipage_tiff():
+    """每页一个 IFD；分块的页面合并条带后仍是一帧"""
+    pages = [(make_samples(1, seed), 1, None, "gray") for seed in (1, 2)]
+    pages.append((make_samples(3), 3, None, "rgb"))
+    pages.append((make_samples(1), 1, THRESHOLD, "bilevel"))
+
+    buffer = io.BytesIO()
+    writer = TiffWriter(buffer)
+    for samples, n, threshold, _ in pages:
+        # 在 TIFF 条带边界处切成两段，分别压缩后合并
+        split = TIFF_ROWS_PER_STRIP * 2
+        stride = WIDTH * n
+        top = compress_tiff_page(samples[:split * stride], WIDTH, split, n, 150, 6, threshold)
+        bottom = compress_tiff_page(samples[split * stride:], WIDTH, HEIGHT - split, n, 150, 6,
+                                    threshold)
+        writer.write_page(join_tiff_pages([top, bottom]))
+    writer.close()
+
+    frames = decode_tiff_frames(buffer.getvalue())
+    assert frames == [(WIDTH, HEIGHT, n, expected_samples(samples, colorspace))
+                      for samples, n, _, colorspace in pages]
+
+
+@pytest.mark.parametrize("preset", ENCODER_PRESETS)
+@pytest.mark.parametrize("colorspace", COLORSPACES)
+@pytest.mark.parametrize("output_format", ("png", "tiff"))
+def test_encoder_presets(preset, colorspace, output_format):
+    encoder = make_encoder(output_format, 95, {"encoder_preset": preset,
+                                               "colorspace": colorspace,
+                                               "bilevel_threshold": THRESHOLD})
+    n = COLORSPACES[colorspace]
+    samples = make_samples(n)
+    data = encoder.encode(samples, WIDTH, HEIGHT, n, 150)
+    assert decode(data) == (WIDTH, HEIGHT, n, expected_samples(samples, colorspace))